@@ -0,0 +1,202 @@
+# Query-plan and latency regression harness for the validity views (create_view_vw_valid_collision_from_oracle.sql).
+# It loads synthetic collisions and status histories at several scales into their own schemas of a local PostgreSQL,
+# installs a view version into each, and runs EXPLAIN (ANALYZE, BUFFERS) on it. Runtime, buffers, plan shape and a
+# hash of the result set are recorded per scale.
+#   record_baseline = True   -> writes the measurements of the current view SQL to baseline_file
+#   record_baseline = False  -> compares against baseline_file and exits with status 1 when a scale got slower
+#                               than latency_threshold allows or returned a different result set
+# Typical use: record a baseline before editing the view, edit it, rerun to compare.
+
+from dotenv import load_dotenv
+import os
+import sys
+import json
+import statistics
+import logging
+from datetime import datetime
+
+from helper import time_execution
+from helper_db_operation import PostgreSQLDB
+
+# Set up logging configuration
+logging.basicConfig(level=logging.CRITICAL,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+load_dotenv()
+
+SCALES = (1000, 10000, 100000)          # synthetic collisions per run
+STATUS_TYPE_IDS = (200, 210, 220, 221, 230)
+MAX_STATUS_ROWS_PER_COLLISION = 6
+LATENCY_THRESHOLD = 0.20                # fail when execution time grows by more than 20% ...
+LATENCY_FLOOR_MS = 5.0                  # ... and by more than this, so timer noise on tiny scales is ignored
+REPEATS = 5
+VIEW_NAME = 'vw_valid_collision_from_oracle'
+SQL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def benchmark_schema(scale):
+    return f"view_benchmark_{scale}"
+
+def load_synthetic_data(postgres_db, schema, scale):
+    """
+    Create the source tables the view reads and fill them with `scale` collisions (a quarter with negative,
+    pre-2016 style IDs) and 1 to MAX_STATUS_ROWS_PER_COLLISION status rows each. Values are derived from
+    hashes of the IDs, so every run at the same scale produces identical data.
+    """
+    status_type_array = f"ARRAY[{', '.join(str(status) for status in STATUS_TYPE_IDS)}]"
+    setup_query = f"""
+        DROP SCHEMA IF EXISTS {schema} CASCADE;
+        CREATE SCHEMA {schema};
+        SET search_path TO {schema};
+
+        CREATE TABLE oracle_collisions (
+            id BIGINT PRIMARY KEY,
+            case_nbr TEXT,
+            occurence_timestamp TIMESTAMP,
+            reported_timestamp TIMESTAMP
+        );
+        INSERT INTO oracle_collisions
+        SELECT
+            g.id,
+            'C' || LPAD(ABS(g.id)::TEXT, 9, '0'),
+            TIMESTAMP '2004-01-01' + (ABS(hashint8(g.id)) % (21 * 365)) * INTERVAL '1 day',
+            TIMESTAMP '2004-01-01' + (ABS(hashint8(g.id)) % (21 * 365) + ABS(hashint8(g.id + 1)) % 30) * INTERVAL '1 day'
+        FROM generate_series(-{scale // 4}, {scale - scale // 4 - 1}) AS g(id);
+
+        CREATE TABLE oracle_cl_status_history (
+            id BIGSERIAL PRIMARY KEY,
+            collision_id BIGINT NOT NULL,
+            coll_status_type_id INTEGER NOT NULL,
+            created_timestamp TIMESTAMP NOT NULL,
+            effective_date TIMESTAMP NOT NULL
+        );
+        INSERT INTO oracle_cl_status_history (collision_id, coll_status_type_id, created_timestamp, effective_date)
+        SELECT
+            c.id,
+            ({status_type_array})[1 + ABS(hashint8(c.id * 16 + s.n)) % {len(STATUS_TYPE_IDS)}],
+            c.reported_timestamp + s.n * INTERVAL '1 day',
+            c.reported_timestamp + (s.n * 30 + ABS(hashint8(c.id * 16 + s.n + 8)) % 400) * INTERVAL '1 day'
+        FROM oracle_collisions c
+        CROSS JOIN LATERAL generate_series(0, ABS(hashint8(c.id)) % {MAX_STATUS_ROWS_PER_COLLISION}) AS s(n);
+        CREATE INDEX ON oracle_cl_status_history (collision_id);
+    """
+    postgres_db.execute_query(setup_query)
+    install_sql_file(postgres_db, schema, 'create_table_collision_cutoff_dates.sql')
+    postgres_db.execute_query(f"ANALYZE {schema}.oracle_collisions; ANALYZE {schema}.oracle_cl_status_history;")
+    logging.info(f"Loaded {scale} synthetic collisions into schema {schema}.")
+
+def install_sql_file(postgres_db, schema, sql_file):
+    """ Run a view/table SQL file against the benchmark schema instead of public. """
+    with open(os.path.join(SQL_DIR, sql_file)) as f:
+        sql = f.read().replace('public.', f'{schema}.')
+    postgres_db.execute_query(f"SET search_path TO {schema};\n{sql}")
+
+def plan_shape(plan):
+    """ Node types of a JSON plan as a nested string, e.g. 'Sort(Hash Join(Seq Scan, Hash(...)))'. """
+    children = plan.get('Plans', [])
+    node = plan['Node Type']
+    return f"{node}({', '.join(plan_shape(child) for child in children)})" if children else node
+
+def measure_view(postgres_db, schema, repeats=REPEATS):
+    """ EXPLAIN (ANALYZE, BUFFERS) the view `repeats` times after one warm-up run, and hash its result set. """
+    cursor = postgres_db.conn.cursor()
+    try:
+        explain_query = f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) SELECT * FROM {schema}.{VIEW_NAME}"
+        cursor.execute(explain_query)
+        runs = []
+        for _ in range(repeats):
+            cursor.execute(explain_query)
+            runs.append(cursor.fetchone()[0][0])
+
+        cursor.execute(f"""
+            SELECT COUNT(*), md5(COALESCE(string_agg(v::TEXT, '|' ORDER BY v::TEXT), ''))
+            FROM {schema}.{VIEW_NAME} v
+        """)
+        result_rows, result_hash = cursor.fetchone()
+        postgres_db.conn.rollback()  # end the read-only transaction
+    finally:
+        cursor.close()
+
+    median_run = sorted(runs, key=lambda run: run['Execution Time'])[len(runs) // 2]
+    return {
+        'execution_ms': statistics.median(run['Execution Time'] for run in runs),
+        'planning_ms': statistics.median(run['Planning Time'] for run in runs),
+        'shared_hit_blocks': median_run['Plan'].get('Shared Hit Blocks'),
+        'shared_read_blocks': median_run['Plan'].get('Shared Read Blocks'),
+        'temp_written_blocks': median_run['Plan'].get('Temp Written Blocks'),
+        'plan_shape': plan_shape(median_run['Plan']),
+        'result_rows': result_rows,
+        'result_hash': result_hash,
+    }
+
+def compare_to_baseline(baseline, measurements, latency_threshold=LATENCY_THRESHOLD):
+    """ Return the list of regressions of `measurements` against `baseline`; plan changes are only printed. """
+    failures = []
+    for scale, measurement in measurements.items():
+        reference = baseline['scales'].get(scale)
+        if reference is None:
+            print(f"Scale {scale}: no baseline, skipped")
+            continue
+        if measurement['result_hash'] != reference['result_hash']:
+            failures.append(f"Scale {scale}: result set changed ({reference['result_rows']} -> {measurement['result_rows']} rows)")
+        slowdown_ms = measurement['execution_ms'] - reference['execution_ms']
+        if slowdown_ms > LATENCY_FLOOR_MS and measurement['execution_ms'] > reference['execution_ms'] * (1 + latency_threshold):
+            failures.append(f"Scale {scale}: execution time {reference['execution_ms']:.1f} -> {measurement['execution_ms']:.1f} ms")
+        if measurement['plan_shape'] != reference['plan_shape']:
+            print(f"Scale {scale}: plan shape changed\n  before: {reference['plan_shape']}\n  after:  {measurement['plan_shape']}")
+    return failures
+
+def print_measurements(measurements):
+    print(f"{'scale':>10}{'exec_ms':>12}{'plan_ms':>10}{'hit_blk':>10}{'read_blk':>10}{'rows':>10}  result_hash")
+    for scale, measurement in measurements.items():
+        print(f"{scale:>10}{measurement['execution_ms']:>12.1f}{measurement['planning_ms']:>10.1f}"
+              f"{measurement['shared_hit_blocks'] or 0:>10}{measurement['shared_read_blocks'] or 0:>10}"
+              f"{measurement['result_rows']:>10}  {measurement['result_hash']}")
+
+@time_execution
+def benchmark_validity_views(view_sql_file='create_view_vw_valid_collision_from_oracle.sql', scales=SCALES,
+                             baseline_file='validity_view_baseline.json', record_baseline=False,
+                             latency_threshold=LATENCY_THRESHOLD, repeats=REPEATS, keep_schemas=False):
+    """ Benchmark `view_sql_file` at each scale; returns the list of regressions (empty when recording). """
+    postgres_host = os.getenv('ECOLLISION_BENCHMARK_SQL_HOST_NAME', 'localhost')
+    postgres_db_name = os.getenv('ECOLLISION_BENCHMARK_SQL_DATABASE_NAME', 'postgres')
+    postgres_user = os.getenv('ECOLLISION_BENCHMARK_SQL_USERNAME', 'postgres')
+    postgres_password = os.getenv('ECOLLISION_BENCHMARK_SQL_PASSWORD')
+    postgres_db = PostgreSQLDB(postgres_user, postgres_password, postgres_host, postgres_db_name)
+
+    measurements = {}
+    for scale in scales:
+        schema = benchmark_schema(scale)
+        load_synthetic_data(postgres_db, schema, scale)
+        install_sql_file(postgres_db, schema, view_sql_file)
+        measurements[str(scale)] = measure_view(postgres_db, schema, repeats=repeats)
+        if not keep_schemas:
+            postgres_db.execute_query(f"DROP SCHEMA IF EXISTS {schema} CASCADE;")
+    postgres_db.close_connection()
+    print_measurements(measurements)
+
+    if record_baseline:
+        with open(baseline_file, 'w') as f:
+            json.dump({'view_sql_file': view_sql_file, 'recorded_at': datetime.now().isoformat(), 'scales': measurements}, f, indent=2)
+        print(f"Recorded baseline to {baseline_file}")
+        return []
+
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    failures = compare_to_baseline(baseline, measurements, latency_threshold=latency_threshold)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if not failures:
+        print(f"No regressions against {baseline_file} (threshold {latency_threshold:.0%})")
+    return failures
+
+if __name__ == "__main__":
+    # Control panel
+    view_sql_file = 'create_view_vw_valid_collision_from_oracle.sql'
+    scales = SCALES
+    baseline_file = 'validity_view_baseline.json'
+    record_baseline = False  # Set to True before editing the view, then back to False to compare the edited version
+    latency_threshold = LATENCY_THRESHOLD
+
+    failures = benchmark_validity_views(view_sql_file=view_sql_file, scales=scales, baseline_file=baseline_file,
+                                        record_baseline=record_baseline, latency_threshold=latency_threshold)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,40 @@
+# This applies the SQL files that define the cutoff calendar and the validity views, in dependency order.
+
+from dotenv import load_dotenv
+import os
+import logging
+
+from helper import time_execution
+from helper_db_operation import PostgreSQLDB
+
+# Set up logging configuration
+logging.basicConfig(level=logging.CRITICAL, 
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+load_dotenv()
+
+# Applied in this order; later files depend on objects created by earlier ones
+view_sql_files = [
+    'create_table_collision_cutoff_dates.sql',
+    'create_view_vw_valid_collision_from_oracle.sql',
+    'create_view_vw_valid_collision_from_analytics_not_in_oracle.sql',
+]
+
+@time_execution
+def build_fusion_views(sql_files=None):
+    postgres_host = os.getenv('ECOLLISION_FUSION_SQL_HOST_NAME')
+    postgres_db_name = os.getenv('ECOLLISION_FUSION_SQL_DATABASE_NAME')
+    postgres_user = os.getenv('ECOLLISION_FUSION_SQL_USERNAME')
+    postgres_password = os.getenv('ECOLLISION_FUSION_SQL_PASSWORD')
+    postgres_db = PostgreSQLDB(postgres_user, postgres_password, postgres_host, postgres_db_name)
+
+    sql_dir = os.path.dirname(os.path.abspath(__file__))
+    for sql_file in sql_files or view_sql_files:
+        with open(os.path.join(sql_dir, sql_file)) as f:
+            logging.info(f"Applying {sql_file}.")
+            postgres_db.execute_query(f.read())
+
+    postgres_db.close_connection()
+
+if __name__ == "__main__":
+    build_fusion_views()
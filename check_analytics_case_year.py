@@ -0,0 +1,77 @@
+# Check that Analytics-only collisions are fingerprinted, fetched and loaded under the same case year, run against a
+# local PostgreSQL. Collision 1 carries its own case_year 2019 but its timestamps say 2020; collision 2 has no
+# case_year of its own. Both INTEGER and text case_year columns are checked. Exits with status 1 on a mismatch.
+
+from dotenv import load_dotenv
+import os
+import sys
+import logging
+
+from helper_db_operation import PostgreSQLDB
+from helper_frozen_years import get_table_fingerprints, case_year_filter, own_case_year_expression
+from etl_ecollision_fusion_table_collisions import fetch_analytics_collisions
+
+# Set up logging configuration
+logging.basicConfig(level=logging.CRITICAL,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+load_dotenv()
+
+CHECK_SCHEMA = 'analytics_case_year_check'
+
+def create_check_tables(postgres_db, case_year_type):
+    postgres_db.execute_query(f"""
+        DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE;
+        CREATE SCHEMA {CHECK_SCHEMA};
+        SET search_path TO {CHECK_SCHEMA};
+        CREATE TABLE analytics_collisions (
+            id BIGINT PRIMARY KEY, case_nbr TEXT, case_year {case_year_type},
+            occurence_timestamp TIMESTAMP, reported_timestamp TIMESTAMP
+        );
+        INSERT INTO analytics_collisions VALUES
+            (1, 'A1', '2019', '2020-03-01', '2020-03-02'),
+            (2, 'A2', NULL, '2020-06-01', NULL);
+        CREATE VIEW vw_valid_collision_from_analytics_not_in_oracle AS SELECT id FROM analytics_collisions;
+    """)
+
+def check_analytics_case_year(keep_schema=False):
+    """ Returns the list of failures, empty when every step sees collision 1 in 2019 and collision 2 in 2020. """
+    postgres_host = os.getenv('ECOLLISION_BENCHMARK_SQL_HOST_NAME', 'localhost')
+    postgres_db_name = os.getenv('ECOLLISION_BENCHMARK_SQL_DATABASE_NAME', 'postgres')
+    postgres_user = os.getenv('ECOLLISION_BENCHMARK_SQL_USERNAME', 'postgres')
+    postgres_password = os.getenv('ECOLLISION_BENCHMARK_SQL_PASSWORD')
+    postgres_db = PostgreSQLDB(postgres_user, postgres_password, postgres_host, postgres_db_name)
+
+    failures = []
+    for case_year_type in ('INTEGER', 'VARCHAR(4)'):
+        create_check_tables(postgres_db, case_year_type)
+        fingerprints = get_table_fingerprints(postgres_db, 'analytics_collisions', own_case_year_expression('src'))
+        if sorted(fingerprints) != [2019, 2020]:
+            failures.append(f"{case_year_type}: fingerprinted case years {sorted(fingerprints)}, expected [2019, 2020]")
+
+        # Refreshing 2019 must fetch collision 1 back, and it must be loaded into 2019 again
+        for case_years, expected_ids in (([2019], [1]), ([2020], [2])):
+            df = fetch_analytics_collisions(postgres_db, case_year_filter(case_years, own_case_year_expression('ac')),
+                                            analytics_table='analytics_collisions')
+            if sorted(df['id']) != expected_ids or set(df['case_year']) != set(case_years):
+                failures.append(f"{case_year_type}: refreshing {case_years} fetched ids {sorted(df['id'])} "
+                                f"with case years {sorted(set(df['case_year']))}, expected {expected_ids}")
+
+        # A change to collision 1 only unfreezes its own case year
+        postgres_db.execute_query("UPDATE analytics_collisions SET case_nbr = 'A1b' WHERE id = 1")
+        changed = get_table_fingerprints(postgres_db, 'analytics_collisions', own_case_year_expression('src'))
+        changed_years = sorted(year for year in changed if changed[year] != fingerprints.get(year))
+        if changed_years != [2019]:
+            failures.append(f"{case_year_type}: changing collision 1 changed the fingerprints of {changed_years}, expected [2019]")
+
+    if not keep_schema:
+        postgres_db.execute_query(f"DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE;")
+    postgres_db.close_connection()
+    for failure in failures:
+        print(f"FAILED {failure}")
+    if not failures:
+        print("Analytics case year check passed: fingerprints, fetch filter and loaded case_year agree")
+    return failures
+
+if __name__ == "__main__":
+    sys.exit(1 if check_analytics_case_year() else 0)
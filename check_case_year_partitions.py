@@ -0,0 +1,77 @@
+# Load check for case_year partitioned fusion tables (partition_by_case_year=True), run against a local PostgreSQL.
+# It creates fusion_collisions in a scratch schema with create_fusion_table_query, swaps in rows for two case years
+# and one row without a case year (both timestamps missing) twice through load_by_case_year_partitions, and checks
+# that every row ends up in its partition. Exits with status 1 when a load fails or rows are missing.
+
+from dotenv import load_dotenv
+import os
+import sys
+import logging
+
+from helper_db_operation import PostgreSQLDB
+from helper_partition import load_by_case_year_partitions
+from create_empty_tables_for_ecollision_fusion import create_fusion_table_query
+
+# Set up logging configuration
+logging.basicConfig(level=logging.CRITICAL,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+load_dotenv()
+
+CHECK_SCHEMA = 'case_year_partition_check'
+
+# Analytics declares case_year NOT NULL; the partitioned table must not
+check_columns = [
+    ('ID', 'bigint', None, 'NO'),
+    ('CASE_NBR', 'varchar', 20, 'YES'),
+    ('CASE_YEAR', 'int', None, 'NO'),
+    ('OCCURENCE_TIMESTAMP', 'datetime', None, 'YES'),
+    ('REPORTED_TIMESTAMP', 'datetime', None, 'YES'),
+]
+
+def check_case_year_partitions(keep_schema=False):
+    """ Returns the list of failures, empty when the NULL-year row and the yearly rows all load. """
+    import pandas as pd
+
+    postgres_host = os.getenv('ECOLLISION_BENCHMARK_SQL_HOST_NAME', 'localhost')
+    postgres_db_name = os.getenv('ECOLLISION_BENCHMARK_SQL_DATABASE_NAME', 'postgres')
+    postgres_user = os.getenv('ECOLLISION_BENCHMARK_SQL_USERNAME', 'postgres')
+    postgres_password = os.getenv('ECOLLISION_BENCHMARK_SQL_PASSWORD')
+    postgres_db = PostgreSQLDB(postgres_user, postgres_password, postgres_host, postgres_db_name)
+
+    postgres_db.execute_query(f"DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE; CREATE SCHEMA {CHECK_SCHEMA}; SET search_path TO {CHECK_SCHEMA};")
+    postgres_db.execute_query(create_fusion_table_query('COLLISIONS', check_columns, [], partition_by_case_year=True))
+
+    df = pd.DataFrame({
+        'id': [1, 2, 3],
+        'case_nbr': ['C1', 'C2', 'C3'],
+        'case_year': pd.array([2020, None, 2021], dtype='Int64'),
+        'occurence_timestamp': pd.to_datetime(['2020-05-01', None, '2021-02-03']),
+        'reported_timestamp': pd.to_datetime(['2020-05-02', None, None]),
+    })
+    failures = []
+    for attempt in ('first load', 'reload'):
+        try:
+            load_by_case_year_partitions(postgres_db, 'fusion_collisions', df, case_years=[2020, 2021, None])
+        except Exception as e:
+            failures.append(f"{attempt} failed: {e}")
+            break
+        cursor = postgres_db.conn.cursor()
+        cursor.execute("SELECT case_year, COUNT(*) FROM fusion_collisions GROUP BY case_year")
+        counts = dict(cursor.fetchall())
+        cursor.close()
+        postgres_db.conn.rollback()
+        if counts != {2020: 1, 2021: 1, None: 1}:
+            failures.append(f"{attempt}: expected one row each for 2020, 2021 and no case year, found {counts}")
+
+    if not keep_schema:
+        postgres_db.execute_query(f"DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE;")
+    postgres_db.close_connection()
+    for failure in failures:
+        print(f"FAILED {failure}")
+    if not failures:
+        print("Partitioned load check passed: rows with and without a case year load and reload")
+    return failures
+
+if __name__ == "__main__":
+    sys.exit(1 if check_case_year_partitions() else 0)
@@ -0,0 +1,79 @@
+# Check that frozen case years (see helper_frozen_years.py) follow the cutoffs the valid collision view applies, run
+# against a local PostgreSQL. Collision 1 occurred in 2019 but its status history was created in 2020, so case year 2019
+# waits for the 2020 cutoff; collision 2 (case year 2021) was created in 2021, which has no cutoff row yet. It also
+# checks that moving a cutoff changes the fingerprint of the affected case year only, and that the state recorded for a
+# fusion table is forgotten when the table is dropped under its upper case name. Exits with status 1 on a mismatch.
+
+from dotenv import load_dotenv
+import os
+import sys
+import logging
+from datetime import date
+
+from helper_db_operation import PostgreSQLDB
+from helper_frozen_years import (get_case_year_cutoffs, get_source_fingerprints, get_recorded_fingerprints,
+                                 record_year_refresh, clear_year_refresh_state)
+
+# Set up logging configuration
+logging.basicConfig(level=logging.CRITICAL,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+load_dotenv()
+
+CHECK_SCHEMA = 'frozen_year_cutoff_check'
+
+def create_check_tables(postgres_db):
+    postgres_db.execute_query(f"""
+        DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE;
+        CREATE SCHEMA {CHECK_SCHEMA};
+        SET search_path TO {CHECK_SCHEMA};
+        CREATE TABLE oracle_collisions (id BIGINT PRIMARY KEY, occurence_timestamp TIMESTAMP, reported_timestamp TIMESTAMP);
+        CREATE TABLE oracle_cl_status_history (collision_id BIGINT, status TEXT, created_timestamp TIMESTAMP);
+        CREATE TABLE collision_cutoff_dates (created_year INTEGER PRIMARY KEY, cutoff_end_date DATE NOT NULL);
+        INSERT INTO oracle_collisions VALUES (1, '2019-12-30', NULL), (2, '2021-04-01', NULL);
+        INSERT INTO oracle_cl_status_history VALUES (1, 'NEW', '2020-01-05'), (2, 'NEW', '2021-04-02');
+        INSERT INTO collision_cutoff_dates VALUES (2019, '2020-03-31'), (2020, '2021-03-31');
+    """)
+
+def check_frozen_year_cutoffs(keep_schema=False):
+    """ Returns the list of failures, empty when cutoffs, fingerprints and recorded state behave as described above. """
+    postgres_host = os.getenv('ECOLLISION_BENCHMARK_SQL_HOST_NAME', 'localhost')
+    postgres_db_name = os.getenv('ECOLLISION_BENCHMARK_SQL_DATABASE_NAME', 'postgres')
+    postgres_user = os.getenv('ECOLLISION_BENCHMARK_SQL_USERNAME', 'postgres')
+    postgres_password = os.getenv('ECOLLISION_BENCHMARK_SQL_PASSWORD')
+    postgres_db = PostgreSQLDB(postgres_user, postgres_password, postgres_host, postgres_db_name)
+
+    failures = []
+    create_check_tables(postgres_db)
+    cutoffs = get_case_year_cutoffs(postgres_db, 'oracle_collisions', 'oracle_cl_status_history')
+    if cutoffs != {2019: date(2021, 3, 31), 2021: None}:
+        failures.append(f"case year cutoffs are {cutoffs}, expected 2019 -> 2021-03-31 (created 2020) and 2021 -> None")
+
+    # Moving the 2020 cutoff changes what the view returns for case year 2019; opening 2022 changes nothing loaded
+    fingerprints = get_source_fingerprints(postgres_db, 'oracle_collisions', 'oracle_cl_status_history')
+    postgres_db.execute_query("UPDATE collision_cutoff_dates SET cutoff_end_date = '2021-06-30' WHERE created_year = 2020; "
+                              "INSERT INTO collision_cutoff_dates VALUES (2022, '2023-03-31');")
+    changed = get_source_fingerprints(postgres_db, 'oracle_collisions', 'oracle_cl_status_history')
+    changed_years = sorted(year for year in changed if changed[year] != fingerprints.get(year))
+    if changed_years != [2019]:
+        failures.append(f"moving the 2020 cutoff changed the fingerprints of {changed_years}, expected [2019]")
+
+    # The ETL records fusion_collisions_dev; the table script drops fusion_COLLISIONS_dev
+    get_recorded_fingerprints(postgres_db, 'fusion_collisions_dev')  # creates the state table in the scratch schema
+    record_year_refresh(postgres_db, 'fusion_collisions_dev', changed, [2019])
+    clear_year_refresh_state(postgres_db, 'fusion_COLLISIONS_dev')
+    recorded = get_recorded_fingerprints(postgres_db, 'fusion_collisions_dev')
+    if recorded:
+        failures.append(f"dropping fusion_COLLISIONS_dev left recorded years {sorted(recorded)}")
+
+    if not keep_schema:
+        postgres_db.execute_query(f"DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE;")
+    postgres_db.close_connection()
+    for failure in failures:
+        print(f"FAILED {failure}")
+    if not failures:
+        print("Frozen year cutoff check passed: cutoffs follow the created year, the calendar is fingerprinted and state is cleared")
+    return failures
+
+if __name__ == "__main__":
+    sys.exit(1 if check_frozen_year_cutoffs() else 0)
@@ -0,0 +1,108 @@
+# Round-trip check of the ingest -> ETL Arrow handoff (see helper_arrow_handoff.py), run against a local PostgreSQL.
+# It ingests a synthetic COLLISIONS table through the sinks the Oracle ingest uses (a PostgreSQL table plus an Arrow
+# handoff file, named by the ingest's own create_oracle_table_query) into a scratch schema, then reads it back the way
+# the collisions ETL does, as 'oracle_collisions'. It also checks that the valid collision ID cache is keyed by that
+# ingest run rather than by a hash of the table. Exits with status 1 when either would not use the ingest's record.
+
+from dotenv import load_dotenv
+import os
+import sys
+import shutil
+import logging
+import tempfile
+from datetime import datetime
+
+from helper_db_operation import PostgreSQLDB, map_oracle_to_postgres
+from helper_sinks import build_sinks, open_sinks, fan_out, close_sinks
+from helper_arrow_handoff import new_ingest_run_id, read_arrow_handoff
+from helper_membership_index import get_view_source_markers, get_view_source_key
+from ingest_ecollision_oracle_data import create_oracle_table_query
+
+# Set up logging configuration
+logging.basicConfig(level=logging.CRITICAL,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+load_dotenv()
+
+CHECK_SCHEMA = 'ingest_handoff_check'
+
+# (column_name, data_type, data_length, nullable) as OracleDB.get_table_columns returns them
+check_columns = [
+    ('ID', 'NUMBER', 22, 'N'),
+    ('CASE_NBR', 'VARCHAR2', 20, 'Y'),
+    ('OCCURENCE_TIMESTAMP', 'DATE', 7, 'Y'),
+    ('REPORTED_TIMESTAMP', 'DATE', 7, 'Y'),
+]
+check_rows = [
+    (1, 'C1', datetime(2020, 5, 1), datetime(2020, 5, 2)),
+    (2, 'C2', None, datetime(2021, 1, 3)),
+    (3, 'C3', None, None),
+]
+
+def connect_check_db():
+    postgres_host = os.getenv('ECOLLISION_BENCHMARK_SQL_HOST_NAME', 'localhost')
+    postgres_db_name = os.getenv('ECOLLISION_BENCHMARK_SQL_DATABASE_NAME', 'postgres')
+    postgres_user = os.getenv('ECOLLISION_BENCHMARK_SQL_USERNAME', 'postgres')
+    postgres_password = os.getenv('ECOLLISION_BENCHMARK_SQL_PASSWORD')
+    postgres_db = PostgreSQLDB(postgres_user, postgres_password, postgres_host, postgres_db_name)
+    postgres_db.execute_query(f"DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE; CREATE SCHEMA {CHECK_SCHEMA}; SET search_path TO {CHECK_SCHEMA};")
+    return postgres_db
+
+def ingest_check_collisions(postgres_db, handoff_dir, table_name='COLLISIONS'):
+    """ Ingest `check_rows` as the Oracle ingest would, into oracle_<table_name> and its Arrow handoff; returns the run ID. """
+    run_id = new_ingest_run_id()
+    sinks = build_sinks(['prod', 'arrow'], postgres_db=postgres_db, drop_existing=True, handoff_dir=handoff_dir, run_id=run_id)
+
+    def create_query_for(sink_dev_mode):
+        return f"oracle_{table_name}", create_oracle_table_query(table_name, check_columns, [], dev_mode=False)
+
+    sinks = open_sinks(sinks, table_name, [col[0] for col in check_columns], create_query_for,
+                       column_types=[map_oracle_to_postgres(col[1]) for col in check_columns])
+    sinks = close_sinks(fan_out(check_rows, sinks))
+    if len(sinks) < 2:
+        raise RuntimeError(f"Only {[sink.name for sink in sinks]} received {table_name}")
+    return run_id
+
+def check_ingest_handoff(keep_schema=False):
+    """
+    Returns the list of failures, empty when the ETL reads the ingested COLLISIONS from the Arrow handoff and
+    the key of a view over it is the ingest run.
+    """
+    postgres_db = connect_check_db()
+    handoff_dir = tempfile.mkdtemp(prefix='fusion_handoff_check_')
+    failures = []
+    try:
+        run_id = ingest_check_collisions(postgres_db, handoff_dir)
+        # Same call as fetch_and_transform_oracle_collisions
+        df = read_arrow_handoff(postgres_db, handoff_dir, 'oracle_collisions', case_years=[2020, None])
+        if df is None:
+            failures.append("the ETL did not use the Arrow handoff of oracle_COLLISIONS")
+        elif sorted(df['id']) != [1, 3]:
+            failures.append(f"expected ids [1, 3] for case years 2020 and none, read {sorted(df['id'])}")
+
+        # A view over the table, like vw_valid_collision_from_oracle, is keyed by the recorded run, not a full-table hash
+        postgres_db.execute_query("CREATE VIEW vw_check_valid_collisions AS SELECT id AS collision_id FROM oracle_collisions")
+        _, markers = get_view_source_markers(postgres_db, 'vw_check_valid_collisions')
+        if markers != [(f"{CHECK_SCHEMA}.oracle_collisions", f"run:{run_id}")]:
+            failures.append(f"the view's source markers are {markers}, expected the ingest run {run_id}")
+        source_key = get_view_source_key(postgres_db, 'vw_check_valid_collisions')
+        ingest_check_collisions(postgres_db, handoff_dir)  # the reload drops the view with the table
+        postgres_db.execute_query("CREATE VIEW vw_check_valid_collisions AS SELECT id AS collision_id FROM oracle_collisions")
+        if get_view_source_key(postgres_db, 'vw_check_valid_collisions') == source_key:
+            failures.append("a new ingest run did not change the view's source key")
+    except Exception as e:
+        failures.append(f"ingest or read failed: {e}")
+    finally:
+        shutil.rmtree(handoff_dir, ignore_errors=True)
+        if not keep_schema:
+            postgres_db.execute_query(f"DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE;")
+        postgres_db.close_connection()
+
+    for failure in failures:
+        print(f"FAILED {failure}")
+    if not failures:
+        print("Ingest handoff check passed: the ETL reads the ingested COLLISIONS from the Arrow handoff, keyed by its run")
+    return failures
+
+if __name__ == "__main__":
+    sys.exit(1 if check_ingest_handoff() else 0)
@@ -1,6 +1,5 @@
 # This creates all the empty tables for eCollision Fusion DB. The specification and formats of these tables will be the same as eCollision Analytics DB's.
 
-import pandas as pd
 from dotenv import load_dotenv
 import os
 import logging
@@ -8,6 +7,8 @@ import logging
 from reference import ecollision_analytics_db_table_primary_key
 from helper import time_execution
 from helper_db_operation import AnalyticsDB, PostgreSQLDB, map_analytics_db_to_postgres
+from helper_partition import PARTITION_COLUMN, case_year_partition_name
+from helper_frozen_years import clear_year_refresh_state
 
 # Set up logging configuration
 logging.basicConfig(level=logging.CRITICAL, 
@@ -15,30 +16,48 @@ logging.basicConfig(level=logging.CRITICAL,
 
 load_dotenv()
 
-def create_fusion_table_query(table_name, columns, constraints, dev_mode=False):
+def create_fusion_table_query(table_name, columns, constraints, dev_mode=False, partition_by_case_year=False):
     # Use the "fusion_" prefix instead of "analytics_"
     suffix = "_dev" if dev_mode else ""
     prefixed_table_name = f"fusion_{table_name}{suffix}"
     column_defs = []
     primary_key_column = ecollision_analytics_db_table_primary_key.get(table_name)
 
+    # Only tables that carry a case_year can be range partitioned by it
+    if partition_by_case_year and not any(column[0].lower() == PARTITION_COLUMN for column in columns):
+        logging.warning(f"Table {table_name} has no {PARTITION_COLUMN} column; creating it unpartitioned.")
+        partition_by_case_year = False
+
     for column in columns:
         col_name = column[0]
         data_type = map_analytics_db_to_postgres(column[1])
         nullable = 'NOT NULL' if column[3] == 'NO' else ''
+        if partition_by_case_year and col_name.lower() == PARTITION_COLUMN:
+            nullable = ''  # rows without a case year must still reach the default partition
         column_defs.append(f"{col_name} {data_type} {nullable}".strip())
 
     # Add the SOURCE column to all tables (i.e., "eCollision Oracle" or "eCollision Analytics")
     column_defs.append("SOURCE TEXT")
 
-    if primary_key_column:
+    if primary_key_column and partition_by_case_year:
+        # A unique key on a partitioned table must include the partition key; a PRIMARY KEY would also make
+        # case_year NOT NULL and reject the rows without a case year that the default partition is there for
+        column_defs.append(f"UNIQUE ({primary_key_column}, {PARTITION_COLUMN.upper()})")
+    elif primary_key_column:
         column_defs.append(f"PRIMARY KEY ({primary_key_column})")
 
+    if partition_by_case_year:
+        # Per-year partitions are attached by the ETL; the default partition catches rows without a case_year
+        create_statement = f"""CREATE TABLE {prefixed_table_name} ({', '.join(column_defs)}) PARTITION BY RANGE ({PARTITION_COLUMN});
+            CREATE TABLE {case_year_partition_name(prefixed_table_name, None)} PARTITION OF {prefixed_table_name} DEFAULT;"""
+    else:
+        create_statement = f"CREATE TABLE {prefixed_table_name} ({', '.join(column_defs)});"
+
     create_query = f"""
     DO $$
     BEGIN
-        IF NOT EXISTS (SELECT FROM information_schema.tables WHERE table_name = '{prefixed_table_name.lower()}') THEN
-            CREATE TABLE {prefixed_table_name} ({', '.join(column_defs)});
+        IF to_regclass('{prefixed_table_name.lower()}') IS NULL THEN
+            {create_statement}
         END IF;
     END $$;
     """
@@ -47,7 +66,8 @@ def create_fusion_table_query(table_name, columns, constraints, dev_mode=False):
     return create_query
 
 @time_execution
-def create_empty_fusion_tables_in_postgres(tables=None, dev_mode=False, drop_existing=False):
+def create_empty_fusion_tables_in_postgres(tables=None, dev_mode=False, drop_existing=False, partition_by_case_year=False,
+                                           raise_errors=False):
     try:
         logging.info("Starting operation to create empty tables in PostgreSQL.")
 
@@ -87,6 +107,7 @@ def create_empty_fusion_tables_in_postgres(tables=None, dev_mode=False, drop_exi
                 try:
                     logging.debug(f"Dropping existing table: {prefixed_table_name}")
                     postgres_db.execute_query(drop_query)
+                    clear_year_refresh_state(postgres_db, prefixed_table_name)  # its recorded frozen years are gone with it
                 except Exception as e:
                     logging.error(f"Failed to drop table {table_name}: {e}")
                     continue
@@ -94,13 +115,16 @@ def create_empty_fusion_tables_in_postgres(tables=None, dev_mode=False, drop_exi
             # Fetch columns and constraints
             columns = analytics_db.get_table_columns(table_name)
             constraints = analytics_db.get_constraints(table_name)
-            create_query = create_fusion_table_query(table_name, columns, constraints, dev_mode=dev_mode)
+            create_query = create_fusion_table_query(table_name, columns, constraints, dev_mode=dev_mode,
+                                                     partition_by_case_year=partition_by_case_year)
 
             try:
                 logging.debug(f"Executing create table query for {table_name}.")
                 postgres_db.execute_query(create_query)
             except Exception as e:
                 logging.error(f"Failed to create table {table_name}: {e}")
+                if raise_errors:
+                    raise
 
         # Closing connections
         logging.debug("Closing database connections.")
@@ -110,11 +134,15 @@ def create_empty_fusion_tables_in_postgres(tables=None, dev_mode=False, drop_exi
 
     except Exception as e:
         logging.error(f"An error occurred during the table creation process: {e}")
+        if raise_errors:
+            raise
         
 if __name__ == "__main__":
     dev_mode = True
     drop_existing = True
+    partition_by_case_year = False  # Set to True to range partition tables with a case_year column (e.g. COLLISIONS)
     tables_to_create = ['COLLISIONS', 'CL_OBJECTS', 'CLOBJ_PARTY_INFO', 'CLOBJ_PROPERTY_INFO', 'ECR_COLL_PLOTTING_INFO',
                          'CODE_TYPE_VALUES', 'CODE_TYPES', 'CL_STATUS_HISTORY', 'ECR_SYNCHRONIZATION_ACTION_ETL',
                          'ECR_SYNCHRONIZATION_ACTION_LOG_ETL']
-    create_empty_fusion_tables_in_postgres(tables=tables_to_create, dev_mode=dev_mode, drop_existing=drop_existing)
+    create_empty_fusion_tables_in_postgres(tables=tables_to_create, dev_mode=dev_mode, drop_existing=drop_existing,
+                                           partition_by_case_year=partition_by_case_year)
@@ -0,0 +1,32 @@
+-- Validity cutoff calendar used by vw_valid_collision_from_oracle.
+-- Each record specifies a created year and the corresponding maximum date until which collisions are considered valid.
+-- Once a year's cutoff_end_date has passed, the fusion ETL treats that year as frozen and only reloads it if its source data changes.
+-- To open a new year, insert a row here; no change to the view is needed.
+CREATE TABLE IF NOT EXISTS collision_cutoff_dates (
+    created_year INTEGER PRIMARY KEY,
+    cutoff_end_date DATE NOT NULL
+);
+
+INSERT INTO collision_cutoff_dates (created_year, cutoff_end_date) VALUES
+    (2024, TO_DATE('2026-06-30', 'YYYY-MM-DD')),
+    (2023, TO_DATE('2025-06-30', 'YYYY-MM-DD')),
+    (2022, TO_DATE('2024-06-30', 'YYYY-MM-DD')),
+    (2021, TO_DATE('2023-02-06', 'YYYY-MM-DD')),
+    (2020, TO_DATE('2022-06-15', 'YYYY-MM-DD')),
+    (2019, TO_DATE('2021-10-23', 'YYYY-MM-DD')),
+    (2018, TO_DATE('2020-01-23', 'YYYY-MM-DD')),
+    (2017, TO_DATE('2019-02-11', 'YYYY-MM-DD')),
+    (2016, TO_DATE('2018-01-26', 'YYYY-MM-DD')),
+    (2015, TO_DATE('2016-01-02', 'YYYY-MM-DD')),
+    (2014, TO_DATE('2015-01-02', 'YYYY-MM-DD')),
+    (2013, TO_DATE('2014-01-02', 'YYYY-MM-DD')),
+    (2012, TO_DATE('2013-01-02', 'YYYY-MM-DD')),
+    (2011, TO_DATE('2012-01-02', 'YYYY-MM-DD')),
+    (2010, TO_DATE('2011-01-02', 'YYYY-MM-DD')),
+    (2009, TO_DATE('2010-01-02', 'YYYY-MM-DD')),
+    (2008, TO_DATE('2009-01-02', 'YYYY-MM-DD')),
+    (2007, TO_DATE('2008-01-02', 'YYYY-MM-DD')),
+    (2006, TO_DATE('2007-01-02', 'YYYY-MM-DD')),
+    (2005, TO_DATE('2006-01-02', 'YYYY-MM-DD')),
+    (2004, TO_DATE('2005-01-02', 'YYYY-MM-DD'))
+ON CONFLICT (created_year) DO UPDATE SET cutoff_end_date = EXCLUDED.cutoff_end_date;
@@ -2,11 +2,24 @@ import pandas as pd
 from dotenv import load_dotenv
 import os
 import logging
-from datetime import datetime
+from datetime import date, datetime
 
-from reference import ecollision_analytics_db_table_primary_key
+from reference import (ecollision_analytics_db_table_primary_key, fusion_code_columns, fusion_merge_keys,
+                       fusion_source_precedence, fusion_column_precedence)
 from helper import time_execution, set_pandas_display_options
 from helper_db_operation import AnalyticsDB, OracleDB, PostgreSQLDB, map_analytics_db_to_postgres
+from helper_code_lookup import get_code_lookup_cache
+from helper_partition import load_by_case_year_partitions
+from helper_profiling import profile_stage
+from helper_frozen_years import (get_case_year_cutoffs, get_source_fingerprints, get_table_fingerprints, combine_fingerprints,
+                                 get_recorded_fingerprints, plan_year_refresh, case_year_filter,
+                                 record_year_refresh, get_loaded_case_years, own_case_year_expression)
+from helper_merge import merge_by_precedence, write_conflict_report
+from helper_rollup import refresh_rollup
+from helper_membership_index import get_valid_collision_index
+from helper_arrow_handoff import read_arrow_handoff
+from helper_duckdb_transform import (TRANSFORM_BACKENDS, connect_duckdb, attach_postgres, source_relation,
+                                     transform_oracle_collisions_duckdb, compare_transform_results)
 
 # Set up logging configuration
 logging.basicConfig(level=logging.CRITICAL, 
@@ -15,10 +28,6 @@ logging.basicConfig(level=logging.CRITICAL,
 load_dotenv()
 set_pandas_display_options()
 
-# Control panel
-dev_mode = True
-drop_existing = True
-
 # Helper functions
 def extract_case_year(df):
     """
@@ -26,114 +35,351 @@ def extract_case_year(df):
     otherwise uses `reported_timestamp`. If both are missing, sets `case_year` to None.
     """
     df['case_year'] = df['occurence_timestamp'].fillna(df['reported_timestamp'])
-    df['case_year'] = pd.to_datetime(df['case_year'], errors='coerce').dt.year
+    df['case_year'] = pd.to_datetime(df['case_year'], errors='coerce').dt.year.astype('Int64')
     return df
 
+def transform_oracle_collisions(df_oracle_collisions_table_filtered, postgres_db, dev_mode=False):
+    """
+    Format valid oracle_collisions rows to match eCollision Analytics
+    (according to supplementary/column_mapping_btw_analytics_and_oracle_tables.xlsx).
+    """
+    # Apply the function to calculate case_year
+    df_oracle_collisions_table_filtered = extract_case_year(df_oracle_collisions_table_filtered)
+
+    # Change column name from 'fatal_comment' to 'fatal_comments'
+    df_oracle_collisions_table_filtered = df_oracle_collisions_table_filtered.rename(columns={'fatal_comment': 'fatal_comments'})
+
+    # Create column occurence_timestring that extracts year/month/day from occurence_timestamp
+    df_oracle_collisions_table_filtered['occurence_timestring'] = df_oracle_collisions_table_filtered['occurence_timestamp'].dt.strftime('%Y-%m-%d')
+
+    # Add a "source" column with the value "eCollision Oracle"
+    df_oracle_collisions_table_filtered['source'] = "eCollision Oracle"
+
+    # Validate code columns and decode the description columns that Analytics carries (e.g. file_status_desc)
+    # The lookup cache is built once per run from CODE_TYPES/CODE_TYPE_VALUES and shared by all table transforms
+    code_lookup = get_code_lookup_cache(postgres_db, dev_mode=dev_mode)
+    df_oracle_collisions_table_filtered = code_lookup.decode_columns(df_oracle_collisions_table_filtered, fusion_code_columns['COLLISIONS'])
+
+    return df_oracle_collisions_table_filtered
+
+def fetch_and_transform_oracle_collisions(postgres_db, valid_collision_index, collisions_year_filter, dev_mode=False,
+                                          handoff_dir=None, case_years=None):
+    """
+    Fetch oracle_collisions for the case years in `collisions_year_filter`, keep the valid ones and transform them in pandas.
+    With `handoff_dir`, the ingest run's Arrow IPC file is memory-mapped instead when it is fresh (filtered to `case_years`).
+    """
+    # Query to fetch all collisions from Oracle table
+    sql_query_get_collisions_table_from_oracle = f"""
+        SELECT *
+        FROM public.oracle_collisions
+        WHERE {collisions_year_filter}
+    """
+
+    # Read the Arrow handoff of the ingest run that loaded oracle_collisions, if it is still current
+    df_oracle_collisions_table = None
+    if handoff_dir:
+        with profile_stage("etl_collisions_read_arrow_handoff"):
+            df_oracle_collisions_table = read_arrow_handoff(postgres_db, handoff_dir, 'oracle_collisions', case_years=case_years)
+
+    # Otherwise execute query and load results into a Pandas DataFrame
+    if df_oracle_collisions_table is None:
+        try:
+            logging.debug("Fetching all collisions from oracle_collisions into DataFrame.")
+            with profile_stage("etl_collisions_fetch_oracle_collisions"):
+                df_oracle_collisions_table = pd.read_sql(sql_query_get_collisions_table_from_oracle, postgres_db.conn)
+            logging.debug(f"Fetched {len(df_oracle_collisions_table)} rows of valid collisions.")
+        except Exception as e:
+            logging.error(f"Error while fetching data from Oracle view: {e}")
+            raise
+
+    # Filter df_oracle_collisions_table to include only rows where the ID is in the valid collision ID index
+    df_oracle_collisions_table_filtered = valid_collision_index.filter(df_oracle_collisions_table, 'id')
+
+    # Check the result of the filtering
+    logging.debug(f"Filtered {len(df_oracle_collisions_table_filtered)} valid collisions.")
+
+    # Format fields to match that of eCollision Analytics
+    with profile_stage("etl_collisions_transform"):
+        df_oracle_collisions_table_filtered = transform_oracle_collisions(df_oracle_collisions_table_filtered, postgres_db, dev_mode=dev_mode)
+    return df_oracle_collisions_table_filtered
+
+def transform_oracle_collisions_with_duckdb(valid_collision_index, collisions_year_filter, dev_mode=False, extract_dir=None, threads=None):
+    """
+    DuckDB equivalent of fetch_and_transform_oracle_collisions(). It reads the PostgreSQL staging tables through
+    DuckDB's postgres extension, or `<extract_dir>/<table>.parquet` extracts when `extract_dir` is given.
+    """
+    con = connect_duckdb(threads=threads)
+    try:
+        if not extract_dir:
+            attach_postgres(con, os.getenv('ECOLLISION_FUSION_SQL_HOST_NAME'), os.getenv('ECOLLISION_FUSION_SQL_DATABASE_NAME'),
+                            os.getenv('ECOLLISION_FUSION_SQL_USERNAME'), os.getenv('ECOLLISION_FUSION_SQL_PASSWORD'))
+        code_values_table = f"oracle_code_type_values{'_dev' if dev_mode else ''}"
+        df = transform_oracle_collisions_duckdb(con, source_relation('oracle_collisions', extract_dir),
+                                                source_relation(code_values_table, extract_dir), fusion_code_columns['COLLISIONS'],
+                                                valid_collision_index, year_filter=collisions_year_filter)
+    finally:
+        con.close()
+    logging.debug(f"Transformed {len(df)} valid collisions with DuckDB.")
+    return df
+
+def fetch_analytics_collisions(postgres_db, year_filter="TRUE", analytics_table='public.analytics_collisions'):
+    """
+    Fetch the valid Analytics-only collisions matching `year_filter` (over the alias `ac`). Their case_year is
+    Analytics' own, filled from the timestamps where missing (own_case_year_expression), as they are fingerprinted.
+    """
+    sql_query_get_collisions_table_from_analytics = f"""
+        SELECT ac.*, {own_case_year_expression('ac')} AS fusion_case_year
+        FROM {analytics_table} ac
+        JOIN vw_valid_collision_from_analytics_not_in_oracle v ON v.id = ac.id
+        WHERE {year_filter}
+    """
+    try:
+        logging.debug("Fetching Analytics-only collisions into DataFrame.")
+        with profile_stage("etl_collisions_fetch_analytics_collisions"):
+            df_analytics_collisions = pd.read_sql(sql_query_get_collisions_table_from_analytics, postgres_db.conn)
+        logging.debug(f"Fetched {len(df_analytics_collisions)} rows of Analytics-only collisions.")
+    except Exception as e:
+        logging.error(f"Error while fetching data from Analytics view: {e}")
+        raise
+
+    df_analytics_collisions['source'] = "eCollision Analytics"
+    df_analytics_collisions['case_year'] = df_analytics_collisions.pop('fusion_case_year').astype('Int64')
+    return df_analytics_collisions
+
+def select_case_years(df, case_years):
+    """ Keep the rows of `df` whose case_year is in `case_years` (None keeps rows without a case year). """
+    mask = df['case_year'].isin([year for year in case_years if year is not None])
+    if None in case_years:
+        mask |= df['case_year'].isna()
+    return df[mask]
+
+def load_collisions_target(postgres_db, df_collisions, target_table, drop_existing=True, partition_by_case_year=False,
+                           years_to_refresh=None):
+    """
+    Load the transformed collisions into one Fusion target table. With `years_to_refresh`, only those
+    case years are replaced; otherwise the whole table is (when `drop_existing`).
+    """
+    # Fetch the target table schema to determine the column names dynamically
+    try:
+        query_table_schema = f"""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = '{target_table}';
+        """
+        df_table_schema = pd.read_sql(query_table_schema, postgres_db.conn)
+        target_columns = df_table_schema['column_name'].tolist()
+        logging.debug(f"Fetched {len(target_columns)} columns for the target table {target_table}.")
+    except Exception as e:
+        logging.error(f"Error fetching schema for table {target_table}: {e}")
+        raise
+
+    # Dynamically match columns between the DataFrame and the target table
+    # Select only the columns present in both the DataFrame and the table
+    df_for_insertion = df_collisions[[col for col in df_collisions.columns if col in target_columns]]
+
+    # A partitioned target is refreshed one case_year partition at a time instead of with a full-table DELETE
+    if partition_by_case_year:
+        try:
+            with profile_stage("etl_collisions_load"):
+                load_by_case_year_partitions(postgres_db, target_table, df_for_insertion, case_years=years_to_refresh)
+            logging.info(f"Successfully swapped {len(df_for_insertion)} rows into the case_year partitions of {target_table}.")
+        except Exception as e:
+            logging.error(f"Error while swapping case_year partitions of table {target_table}: {e}")
+            raise
+        return
+
+    # If drop_existing is True, delete the existing content of the table
+    # When skipping frozen years, only the refreshed case years are deleted (and always, since they are reloaded in full)
+    if drop_existing or years_to_refresh is not None:
+        try:
+            delete_query = f"DELETE FROM {target_table} WHERE {case_year_filter(years_to_refresh, 'case_year') if years_to_refresh is not None else 'TRUE'};"
+            postgres_db.execute_query(delete_query)
+            logging.debug(f"Deleted existing content in the table: {target_table}")
+        except Exception as e:
+            logging.error(f"Error while deleting content from the table {target_table}: {e}")
+            raise
+
+    # Insert the filtered and dynamically mapped data into PostgreSQL
+    try:
+        with profile_stage("etl_collisions_load"):
+            postgres_db.bulk_insert_dataframe(df_for_insertion, target_table)
+        logging.info(f"Successfully imported {len(df_for_insertion)} rows into {target_table}.")
+    except Exception as e:
+        logging.error(f"Error while inserting data into table {target_table}: {e}")
+        raise
+
 ###########################
 ###########################
 ###########################
-# 1) ETL Collisions table for Fusion
-# 1.1) connect and get the set of valid collision IDs from vw_valid_collision_from_oracle
-# Connect to PostgreSQL
-postgres_host = os.getenv('ECOLLISION_FUSION_SQL_HOST_NAME')
-postgres_db_name = os.getenv('ECOLLISION_FUSION_SQL_DATABASE_NAME')
-postgres_user = os.getenv('ECOLLISION_FUSION_SQL_USERNAME')
-postgres_password = os.getenv('ECOLLISION_FUSION_SQL_PASSWORD')
-
-logging.debug("Connecting to PostgreSQL DB.")
-postgres_db = PostgreSQLDB(postgres_user, postgres_password, postgres_host, postgres_db_name)
-
-# Query to fetch valid collision IDs from Oracle view
-sql_query_get_valid_collision_case_from_oracle = """
-    SELECT collision_id
-    FROM vw_valid_collision_from_oracle
-"""
-
-# Execute query and load results into a Pandas DataFrame
-try:
-    logging.debug("Fetching valid collisions from Oracle view into DataFrame.")
-    df_oracle_valid_cases = pd.read_sql(sql_query_get_valid_collision_case_from_oracle, postgres_db.conn)
-    logging.debug(f"Fetched {len(df_oracle_valid_cases)} rows of valid collisions.")
-except Exception as e:
-    logging.error(f"Error while fetching data from Oracle view: {e}")
-    raise
-
-# 1.2) connect oracle_collisions, then apply the filter from 1.1) to exclude invalid collisions
-# Query to fetch all collisions from Oracle table
-sql_query_get_collisions_table_from_oracle = """
-    SELECT *
-    FROM public.oracle_collisions
-"""
-
-# Execute query and load results into a Pandas DataFrame
-try:
-    logging.debug("Fetching all collisions from oracle_collisions into DataFrame.")
-    df_oracle_collisions_table = pd.read_sql(sql_query_get_collisions_table_from_oracle, postgres_db.conn)
-    logging.debug(f"Fetched {len(df_oracle_collisions_table)} rows of valid collisions.")
-except Exception as e:
-    logging.error(f"Error while fetching data from Oracle view: {e}")
-    raise
-
-# Apply the filter to include only those collisions that are in the valid list from df_oracle_valid_cases
-valid_collision_ids = df_oracle_valid_cases['collision_id'].tolist()
-
-# Filter df_oracle_collisions_table to include only rows where the ID is in the valid collision IDs
-df_oracle_collisions_table_filtered = df_oracle_collisions_table[df_oracle_collisions_table['id'].isin(valid_collision_ids)]
-
-# Check the result of the filtering
-logging.debug(f"Filtered {len(df_oracle_collisions_table_filtered)} valid collisions.")
-
-# 1.3) format fields to match that of eCollision Analytics (according to supplementary/column_mapping_btw_analytics_and_oracle_tables.xlsx)
-# Apply the function to calculate case_year
-df_oracle_collisions_table_filtered = extract_case_year(df_oracle_collisions_table_filtered)
-
-# Change column name from 'fatal_comment' to 'fatal_comments'
-df_oracle_collisions_table_filtered = df_oracle_collisions_table_filtered.rename(columns={'fatal_comment': 'fatal_comments'})
-
-# Create column occurence_timestring that extracts year/month/day from occurence_timestamp
-df_oracle_collisions_table_filtered['occurence_timestring'] = df_oracle_collisions_table_filtered['occurence_timestamp'].dt.strftime('%Y-%m-%d')
-
-# Add a "source" column with the value "eCollision Oracle"
-df_oracle_collisions_table_filtered['source'] = "eCollision Oracle"
-
-# 1.4) import into Fusion's Collisions table
-# Determine the target table based on dev_mode
-target_table = 'fusion_collisions_dev' if dev_mode else 'fusion_collisions'
-
-# Fetch the target table schema to determine the column names dynamically
-try:
-    query_table_schema = f"""
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_name = '{target_table}';
-    """
-    df_table_schema = pd.read_sql(query_table_schema, postgres_db.conn)
-    target_columns = df_table_schema['column_name'].tolist()
-    logging.debug(f"Fetched {len(target_columns)} columns for the target table {target_table}.")
-except Exception as e:
-    logging.error(f"Error fetching schema for table {target_table}: {e}")
-    raise
-
-# Dynamically match columns between the DataFrame and the target table
-# Select only the columns present in both the DataFrame and the table
-df_for_insertion = df_oracle_collisions_table_filtered[
-    [col for col in df_oracle_collisions_table_filtered.columns if col in target_columns]
-]
-
-# If drop_existing is True, delete the existing content of the table
-if drop_existing:
+@time_execution
+def run_collisions_etl(dev_mode=True, drop_existing=True, partition_by_case_year=False, skip_frozen_years=True,
+                       merge_analytics=True, refresh_rollups=True, valid_ids_cache_path=None, targets=None,
+                       transform_backend='pandas', duckdb_extract_dir=None, duckdb_threads=None, verify_transform_backend=False,
+                       arrow_handoff_dir=None):
+    """
+    ETL the valid eCollision Oracle collisions into Fusion's Collisions table.
+
+    - partition_by_case_year must match how the fusion tables were created (see create_empty_tables_for_ecollision_fusion.py)
+    - skip_frozen_years only recomputes case years whose cutoff is still open or whose source data changed
+    - merge_analytics adds the Analytics-only collisions, resolving overlaps with Oracle by source precedence
+    - refresh_rollups recomputes the <target>_rollup counts for the reloaded case years (see helper_rollup.py)
+    - valid_ids_cache_path memory-maps the valid collision ID index from that .npy file while its .key still matches
+      the view's sources, or (re)builds and saves it there
+    - targets loads the one extracted and transformed result into several tables at once: 'prod' (fusion_collisions)
+      and/or 'dev' (fusion_collisions_dev); it defaults to the table `dev_mode` selects. A failing target is
+      logged and does not stop the others.
+    - transform_backend 'duckdb' filters and transforms oracle_collisions in DuckDB (multi-threaded, spills to disk)
+      from the staging tables or from parquet extracts in duckdb_extract_dir; verify_transform_backend runs both
+      backends and raises unless their results are identical
+    - arrow_handoff_dir memory-maps oracle_collisions from the Arrow IPC file the ingest wrote there (pandas backend),
+      falling back to PostgreSQL when the file is missing or from another ingest run than the last load
+    """
+    # 1) ETL Collisions table for Fusion
+    # 1.1) connect and get the set of valid collision IDs from vw_valid_collision_from_oracle
+    # Connect to PostgreSQL
+    postgres_host = os.getenv('ECOLLISION_FUSION_SQL_HOST_NAME')
+    postgres_db_name = os.getenv('ECOLLISION_FUSION_SQL_DATABASE_NAME')
+    postgres_user = os.getenv('ECOLLISION_FUSION_SQL_USERNAME')
+    postgres_password = os.getenv('ECOLLISION_FUSION_SQL_PASSWORD')
+
+    logging.debug("Connecting to PostgreSQL DB.")
+    postgres_db = PostgreSQLDB(postgres_user, postgres_password, postgres_host, postgres_db_name)
+
+    # Determine the target tables; dev_mode still selects the code tables the transform decodes with
+    targets = targets or ['dev' if dev_mode else 'prod']
+    unknown_targets = [target for target in targets if target not in ('prod', 'dev')]
+    if unknown_targets:
+        raise ValueError(f"Unknown targets {unknown_targets}; expected 'prod' and/or 'dev'.")
+    target_tables = {target: 'fusion_collisions_dev' if target == 'dev' else 'fusion_collisions' for target in targets}
+
+    # Decide which case years need recomputing per target; years past their cutoff with unchanged source data are frozen
+    # The source is read once for the union of the years any target needs
+    years_to_refresh_by_target = {}
+    if skip_frozen_years:
+        try:
+            source_fingerprints = get_source_fingerprints(postgres_db, 'public.oracle_collisions', 'public.oracle_cl_status_history',
+                                                          'public.collision_cutoff_dates')
+            # Cutoffs by case year, via the created year of each collision as the valid collision view applies them
+            cutoff_calendar = get_case_year_cutoffs(postgres_db, 'public.oracle_collisions', 'public.oracle_cl_status_history',
+                                                    'public.collision_cutoff_dates')
+            if merge_analytics:
+                analytics_fingerprints = get_table_fingerprints(postgres_db, 'public.analytics_collisions', own_case_year_expression('src'))
+                source_fingerprints = combine_fingerprints(source_fingerprints, analytics_fingerprints)
+                # Analytics-only collisions are valid without a cutoff, so their years only wait for unchanged rows
+                for case_year in analytics_fingerprints:
+                    if case_year is not None:
+                        cutoff_calendar.setdefault(case_year, date.min)
+            for target, target_table in target_tables.items():
+                # The recorded state alone could freeze years that were truncated or dropped from the target since
+                recorded_fingerprints = get_recorded_fingerprints(postgres_db, target_table)
+                years_to_refresh_by_target[target], _ = plan_year_refresh(
+                    source_fingerprints, recorded_fingerprints, cutoff_calendar,
+                    loaded_years=get_loaded_case_years(postgres_db, target_table, recorded_fingerprints)
+                )
+            years_to_refresh = sorted(set().union(*years_to_refresh_by_target.values()), key=str)
+            collisions_year_filter = case_year_filter(years_to_refresh)
+            analytics_year_filter = case_year_filter(years_to_refresh, own_case_year_expression('ac'))
+        except Exception as e:
+            logging.error(f"Error while planning the case years to refresh: {e}")
+            raise
+    else:
+        collisions_year_filter = "TRUE"
+        analytics_year_filter = "TRUE"
+
+    # Build (or memory-map from valid_ids_cache_path) the sorted index of valid collision IDs from vw_valid_collision_from_oracle
+    # The index is shared by every fusion table transform in this process
     try:
-        delete_query = f"DELETE FROM {target_table};"
-        postgres_db.execute_query(delete_query)
-        logging.debug(f"Deleted existing content in the table: {target_table}")
+        logging.debug("Building the valid collision ID index from the Oracle view.")
+        with profile_stage("etl_collisions_fetch_valid_ids"):
+            valid_collision_index = get_valid_collision_index(postgres_db, cache_path=valid_ids_cache_path)
+        logging.debug(f"Indexed {len(valid_collision_index)} valid collisions.")
     except Exception as e:
-        logging.error(f"Error while deleting content from the table {target_table}: {e}")
+        logging.error(f"Error while fetching data from Oracle view: {e}")
         raise
 
-# Insert the filtered and dynamically mapped data into PostgreSQL
-try:
-    postgres_db.bulk_insert_dataframe(df_for_insertion, target_table)
-    logging.info(f"Successfully imported {len(df_for_insertion)} rows into {target_table}.")
-except Exception as e:
-    logging.error(f"Error while inserting data into table {target_table}: {e}")
-    raise
+    # 1.2) connect oracle_collisions, then apply the filter from 1.1) to exclude invalid collisions
+    # 1.3) format fields to match that of eCollision Analytics (according to supplementary/column_mapping_btw_analytics_and_oracle_tables.xlsx)
+    # The DuckDB backend does 1.2) and 1.3) in one multi-threaded query instead of pandas (see helper_duckdb_transform.py)
+    if transform_backend not in TRANSFORM_BACKENDS:
+        raise ValueError(f"Unknown transform backend {transform_backend}; expected one of {TRANSFORM_BACKENDS}.")
+    if transform_backend == 'pandas' or verify_transform_backend:
+        df_oracle_collisions_table_filtered = fetch_and_transform_oracle_collisions(postgres_db, valid_collision_index,
+                                                                                    collisions_year_filter, dev_mode=dev_mode,
+                                                                                    handoff_dir=arrow_handoff_dir,
+                                                                                    case_years=years_to_refresh if skip_frozen_years else None)
+    if transform_backend == 'duckdb' or verify_transform_backend:
+        with profile_stage("etl_collisions_transform_duckdb"):
+            df_duckdb_collisions = transform_oracle_collisions_with_duckdb(valid_collision_index, collisions_year_filter,
+                                                                           dev_mode=dev_mode, extract_dir=duckdb_extract_dir,
+                                                                           threads=duckdb_threads)
+        if verify_transform_backend:
+            differences = compare_transform_results(df_oracle_collisions_table_filtered, df_duckdb_collisions)
+            if differences:
+                raise ValueError(f"DuckDB and pandas transforms differ: {differences}")
+            logging.info(f"DuckDB and pandas transforms are identical ({len(df_duckdb_collisions)} rows).")
+        df_oracle_collisions_table_filtered = df_duckdb_collisions
+
+    # 1.4) merge the Analytics-only collisions; rows that overlap Oracle on id or case_nbr are resolved by source precedence
+    if merge_analytics:
+        df_analytics_collisions = fetch_analytics_collisions(postgres_db, analytics_year_filter)
+
+        with profile_stage("etl_collisions_merge"):
+            df_oracle_collisions_table_filtered, df_merge_conflicts = merge_by_precedence(
+                [df_oracle_collisions_table_filtered, df_analytics_collisions],
+                keys=fusion_merge_keys['COLLISIONS'],
+                source_precedence=fusion_source_precedence,
+                column_precedence=fusion_column_precedence['COLLISIONS'],
+            )
+
+    # 1.5) import into each of Fusion's Collisions target tables
+    failed_targets = []
+    for target, target_table in target_tables.items():
+        target_years = years_to_refresh_by_target.get(target)
+        df_target = df_oracle_collisions_table_filtered
+        # Also drops Analytics rows whose own case_year lies outside the planned years, so no other partition is replaced
+        if target_years is not None:
+            df_target = select_case_years(df_target, target_years)
+        try:
+            load_collisions_target(postgres_db, df_target, target_table, drop_existing=drop_existing,
+                                   partition_by_case_year=partition_by_case_year, years_to_refresh=target_years)
+
+            if merge_analytics:
+                conflict_report_table = 'fusion_merge_conflicts_dev' if target == 'dev' else 'fusion_merge_conflicts'
+                df_target_conflicts = df_merge_conflicts if target_years is None else select_case_years(df_merge_conflicts, target_years)
+                write_conflict_report(postgres_db, df_target_conflicts, conflict_report_table, case_years=target_years)
+
+            # Keep the rollup used by dashboards in step with the reloaded years
+            if refresh_rollups:
+                with profile_stage("etl_collisions_rollup"):
+                    refresh_rollup(postgres_db, target_table, case_years=target_years)
+
+            # Remember which source data the refreshed years were built from, so they can be skipped once frozen
+            if skip_frozen_years:
+                record_year_refresh(postgres_db, target_table, source_fingerprints, target_years)
+                logging.info(f"Recorded refresh state of {target_table} for {len(target_years)} case years.")
+        except Exception as e:
+            logging.error(f"Loading target {target_table} failed: {e}")
+            failed_targets.append(target_table)
+
+    postgres_db.close_connection()
+    if failed_targets:
+        raise RuntimeError(f"Collisions ETL failed for {failed_targets}; the other targets were loaded.")
+
+if __name__ == "__main__":
+    # Control panel
+    dev_mode = True
+    drop_existing = True
+    partition_by_case_year = False  # Must match how the fusion tables were created (see create_empty_tables_for_ecollision_fusion.py)
+    skip_frozen_years = True  # Only recompute case years whose cutoff is still open or whose source data changed
+
+    merge_analytics = True  # Add Analytics-only collisions; overlaps with Oracle are written to fusion_merge_conflicts
+    refresh_rollups = True  # Recompute fusion_collisions_rollup for the reloaded case years
+    targets = None  # e.g. ['prod', 'dev'] to fill fusion_collisions and fusion_collisions_dev from one extraction
+    transform_backend = 'pandas'  # 'duckdb' runs the filter and transform on all cores (needs the duckdb package)
+    verify_transform_backend = False  # Set to True to run both backends and fail if their results differ
+    arrow_handoff_dir = None  # Same directory as the ingest's handoff_dir to memory-map oracle_collisions from it
+
+    run_collisions_etl(dev_mode=dev_mode, drop_existing=drop_existing, partition_by_case_year=partition_by_case_year,
+                       skip_frozen_years=skip_frozen_years, merge_analytics=merge_analytics,
+                       refresh_rollups=refresh_rollups, targets=targets, transform_backend=transform_backend,
+                       verify_transform_backend=verify_transform_backend, arrow_handoff_dir=arrow_handoff_dir)
@@ -0,0 +1,203 @@
+# Single command-line entry point for the eCollision Fusion pipeline, e.g.
+#     python fusion_etl.py ingest-oracle --tables COLLISIONS CL_STATUS_HISTORY --dev --sample-size 888
+#     python fusion_etl.py etl-collisions --dev
+#     python fusion_etl.py run-pipeline --dev --max-workers 6
+# Each subcommand imports its module (and through it pandas/cx_Oracle/pyodbc) only when it runs,
+# so Postgres-only jobs such as build-views start quickly and never need the Oracle Instant Client.
+# Add --profile DIR before the subcommand to write per-stage profiles, e.g.
+#     python fusion_etl.py --profile profiles etl-collisions --dev
+#     flamegraph.pl profiles/etl_collisions_transform.collapsed > transform.svg
+
+import argparse
+import logging
+import sys
+
+def run_ingest_oracle(args):
+    from ingest_ecollision_oracle_data import backup_oracle_to_postgres
+    backup_oracle_to_postgres(tables=args.tables, sample_size=args.sample_size, drop_existing=args.drop_existing,
+                              dev_mode=args.dev, use_run_plan=args.use_run_plan, dry_run=args.dry_run,
+                              export_dir=args.export_dir, export_compression=args.export_compression,
+                              consistent_sample=args.consistent_sample, sample_seed=args.sample_seed,
+                              sync_schema_only=args.sync_schema, targets=args.targets,
+                              handoff_dir=args.handoff_dir)
+
+def run_ingest_analytics(args):
+    from ingest_ecollision_analytics_data import backup_analytics_to_postgres
+    backup_analytics_to_postgres(tables=args.tables, sample_size=args.sample_size, batch_size=args.batch_size,
+                                 drop_existing=args.drop_existing, dev_mode=args.dev,
+                                 use_run_plan=args.use_run_plan, dry_run=args.dry_run,
+                                 export_dir=args.export_dir, export_compression=args.export_compression,
+                                 consistent_sample=args.consistent_sample, sample_seed=args.sample_seed,
+                                 sync_schema_only=args.sync_schema, targets=args.targets,
+                                 handoff_dir=args.handoff_dir)
+
+def run_load_bundles(args):
+    from load_export_bundles import load_export_bundles
+    load_export_bundles(args.bundle_dir, tables=args.tables, drop_existing=args.drop_existing)
+
+def run_create_fusion_tables(args):
+    from create_empty_tables_for_ecollision_fusion import create_empty_fusion_tables_in_postgres
+    create_empty_fusion_tables_in_postgres(tables=args.tables, dev_mode=args.dev, drop_existing=args.drop_existing,
+                                           partition_by_case_year=args.partition_by_case_year)
+
+def run_build_views(args):
+    from build_fusion_views import build_fusion_views
+    build_fusion_views()
+
+def run_benchmark_views(args):
+    from benchmark_validity_views import benchmark_validity_views
+    failures = benchmark_validity_views(view_sql_file=args.view_sql_file, scales=args.scales, baseline_file=args.baseline_file,
+                                        record_baseline=args.record_baseline, latency_threshold=args.threshold)
+    return 1 if failures else 0
+
+def run_etl_collisions(args):
+    from etl_ecollision_fusion_table_collisions import run_collisions_etl
+    run_collisions_etl(dev_mode=args.dev, drop_existing=args.drop_existing,
+                       partition_by_case_year=args.partition_by_case_year,
+                       skip_frozen_years=not args.no_skip_frozen_years,
+                       merge_analytics=not args.no_merge_analytics,
+                       refresh_rollups=not args.no_refresh_rollups,
+                       valid_ids_cache_path=args.valid_ids_cache, targets=args.targets,
+                       transform_backend=args.transform_backend, duckdb_extract_dir=args.duckdb_extract_dir,
+                       duckdb_threads=args.duckdb_threads, verify_transform_backend=args.verify_transform_backend,
+                       arrow_handoff_dir=args.arrow_handoff_dir)
+
+def run_extract_columnar(args):
+    import os
+    from helper_duckdb_transform import connect_duckdb, attach_postgres, write_columnar_extract
+    con = connect_duckdb(threads=args.duckdb_threads)
+    attach_postgres(con, os.getenv('ECOLLISION_FUSION_SQL_HOST_NAME'), os.getenv('ECOLLISION_FUSION_SQL_DATABASE_NAME'),
+                    os.getenv('ECOLLISION_FUSION_SQL_USERNAME'), os.getenv('ECOLLISION_FUSION_SQL_PASSWORD'))
+    for table_name in args.tables:
+        write_columnar_extract(con, table_name, args.extract_dir)
+    con.close()
+
+def run_pipeline(args):
+    from run_fusion_pipeline import run_fusion_pipeline
+    failures = run_fusion_pipeline(dev_mode=args.dev, sample_size=args.sample_size, consistent_sample=args.consistent_sample,
+                                   sample_seed=args.sample_seed, partition_by_case_year=args.partition_by_case_year,
+                                   max_workers=args.max_workers, force=args.force, dry_run=args.dry_run)
+    return 1 if failures else 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='fusion_etl', description='eCollision Fusion database pipeline.')
+    parser.add_argument('--log-level', default='CRITICAL', help='Python logging level, e.g. DEBUG or INFO.')
+    parser.add_argument('--profile', metavar='DIR', default=None,
+                        help='Profile each stage, writing .pstats and collapsed-stack (flame graph) files to DIR.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_common_arguments(subparser, tables=True):
+        subparser.add_argument('--dev', action='store_true', help='Use the _dev tables.')
+        subparser.add_argument('--drop-existing', action='store_true', help='Drop or empty the target tables first.')
+        if tables:
+            subparser.add_argument('--tables', nargs='+', default=None, help='Tables to process (default: all).')
+
+    def add_export_arguments(subparser):
+        subparser.add_argument('--export-dir', default=None,
+                               help='Write compressed COPY bundles to this directory instead of loading PostgreSQL.')
+        subparser.add_argument('--export-compression', choices=['zstd', 'gzip'], default='zstd')
+        subparser.add_argument('--sync-schema', action='store_true',
+                               help='ALTER existing tables to the source schema and backfill only new columns, instead of reloading them.')
+        subparser.add_argument('--targets', nargs='+', choices=['prod', 'dev', 'export', 'arrow'], default=None,
+                               help='Write each table read once to all of these (default: per --dev, or export with --export-dir).')
+        subparser.add_argument('--handoff-dir', default=None,
+                               help='Also write Arrow IPC files here for etl-collisions --arrow-handoff-dir (the arrow target).')
+
+    def add_sampling_arguments(subparser):
+        subparser.add_argument('--sample-size', type=int, default=None)
+        subparser.add_argument('--consistent-sample', action='store_true',
+                               help='Sample --sample-size collisions by case year plus only their related child rows.')
+        subparser.add_argument('--sample-seed', type=int, default=0, help='Seed for --consistent-sample.')
+
+    ingest_oracle = subparsers.add_parser('ingest-oracle', help='Copy eCollision Oracle tables into oracle_* tables.')
+    add_common_arguments(ingest_oracle)
+    add_sampling_arguments(ingest_oracle)
+    ingest_oracle.add_argument('--use-run-plan', action='store_true', help='Size the run from Oracle table statistics.')
+    ingest_oracle.add_argument('--dry-run', action='store_true', help='Only print the run plan.')
+    add_export_arguments(ingest_oracle)
+    ingest_oracle.set_defaults(func=run_ingest_oracle)
+
+    ingest_analytics = subparsers.add_parser('ingest-analytics', help='Copy eCollision Analytics tables into analytics_* tables.')
+    add_common_arguments(ingest_analytics)
+    add_sampling_arguments(ingest_analytics)
+    ingest_analytics.add_argument('--batch-size', type=int, default=100)
+    ingest_analytics.add_argument('--use-run-plan', action='store_true', help='Size the run from Analytics DB table statistics.')
+    ingest_analytics.add_argument('--dry-run', action='store_true', help='Only print the run plan.')
+    add_export_arguments(ingest_analytics)
+    ingest_analytics.set_defaults(func=run_ingest_analytics)
+
+    load_bundles = subparsers.add_parser('load-bundles', help='Load bundles written with --export-dir into PostgreSQL.')
+    load_bundles.add_argument('bundle_dir')
+    load_bundles.add_argument('--drop-existing', action='store_true', help='Drop the target tables first.')
+    load_bundles.add_argument('--tables', nargs='+', default=None, help='Target tables to load (default: all bundles).')
+    load_bundles.set_defaults(func=run_load_bundles)
+
+    create_fusion_tables = subparsers.add_parser('create-fusion-tables', help='Create the empty fusion_* tables.')
+    add_common_arguments(create_fusion_tables)
+    create_fusion_tables.add_argument('--partition-by-case-year', action='store_true')
+    create_fusion_tables.set_defaults(func=run_create_fusion_tables)
+
+    build_views = subparsers.add_parser('build-views', help='Apply the cutoff calendar and validity view SQL files.')
+    build_views.set_defaults(func=run_build_views)
+
+    benchmark_views = subparsers.add_parser('benchmark-views',
+                                            help='EXPLAIN ANALYZE the validity view on synthetic data and compare with a baseline.')
+    benchmark_views.add_argument('--view-sql-file', default='create_view_vw_valid_collision_from_oracle.sql')
+    benchmark_views.add_argument('--scales', type=int, nargs='+', default=[1000, 10000, 100000])
+    benchmark_views.add_argument('--baseline-file', default='validity_view_baseline.json')
+    benchmark_views.add_argument('--record-baseline', action='store_true', help='Write the baseline instead of comparing.')
+    benchmark_views.add_argument('--threshold', type=float, default=0.2, help='Allowed execution time growth, e.g. 0.2 = 20%%.')
+    benchmark_views.set_defaults(func=run_benchmark_views)
+
+    etl_collisions = subparsers.add_parser('etl-collisions', help='ETL valid collisions into fusion_collisions.')
+    add_common_arguments(etl_collisions, tables=False)
+    etl_collisions.add_argument('--partition-by-case-year', action='store_true')
+    etl_collisions.add_argument('--no-skip-frozen-years', action='store_true', help='Recompute every case year.')
+    etl_collisions.add_argument('--no-merge-analytics', action='store_true', help='Load only the eCollision Oracle collisions.')
+    etl_collisions.add_argument('--no-refresh-rollups', action='store_true', help='Leave fusion_collisions_rollup untouched.')
+    etl_collisions.add_argument('--valid-ids-cache', default=None,
+                                help='.npy file to memory-map the valid collision ID index from (rebuilt when missing or stale).')
+    etl_collisions.add_argument('--targets', nargs='+', choices=['prod', 'dev'], default=None,
+                                help='Load fusion_collisions and/or fusion_collisions_dev from one extraction (default: per --dev).')
+    etl_collisions.add_argument('--transform-backend', choices=['pandas', 'duckdb'], default='pandas',
+                                help='Filter and transform oracle_collisions in pandas or in DuckDB (multi-threaded, spills to disk).')
+    etl_collisions.add_argument('--duckdb-extract-dir', default=None,
+                                help='Read parquet extracts (see extract-columnar) instead of the PostgreSQL staging tables.')
+    etl_collisions.add_argument('--duckdb-threads', type=int, default=None, help='DuckDB threads (default: all cores).')
+    etl_collisions.add_argument('--verify-transform-backend', action='store_true',
+                                help='Run both backends and fail unless their results are identical.')
+    etl_collisions.add_argument('--arrow-handoff-dir', default=None,
+                                help='Memory-map oracle_collisions from the ingest Arrow IPC file here when it is from the last ingest run.')
+    etl_collisions.set_defaults(func=run_etl_collisions)
+
+    extract_columnar = subparsers.add_parser('extract-columnar', help='Copy staging tables to parquet files for the DuckDB backend.')
+    extract_columnar.add_argument('extract_dir')
+    extract_columnar.add_argument('--tables', nargs='+', default=['oracle_collisions', 'oracle_code_type_values'])
+    extract_columnar.add_argument('--duckdb-threads', type=int, default=None)
+    extract_columnar.set_defaults(func=run_extract_columnar)
+
+    pipeline = subparsers.add_parser('run-pipeline',
+                                     help='Run ingest, fusion tables, views and ETL as a dependency graph, skipping unchanged steps.')
+    pipeline.add_argument('--dev', action='store_true', help='Use the _dev tables.')
+    add_sampling_arguments(pipeline)
+    pipeline.add_argument('--partition-by-case-year', action='store_true')
+    pipeline.add_argument('--max-workers', type=int, default=4, help='Steps to run at the same time.')
+    pipeline.add_argument('--force', action='store_true', help='Rerun every step even if its inputs are unchanged.')
+    pipeline.add_argument('--dry-run', action='store_true', help='Only print the steps and the estimated critical path.')
+    pipeline.set_defaults(func=run_pipeline)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # Configure logging before any pipeline module is imported, so its own basicConfig call is a no-op
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()),
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.profile:
+        from helper_profiling import enable_profiling
+        enable_profiling(args.profile)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,5 @@
 import time
 import logging
-import pandas as pd
 
 def time_execution(func):
     def wrapper(*args, **kwargs):
@@ -22,6 +21,8 @@ def set_pandas_display_options(max_columns=None, max_rows=None, width=120, float
     - width (int): Width of the display to prevent columns from being cut off.
     - float_format (str): Format string for floating-point numbers.
     """
+    import pandas as pd
+
     pd.set_option('display.max_columns', max_columns)
     pd.set_option('display.max_rows', max_rows)
     pd.set_option('display.width', width)
@@ -0,0 +1,142 @@
+import os
+import uuid
+import logging
+from datetime import datetime
+
+# Which ingest run last loaded each PostgreSQL staging table; Arrow handoff files are only read when they match it
+INGEST_RUNS_TABLE = 'fusion_ingest_runs'
+ARROW_HANDOFF_SUFFIX = '.arrow'
+
+def new_ingest_run_id():
+    return f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+def ingest_table_key(table_name):
+    """
+    Name under which a staging table's runs and handoff files are kept. The tables are created unquoted, so
+    PostgreSQL folds `oracle_COLLISIONS` to `oracle_collisions`; that folded name is the one readers ask for.
+    """
+    return table_name.lower()
+
+def handoff_path(handoff_dir, table_name):
+    return os.path.join(handoff_dir, f"{ingest_table_key(table_name)}{ARROW_HANDOFF_SUFFIX}")
+
+def postgres_type_to_arrow(pg_data_type):
+    """
+    Arrow type for a PostgreSQL type from map_oracle_to_postgres/map_analytics_db_to_postgres, chosen so the
+    DataFrame read from the handoff has the dtypes pd.read_sql gives (NUMERIC becomes float64 there as well).
+    """
+    import pyarrow as pa
+
+    mapping = {
+        'INTEGER': pa.int64(),
+        'SMALLINT': pa.int64(),
+        'BIGINT': pa.int64(),
+        'NUMERIC': pa.float64(),
+        'DECIMAL': pa.float64(),
+        'DOUBLE PRECISION': pa.float64(),
+        'REAL': pa.float64(),
+        'TIMESTAMP': pa.timestamp('us'),
+        'TIMESTAMPTZ': pa.timestamp('us', tz='UTC'),
+        'DATE': pa.date32(),
+        'TIME': pa.time64('us'),
+        'BOOLEAN': pa.bool_(),
+        'BYTEA': pa.binary(),
+    }
+    return mapping.get(pg_data_type.upper(), pa.string())
+
+def to_arrow_value(value, arrow_type):
+    """ Convert one source value (including LOB objects and Decimals) to what pyarrow accepts for `arrow_type`. """
+    import pyarrow as pa
+
+    if value is None:
+        return None
+    if hasattr(value, 'read'):  # cx_Oracle LOB locator, valid only until the next fetch
+        value = value.read()
+    if pa.types.is_floating(arrow_type):
+        return float(value)
+    if pa.types.is_string(arrow_type) and not isinstance(value, str):
+        return value.decode() if isinstance(value, bytes) else str(value)
+    return value
+
+def record_ingest_run(postgres_db, table_name, run_id, rows_loaded, rows_rejected):
+    """ Record that `run_id` has just (re)loaded `table_name`. """
+    postgres_db.execute_query(f"""
+        CREATE TABLE IF NOT EXISTS {INGEST_RUNS_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            run_id TEXT NOT NULL,
+            rows_loaded BIGINT NOT NULL,
+            rows_rejected BIGINT NOT NULL,
+            completed_at TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+        INSERT INTO {INGEST_RUNS_TABLE} (table_name, run_id, rows_loaded, rows_rejected, completed_at)
+        VALUES (%s, %s, %s, %s, NOW())
+        ON CONFLICT (table_name)
+        DO UPDATE SET run_id = EXCLUDED.run_id, rows_loaded = EXCLUDED.rows_loaded,
+                      rows_rejected = EXCLUDED.rows_rejected, completed_at = EXCLUDED.completed_at;
+    """, (ingest_table_key(table_name), run_id, rows_loaded, rows_rejected))
+
+def clear_ingest_run(postgres_db, table_name):
+    """ Forget the run recorded for `table_name` before it is dropped, reloaded or altered, so no handoff file matches it. """
+    postgres_db.execute_query(f"""
+        DO $$
+        BEGIN
+            IF to_regclass('{INGEST_RUNS_TABLE}') IS NOT NULL THEN
+                DELETE FROM {INGEST_RUNS_TABLE} WHERE table_name = '{ingest_table_key(table_name)}';
+            END IF;
+        END $$;
+    """)
+
+def get_recorded_ingest_run(postgres_db, table_name):
+    """ Return (run_id, rows_loaded, rows_rejected) of the run that last loaded `table_name`, or None. """
+    cursor = postgres_db.conn.cursor()
+    try:
+        cursor.execute("SELECT to_regclass(%s)", (INGEST_RUNS_TABLE,))
+        if cursor.fetchone()[0] is None:
+            return None
+        cursor.execute(f"SELECT run_id, rows_loaded, rows_rejected FROM {INGEST_RUNS_TABLE} WHERE table_name = %s",
+                       (ingest_table_key(table_name),))
+        return cursor.fetchone()
+    finally:
+        postgres_db.conn.rollback()  # end the read-only transaction
+        cursor.close()
+
+def filter_case_years(table, case_years):
+    """ Arrow version of case_year_filter(): keep rows whose COALESCE(occurence, reported) year is in `case_years`. """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    case_year = pc.year(pc.coalesce(table['occurence_timestamp'], table['reported_timestamp']))
+    years = [int(year) for year in case_years if year is not None]
+    mask = pc.fill_null(pc.is_in(case_year, value_set=pa.array(years, type=case_year.type)), False)
+    if None in case_years:
+        mask = pc.or_(mask, pc.is_null(case_year))
+    return table.filter(mask)
+
+def read_arrow_handoff(postgres_db, handoff_dir, table_name, case_years=None):
+    """
+    Memory-map `<handoff_dir>/<table_name>.arrow` and return it as a DataFrame, or None when it is missing or
+    stale: written by another ingest run than the one recorded for `table_name`, or that run rejected rows
+    the file still contains. Only the rows of `case_years` (default: all) are copied out of the mapping.
+    """
+    import pyarrow as pa
+
+    path = handoff_path(handoff_dir, table_name)
+    if not os.path.exists(path):
+        logging.warning(f"No Arrow handoff {path}; reading {table_name} from PostgreSQL.")
+        return None
+
+    with pa.memory_map(path, 'r') as source:
+        reader = pa.ipc.open_file(source)
+        file_run_id = (reader.schema.metadata or {}).get(b'run_id', b'').decode()
+        recorded_run = get_recorded_ingest_run(postgres_db, table_name)
+        if recorded_run is None or recorded_run[0] != file_run_id or recorded_run[2]:
+            logging.warning(f"Arrow handoff {path} is from run {file_run_id or '?'}, but {table_name} was last loaded by "
+                            f"{recorded_run[0] if recorded_run else 'no recorded run'}"
+                            f"{f' with {recorded_run[2]} rejects' if recorded_run and recorded_run[2] else ''}; not using it.")
+            return None
+        table = reader.read_all()
+        if case_years is not None:
+            table = filter_case_years(table, case_years)
+        df = table.to_pandas(split_blocks=True)  # one block per column, no consolidation copy
+    logging.info(f"Read {len(df)} rows of {table_name} from the Arrow handoff of run {file_run_id}.")
+    return df
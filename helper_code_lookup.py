@@ -0,0 +1,85 @@
+import pandas as pd
+import numpy as np
+import logging
+
+# One cache per (source tables) per process, so every fusion table transform in a run shares it
+_code_lookup_caches = {}
+
+class CodeLookupCache:
+    """
+    In-memory, dictionary-encoded copy of CODE_TYPES and CODE_TYPE_VALUES.
+
+    Code value IDs are kept in a pandas Index and every description field as a Categorical, so
+    decoding or validating a whole column is a single vectorized index lookup instead of a SQL join.
+    """
+    def __init__(self, df_code_types, df_code_type_values):
+        df_code_types = df_code_types.rename(columns=str.lower)
+        df_code_type_values = df_code_type_values.rename(columns=str.lower)
+
+        self.id_index = pd.Index(df_code_type_values['id'].astype('int64'))
+        self.code_type_ids = df_code_type_values['code_type_id'].to_numpy()
+        self.fields = {
+            field: pd.Categorical(df_code_type_values[field])
+            for field in ('code', 'short_desc', 'long_desc')
+            if field in df_code_type_values.columns
+        }
+
+        name_column = next((col for col in ('name', 'code', 'short_desc', 'description') if col in df_code_types.columns), 'id')
+        self.code_type_names = dict(zip(df_code_types[name_column], df_code_types['id']))
+        logging.debug(f"Built code lookup cache with {len(self.id_index)} code values across {len(df_code_types)} code types.")
+
+    @classmethod
+    def from_postgres(cls, postgres_db, source_prefix='oracle', dev_mode=False):
+        suffix = "_dev" if dev_mode else ""
+        df_code_types = pd.read_sql(f"SELECT * FROM {source_prefix}_code_types{suffix}", postgres_db.conn)
+        df_code_type_values = pd.read_sql(f"SELECT * FROM {source_prefix}_code_type_values{suffix}", postgres_db.conn)
+        return cls(df_code_types, df_code_type_values)
+
+    def _positions(self, series):
+        # NULL codes map to -1 like unknown codes; callers tell them apart with series.isna()
+        values = pd.to_numeric(series, errors='coerce')
+        positions = np.full(len(values), -1, dtype='int64')
+        present = values.notna().to_numpy()
+        positions[present] = self.id_index.get_indexer(values[present].astype('int64'))
+        return positions
+
+    def decode(self, series, field='short_desc'):
+        """ Decode a column of code value IDs into a Categorical of the requested field. """
+        categorical = self.fields[field]
+        positions = self._positions(series)
+        codes = np.where(positions >= 0, categorical.codes[positions], -1)
+        return pd.Series(pd.Categorical.from_codes(codes, categorical.categories), index=series.index, name=series.name)
+
+    def validate(self, series, code_type=None):
+        """
+        Return a boolean mask that is True where a code value ID is NULL or known, and False where it
+        is missing from CODE_TYPE_VALUES (or, if `code_type` is given, belongs to another code type).
+        """
+        positions = self._positions(series)
+        valid = positions >= 0
+        if code_type is not None:
+            code_type_id = self.code_type_names.get(code_type, code_type)
+            valid &= self.code_type_ids[positions] == code_type_id
+        return pd.Series(valid | series.isna().to_numpy(), index=series.index)
+
+    def decode_columns(self, df, code_columns, field='short_desc'):
+        """
+        Validate every code column in `code_columns` ({id column: description column or None})
+        that is present in `df`, and fill the description columns from the cache.
+        """
+        for id_column, desc_column in code_columns.items():
+            if id_column not in df.columns:
+                continue
+            invalid_count = int((~self.validate(df[id_column])).sum())
+            if invalid_count:
+                logging.warning(f"{invalid_count} values in '{id_column}' are not in CODE_TYPE_VALUES.")
+            if desc_column:
+                df[desc_column] = self.decode(df[id_column], field=field)
+        return df
+
+def get_code_lookup_cache(postgres_db, source_prefix='oracle', dev_mode=False):
+    """ Return the process-wide code lookup cache, building it from PostgreSQL on first use. """
+    key = (source_prefix, dev_mode)
+    if key not in _code_lookup_caches:
+        _code_lookup_caches[key] = CodeLookupCache.from_postgres(postgres_db, source_prefix=source_prefix, dev_mode=dev_mode)
+    return _code_lookup_caches[key]
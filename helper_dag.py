@@ -0,0 +1,189 @@
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Fingerprint and duration of each node's last successful run
+DAG_STATE_TABLE = 'fusion_dag_state'
+
+class DagNode:
+    """
+    One pipeline step. `action()` does the work; `depends_on` names the nodes that must succeed first.
+    `fingerprint()` returns a string describing the node's own inputs (source table markers, SQL file
+    contents, parameters); None as fingerprint means the node always runs. `target_marker()` describes what
+    the node's output currently holds (e.g. whether its table exists and its row count); it is part of the
+    fingerprint and read again after the action, so a dropped or emptied output makes the node run again.
+    """
+    def __init__(self, name, action, depends_on=(), fingerprint=None, target_marker=None):
+        self.name = name
+        self.action = action
+        self.depends_on = tuple(depends_on)
+        self.fingerprint = fingerprint
+        self.target_marker = target_marker
+
+def topological_order(nodes):
+    """ Return the nodes ordered so every node comes after its dependencies; raises ValueError on cycles. """
+    by_name = {node.name: node for node in nodes}
+    for node in nodes:
+        unknown = [name for name in node.depends_on if name not in by_name]
+        if unknown:
+            raise ValueError(f"Node {node.name} depends on unknown nodes {unknown}.")
+    remaining = {node.name: set(node.depends_on) for node in nodes}
+    order = []
+    while remaining:
+        ready = sorted(name for name, deps in remaining.items() if not deps)
+        if not ready:
+            raise ValueError(f"Dependency cycle between {sorted(remaining)}.")
+        for name in ready:
+            order.append(by_name[name])
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return order
+
+def combine_node_fingerprint(own_fingerprint, upstream_fingerprints):
+    """ Hash of a node's own inputs and its dependencies' fingerprints, so any upstream change propagates down. """
+    digest = hashlib.sha256(own_fingerprint.encode())
+    for fingerprint in upstream_fingerprints:
+        digest.update(b'|' + fingerprint.encode())
+    return digest.hexdigest()
+
+def get_dag_state(postgres_db):
+    """ Return {node_name: (fingerprint, duration_seconds)} recorded by the last successful runs. """
+    cursor = postgres_db.conn.cursor()
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {DAG_STATE_TABLE} (
+                node_name TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                duration_seconds DOUBLE PRECISION NOT NULL,
+                succeeded_at TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+        """)
+        cursor.execute(f"SELECT node_name, fingerprint, duration_seconds FROM {DAG_STATE_TABLE}")
+        state = {name: (fingerprint, duration) for name, fingerprint, duration in cursor.fetchall()}
+        postgres_db.conn.commit()
+        return state
+    finally:
+        cursor.close()
+
+def record_dag_state(postgres_db, node_name, fingerprint, duration_seconds):
+    upsert_query = f"""
+        INSERT INTO {DAG_STATE_TABLE} (node_name, fingerprint, duration_seconds, succeeded_at)
+        VALUES (%s, %s, %s, NOW())
+        ON CONFLICT (node_name)
+        DO UPDATE SET fingerprint = EXCLUDED.fingerprint, duration_seconds = EXCLUDED.duration_seconds,
+                      succeeded_at = EXCLUDED.succeeded_at
+    """
+    postgres_db.execute_query(upsert_query, (node_name, fingerprint, duration_seconds))
+
+def forget_dag_state(postgres_db, node_name):
+    postgres_db.execute_query(f"DELETE FROM {DAG_STATE_TABLE} WHERE node_name = %s", (node_name,))
+
+def critical_path(nodes, durations):
+    """ Return (node names, seconds) of the longest chain of dependent nodes, weighted by `durations`. """
+    finish = {}
+    previous = {}
+    for node in topological_order(nodes):
+        start = 0.0
+        for name in node.depends_on:
+            if finish[name] > start:
+                start, previous[node.name] = finish[name], name
+        finish[node.name] = start + durations.get(node.name, 0.0)
+    if not finish:
+        return [], 0.0
+    name = max(finish, key=finish.get)
+    total = finish[name]
+    path = [name]
+    while name in previous:
+        name = previous[name]
+        path.append(name)
+    return path[::-1], total
+
+def run_dag(nodes, state_db=None, max_workers=4, force=False):
+    """
+    Run `nodes` on a thread pool, each as soon as all its dependencies succeeded or were skipped.
+
+    With `state_db`, a node whose combined fingerprint (own inputs plus its dependencies' fingerprints)
+    matches its last successful run is skipped, and successful runs are recorded; `force` runs every node.
+    A failed node blocks its dependents only; independent branches keep running.
+    Returns {node_name: {'status', 'seconds', 'fingerprint', 'error'}}.
+    """
+    order = topological_order(nodes)
+    recorded = get_dag_state(state_db) if state_db is not None else {}
+    results = {}
+    pending = {node.name: node for node in order}
+    running = {}
+    state_lock = threading.Lock()  # the workers and the main thread share state_db's connection
+
+    def execute(node, upstream_fingerprints):
+        # Fingerprints are computed in the worker, as they may query the sources
+        fingerprint = None
+        if node.fingerprint is not None:
+            own_fingerprint = node.fingerprint()
+
+            def marked():
+                return own_fingerprint if node.target_marker is None else f"{own_fingerprint}|{node.target_marker()}"
+            fingerprint = combine_node_fingerprint(marked(), upstream_fingerprints)
+            if not force and recorded.get(node.name, (None,))[0] == fingerprint:
+                return 'skipped', 0.0, fingerprint
+        # An action that fails partway leaves its output half-built, so the last success must not be recorded any more
+        if state_db is not None:
+            with state_lock:
+                forget_dag_state(state_db, node.name)
+        start_time = time.time()
+        node.action()
+        seconds = time.time() - start_time
+        if fingerprint is not None and node.target_marker is not None:
+            fingerprint = combine_node_fingerprint(marked(), upstream_fingerprints)
+        return 'succeeded', seconds, fingerprint
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for name, node in list(pending.items()):
+                dependency_statuses = [results[dep]['status'] if dep in results else None for dep in node.depends_on]
+                if any(status in ('failed', 'blocked') for status in dependency_statuses):
+                    results[name] = {'status': 'blocked', 'seconds': 0.0, 'fingerprint': None, 'error': None}
+                    logging.warning(f"Node {name} blocked by a failed dependency.")
+                    del pending[name]
+                elif all(status in ('succeeded', 'skipped') for status in dependency_statuses):
+                    upstream_fingerprints = [results[dep]['fingerprint'] or '' for dep in node.depends_on]
+                    running[executor.submit(execute, node, upstream_fingerprints)] = node
+                    del pending[name]
+                    logging.info(f"Started node {name}.")
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                try:
+                    status, seconds, fingerprint = future.result()
+                    results[node.name] = {'status': status, 'seconds': seconds, 'fingerprint': fingerprint, 'error': None}
+                    if status == 'succeeded' and state_db is not None and fingerprint is not None:
+                        with state_lock:
+                            record_dag_state(state_db, node.name, fingerprint, seconds)
+                except Exception as e:
+                    logging.error(f"Node {node.name} failed: {e}")
+                    results[node.name] = {'status': 'failed', 'seconds': 0.0, 'fingerprint': None, 'error': str(e)}
+                print(f"{node.name}: {results[node.name]['status']} ({results[node.name]['seconds']:.1f} s)")
+    return results
+
+def print_dag_report(nodes, results, wall_seconds):
+    """ Print each node's outcome, the critical path of this run and how it compares with running the steps in sequence. """
+    print(f"{'node':<44}{'status':>10}{'seconds':>10}")
+    for node in topological_order(nodes):
+        result = results.get(node.name, {'status': 'not run', 'seconds': 0.0})
+        print(f"{node.name:<44}{result['status']:>10}{result['seconds']:>10.1f}")
+    path, path_seconds = critical_path(nodes, {name: result['seconds'] for name, result in results.items()})
+    print(f"Critical path ({path_seconds:.1f} s): {' -> '.join(path)}")
+    print(f"Wall time {wall_seconds:.1f} s; the steps in sequence would take {sum(r['seconds'] for r in results.values()):.1f} s")
+
+def print_dag_plan(nodes, recorded_durations):
+    """ Dry run: print the nodes in dependency order and the critical path estimated from the last recorded durations. """
+    print(f"{'node':<44}{'last_s':>10}  depends on")
+    for node in topological_order(nodes):
+        print(f"{node.name:<44}{recorded_durations.get(node.name, 0.0):>10.1f}  {', '.join(node.depends_on) or '-'}")
+    path, path_seconds = critical_path(nodes, recorded_durations)
+    print(f"Estimated critical path ({path_seconds:.1f} s): {' -> '.join(path)}")
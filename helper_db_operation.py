@@ -1,13 +1,39 @@
 import os
-import psycopg2
-import cx_Oracle
+import time
 import psycopg2
 import psycopg2.extras
-import pyodbc
 import logging
 
+# cx_Oracle and pyodbc are imported where a connection is opened, so Postgres-only jobs
+# start without loading them (and without needing the Oracle Instant Client installed)
+
+# Oracle column types that are fetched as LOB locators unless told otherwise
+# (LONG and LONG RAW are fetched inline already and cannot be measured with DBMS_LOB.GETLENGTH, so they are not listed)
+ORACLE_LOB_TYPES = ('CLOB', 'NCLOB', 'BLOB')
+
+# Suffix given to the select-list alias of a LOB that is too large to fetch inline
+LARGE_LOB_SUFFIX = '__LOB'
+
+def lob_output_type_handler(cursor, name, default_type, size, precision, scale):
+    """
+    cx_Oracle output type handler that fetches CLOB/NCLOB/BLOB values inline as str/bytes
+    (one round trip per fetch batch) instead of as LOB locators (one round trip per cell).
+    Columns aliased with LARGE_LOB_SUFFIX keep their locators so they can be streamed in chunks.
+    """
+    import cx_Oracle
+
+    if name.upper().endswith(LARGE_LOB_SUFFIX):
+        return None
+    if default_type in (cx_Oracle.DB_TYPE_CLOB, cx_Oracle.DB_TYPE_NCLOB):
+        return cursor.var(cx_Oracle.DB_TYPE_LONG, arraysize=cursor.arraysize)
+    if default_type == cx_Oracle.DB_TYPE_BLOB:
+        return cursor.var(cx_Oracle.DB_TYPE_LONG_RAW, arraysize=cursor.arraysize)
+    return None
+
 class OracleDB:
     def __init__(self, username, password, db_host, db_port, db_service):
+        import cx_Oracle
+
         # Oracle Instant Client setup
         oracle_instant_client_dir = os.getenv('ORACLE_INSTANT_CLIENT_DIR')
         cx_Oracle.init_oracle_client(lib_dir=oracle_instant_client_dir)
@@ -15,6 +41,7 @@ class OracleDB:
         self.conn_str = f"{username}/{password}@//{db_host}:{db_port}/{db_service}"
         logging.debug(f"Connecting to Oracle DB with connection string: {self.conn_str}")
         self.conn = cx_Oracle.connect(self.conn_str)
+        self._table_columns = {}  # get_table_columns() results, reused by ingest and schema drift checks
 
     def query_without_param(self, query):
         logging.debug(f"Executing query: {query}")
@@ -24,12 +51,38 @@ class OracleDB:
         cursor.close()
         logging.debug(f"Query executed successfully, fetched {len(result)} rows.")
         return header, result
+
+    def stream_query(self, query, arraysize=1000):
+        """
+        Execute a query with the LOB output type handler and return the header and a generator
+        of rows fetched `arraysize` rows at a time, so large tables are never held in memory at once.
+        """
+        logging.debug(f"Streaming query: {query}")
+        cursor = self.conn.cursor()
+        cursor.arraysize = arraysize
+        cursor.outputtypehandler = lob_output_type_handler
+        cursor.execute(query)
+        header = [i[0] for i in cursor.description]
+
+        def rows():
+            try:
+                while True:
+                    batch = cursor.fetchmany()
+                    if not batch:
+                        break
+                    yield from batch
+            finally:
+                cursor.close()
+
+        return header, rows()
     
     def close_connection(self):
         logging.debug("Closing Oracle DB connection.")
         self.conn.close()
 
     def get_table_columns(self, table_name):
+        if table_name.upper() in self._table_columns:
+            return self._table_columns[table_name.upper()]
         query = f"""
         SELECT column_name, data_type, data_length, nullable
         FROM all_tab_columns
@@ -40,6 +93,7 @@ class OracleDB:
         logging.debug(f"Executing query to get columns: {query}")
         headers, columns = self.query_without_param(query)
         logging.debug(f"Columns retrieved for {table_name}: {columns}")
+        self._table_columns[table_name.upper()] = columns
         return columns
 
     def get_constraints(self, table_name):
@@ -62,8 +116,30 @@ class OracleDB:
         logging.debug(f"Getting owner for table: {table_name}")
         return self.query_without_param(query)[1][0][0]  # Returns the owner
 
+    def get_table_stats(self, table_names, owner='ECRDBA'):
+        """ Return {table_name: (num_rows, avg_row_len)} from the optimizer statistics in all_tables. """
+        query = f"""
+        SELECT table_name, NVL(num_rows, 0), NVL(avg_row_len, 0)
+        FROM all_tables
+        WHERE owner = '{owner}'
+        AND table_name IN ({', '.join(f"'{name.upper()}'" for name in table_names)})
+        """
+        logging.debug(f"Getting table statistics: {query}")
+        return {name: (int(num_rows), int(avg_row_len)) for name, num_rows, avg_row_len in self.query_without_param(query)[1]}
+
+    def get_table_fingerprint(self, table_name, owner='ECRDBA'):
+        """
+        Cheap change marker of a table: row count and the highest ORA_ROWSCN. Any committed insert, update
+        or delete raises the SCN of the block it touched, so the marker changes whenever the content does.
+        """
+        query = f"SELECT COUNT(*), NVL(MAX(ORA_ROWSCN), 0) FROM {owner}.{table_name}"
+        row_count, max_scn = self.query_without_param(query)[1][0]
+        return f"{row_count}:{max_scn}"
+
 class AnalyticsDB:
     def __init__(self, db_name, db_server, db_driver, db_trusted_connection):
+        import pyodbc
+
         self.conn_str = ''
         self.conn_str += f'Driver={db_driver};'
         self.conn_str += f'Server={db_server};'
@@ -72,6 +148,7 @@ class AnalyticsDB:
         
         logging.debug(f"Connecting to Analytics DB with connection string: {self.conn_str}")
         self.conn = pyodbc.connect(self.conn_str)
+        self._table_columns = {}  # get_table_columns() results, reused by ingest and schema drift checks
 
     def query_without_param(self, query):
         logging.debug(f"Executing query: {query}")
@@ -87,6 +164,8 @@ class AnalyticsDB:
         self.conn.close()
 
     def get_table_columns(self, table_name):
+        if table_name.upper() in self._table_columns:
+            return self._table_columns[table_name.upper()]
         query = f"""
         SELECT column_name, data_type, character_maximum_length, is_nullable
         FROM information_schema.columns
@@ -95,6 +174,7 @@ class AnalyticsDB:
         logging.debug(f"Executing query to get columns for table: {table_name}. Query: {query}")
         headers, columns = self.query_without_param(query)
         logging.debug(f"Columns retrieved for {table_name}: {columns}")        
+        self._table_columns[table_name.upper()] = columns
         return columns
 
     def get_constraints(self, table_name):
@@ -108,6 +188,31 @@ class AnalyticsDB:
         logging.debug(f"Constraints retrieved for {table_name}: {constraints}")
         return constraints
 
+    def get_table_stats(self, table_names, schema='ECRDBA'):
+        """ Return {table_name: (row_count, avg_row_len)} from sys.dm_db_partition_stats (heap or clustered index only). """
+        query = f"""
+        SELECT t.name,
+               SUM(ps.row_count),
+               SUM(ps.used_page_count) * 8192
+        FROM sys.dm_db_partition_stats ps
+        JOIN sys.tables t ON ps.object_id = t.object_id
+        WHERE SCHEMA_NAME(t.schema_id) = '{schema}'
+        AND ps.index_id IN (0, 1)
+        AND t.name IN ({', '.join(f"'{name}'" for name in table_names)})
+        GROUP BY t.name
+        """
+        logging.debug(f"Getting table statistics: {query}")
+        return {
+            name.upper(): (int(row_count), int(used_bytes) // row_count if row_count else 0)
+            for name, row_count, used_bytes in self.query_without_param(query)[1]
+        }
+
+    def get_table_fingerprint(self, table_name, schema='ECRDBA'):
+        """ Change marker of a table: row count and CHECKSUM_AGG over all rows (text/image/xml columns are not covered). """
+        query = f"SELECT COUNT_BIG(*), CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM [{schema}].[{table_name}]"
+        row_count, checksum = self.query_without_param(query)[1][0]
+        return f"{row_count}:{checksum}"
+
 class PostgreSQLDB:
     def __init__(self, user, password, host, database):
         logging.debug(f"Connecting to PostgreSQL DB at {host} with database: {database}")
@@ -154,10 +259,121 @@ class PostgreSQLDB:
         finally:
             cursor.close()
 
+    def copy_from_stream(self, table_name, columns, stream):
+        """ Load a COPY text-format stream (e.g. CopyRowStream) into a table in a single transaction. """
+        cursor = self.conn.cursor()
+        copy_query = f"COPY {table_name} ({', '.join(columns)}) FROM STDIN"
+        try:
+            logging.debug(f"Executing COPY into {table_name}.")
+            cursor.copy_expert(copy_query, stream)
+            self.conn.commit()
+            logging.debug(f"COPY into {table_name} committed successfully.")
+        except Exception as e:
+            logging.error(f"COPY into {table_name} failed. Error: {e}")
+            self.conn.rollback()
+            logging.debug("Transaction rolled back due to error in COPY.")
+            raise
+        finally:
+            cursor.close()
+
+    def bulk_insert_dataframe(self, df, table_name):
+        """ Load a DataFrame into a table through COPY; NaN/NaT values are written as NULL. """
+        df_for_copy = df.astype(object).where(df.notna(), None)
+        stream = CopyRowStream(df_for_copy.itertuples(index=False, name=None))
+        self.copy_from_stream(table_name, list(df.columns), stream)
+        logging.debug(f"Bulk inserted {stream.rows_written} rows into {table_name}.")
+
     def close_connection(self):
         logging.debug("Closing PostgreSQL DB connection.")
         self.conn.close()
 
+def format_copy_value(value):
+    """ Render a single Python value in PostgreSQL COPY text format. """
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '\\\\x' + bytes(value).hex()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))  # pandas stores integer columns with NULLs as float
+    return escape_copy_text(str(value))
+
+def escape_copy_text(text):
+    """ Escape the characters that have a special meaning in COPY text format. """
+    return (text.replace('\\', '\\\\')
+                .replace('\n', '\\n')
+                .replace('\r', '\\r')
+                .replace('\t', '\\t'))
+
+class CopyRowStream:
+    """
+    File-like object that renders rows into COPY text format on demand, for use with
+    cursor.copy_expert(). LOB locators found in a row are read in chunks of `lob_chunk_size`
+    and written straight into the stream, so a large CLOB/BLOB is never materialized in full.
+    Tracks row, LOB length and LOB read-time counters for run reporting; LOB lengths are counted as
+    Oracle does, in characters for CLOB/NCLOB and in bytes for BLOB.
+    """
+    def __init__(self, rows, lob_columns=(), lob_chunk_size=1024 * 1024):
+        self.lob_columns = set(lob_columns)
+        self.lob_chunk_size = lob_chunk_size
+        self.rows_written = 0
+        self.lob_values = 0
+        self.lob_length_inline = 0
+        self.lob_length_streamed = 0
+        self.lob_seconds = 0.0
+        self._pieces = self._iter_pieces(rows)
+        self._buffer = ''
+
+    def add_lob_counters(self, totals):
+        """ Add this stream's LOB counters to `totals`, the running totals of a load made of several streams. """
+        for counter in ('lob_values', 'lob_length_inline', 'lob_length_streamed', 'lob_seconds'):
+            totals[counter] = totals.get(counter, 0) + getattr(self, counter)
+
+    def _iter_lob_pieces(self, lob):
+        # LOB offsets are 1-based; CLOB reads return str, BLOB reads return bytes
+        start_time = time.time()
+        offset = 1
+        while True:
+            chunk = lob.read(offset, self.lob_chunk_size)
+            if not chunk:
+                break
+            if offset == 1 and isinstance(chunk, bytes):
+                yield '\\\\x'  # bytea hex prefix
+            offset += len(chunk)
+            self.lob_length_streamed += len(chunk)
+            yield chunk.hex() if isinstance(chunk, bytes) else escape_copy_text(chunk)
+        self.lob_seconds += time.time() - start_time
+
+    def _iter_pieces(self, rows):
+        for row in rows:
+            for i, value in enumerate(row):
+                if i:
+                    yield '\t'
+                if i in self.lob_columns and value is not None:
+                    self.lob_values += 1
+                    if hasattr(value, 'read'):
+                        yield from self._iter_lob_pieces(value)
+                        continue
+                    self.lob_length_inline += len(value)
+                yield format_copy_value(value)
+            yield '\n'
+            self.rows_written += 1
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            piece = next(self._pieces, None)
+            if piece is None:
+                break
+            self._buffer += piece
+        if size < 0:
+            data, self._buffer = self._buffer, ''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
 def map_analytics_db_to_postgres(data_type):
     """ Map MS SQL Server types to PostgreSQL data types """
     mapping = {
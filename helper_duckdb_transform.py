@@ -0,0 +1,135 @@
+import os
+import tempfile
+import logging
+import pandas as pd
+
+from helper_frozen_years import case_year_expression
+
+# Transform backends accepted by run_collisions_etl
+TRANSFORM_BACKENDS = ('pandas', 'duckdb')
+
+# DuckDB spills joins, aggregates and sorts to DUCKDB_TEMP_DIRECTORY once it reaches the memory limit
+DUCKDB_MEMORY_LIMIT = '4GB'
+DUCKDB_TEMP_DIRECTORY = os.path.join(tempfile.gettempdir(), 'fusion_duckdb_spill')
+POSTGRES_ALIAS = 'pg'
+
+def connect_duckdb(threads=None, memory_limit=DUCKDB_MEMORY_LIMIT, temp_directory=DUCKDB_TEMP_DIRECTORY):
+    """
+    Open an in-memory DuckDB database that uses `threads` cores (default: all) and spills to
+    `temp_directory` beyond `memory_limit`. Row order is not preserved, which lets large operators spill.
+    """
+    import duckdb
+
+    os.makedirs(temp_directory, exist_ok=True)
+    con = duckdb.connect()
+    con.execute(f"SET threads = {threads or os.cpu_count()}")
+    con.execute(f"SET memory_limit = '{memory_limit}'")
+    con.execute(f"SET temp_directory = '{temp_directory}'")
+    con.execute("SET preserve_insertion_order = false")
+    logging.debug(f"Opened DuckDB with {threads or os.cpu_count()} threads, memory limit {memory_limit}, spilling to {temp_directory}.")
+    return con
+
+def attach_postgres(con, host, database, user, password):
+    """ Attach the PostgreSQL staging database read-only as `pg` (DuckDB's postgres extension scans it in parallel). """
+    con.execute("INSTALL postgres")
+    con.execute("LOAD postgres")
+    dsn = f"host={host} dbname={database} user={user} password={password}"
+    con.execute(f"ATTACH '{dsn}' AS {POSTGRES_ALIAS} (TYPE postgres, READ_ONLY)")
+
+def source_relation(table_name, extract_dir=None):
+    """ SQL relation for a staging table: `<extract_dir>/<table_name>.parquet` if given, else the attached PostgreSQL table. """
+    if extract_dir:
+        return f"read_parquet('{os.path.join(extract_dir, table_name)}.parquet')"
+    return f"{POSTGRES_ALIAS}.public.{table_name}"
+
+def write_columnar_extract(con, table_name, extract_dir):
+    """ Copy a staging table from the attached PostgreSQL database to `<extract_dir>/<table_name>.parquet`. """
+    os.makedirs(extract_dir, exist_ok=True)
+    path = f"{os.path.join(extract_dir, table_name)}.parquet"
+    con.execute(f"COPY (SELECT * FROM {source_relation(table_name)}) TO '{path}' (FORMAT parquet, COMPRESSION zstd)")
+    logging.info(f"Wrote columnar extract {path}.")
+    return path
+
+def get_relation_columns(con, relation):
+    return [column[0] for column in con.execute(f"SELECT * FROM {relation} LIMIT 0").description]
+
+def transform_oracle_collisions_duckdb(con, collisions_relation, code_values_relation, code_columns, valid_ids,
+                                       year_filter="TRUE"):
+    """
+    DuckDB equivalent of fetching oracle_collisions, filtering it to `valid_ids` (a MembershipIndex) and
+    transform_oracle_collisions(): case_year, fatal_comment -> fatal_comments, occurence_timestring, source,
+    and the description columns of `code_columns` decoded from CODE_TYPE_VALUES.short_desc.
+    The whole transform is one multi-threaded query; only its result is materialized in pandas.
+    """
+    con.register('valid_collision_ids', pd.DataFrame({'id': valid_ids.ids}))
+    source_columns = get_relation_columns(con, collisions_relation)
+    present_code_columns = {id_column: desc_column for id_column, desc_column in code_columns.items() if id_column in source_columns}
+
+    # Keep the source column order, as the pandas rename does, then append the derived columns in the same order
+    select_list = [f'c."{column}" AS fatal_comments' if column == 'fatal_comment' else f'c."{column}"' for column in source_columns]
+    select_list += [
+        f"{case_year_expression('c')} AS case_year",
+        "strftime(c.occurence_timestamp, '%Y-%m-%d') AS occurence_timestring",
+        "'eCollision Oracle' AS source",
+    ]
+    joins = []
+    for position, (id_column, desc_column) in enumerate(present_code_columns.items()):
+        alias = f"cv{position}"
+        joins.append(f"LEFT JOIN {code_values_relation} {alias} ON {alias}.id = TRY_CAST(c.{id_column} AS BIGINT)")
+        if desc_column:
+            select_list.append(f"{alias}.short_desc AS {desc_column}")
+
+    filtered_query = f"""
+        SELECT c.*
+        FROM {collisions_relation} c
+        SEMI JOIN valid_collision_ids v ON v.id = c.id
+        WHERE {year_filter}
+    """
+    con.execute(f"CREATE OR REPLACE TEMP TABLE filtered_collisions AS {filtered_query}")
+
+    # Same warning as CodeLookupCache.decode_columns for codes that are missing from CODE_TYPE_VALUES
+    for id_column in present_code_columns:
+        invalid_count = con.execute(f"""
+            SELECT COUNT(*)
+            FROM filtered_collisions c
+            WHERE c.{id_column} IS NOT NULL
+            AND NOT EXISTS (SELECT 1 FROM {code_values_relation} cv WHERE cv.id = TRY_CAST(c.{id_column} AS BIGINT))
+        """).fetchone()[0]
+        if invalid_count:
+            logging.warning(f"{invalid_count} values in '{id_column}' are not in CODE_TYPE_VALUES.")
+
+    transform_query = f"""
+        SELECT {', '.join(select_list)}
+        FROM filtered_collisions c
+        {' '.join(joins)}
+    """
+    df = con.execute(transform_query).df()
+    con.execute("DROP TABLE filtered_collisions")
+    con.unregister('valid_collision_ids')
+    df['case_year'] = df['case_year'].astype('Int64')
+    return df
+
+def compare_transform_results(df_expected, df_actual, key='id'):
+    """
+    Compare two transform results cell by cell, ignoring row order and dtype differences (e.g. Int64 vs int32,
+    Categorical vs str, NaN vs None). Returns a list of differences, empty when they are identical.
+    """
+    differences = []
+    if sorted(df_expected.columns) != sorted(df_actual.columns):
+        differences.append(f"Columns differ: only expected {sorted(set(df_expected.columns) - set(df_actual.columns))}, "
+                           f"only actual {sorted(set(df_actual.columns) - set(df_expected.columns))}")
+        return differences
+    if len(df_expected) != len(df_actual):
+        differences.append(f"Row counts differ: {len(df_expected)} expected, {len(df_actual)} actual")
+        return differences
+
+    def normalize(df):
+        df = df[sorted(df.columns)].sort_values(key).reset_index(drop=True).astype(object)
+        return df.where(df.notna(), None)
+
+    df_expected, df_actual = normalize(df_expected), normalize(df_actual)
+    for column in df_expected.columns:
+        mismatched = ~((df_expected[column] == df_actual[column]) | (df_expected[column].isna() & df_actual[column].isna()))
+        if mismatched.any():
+            differences.append(f"Column {column}: {int(mismatched.sum())} rows differ, e.g. {key}={df_expected.loc[mismatched.idxmax(), key]}")
+    return differences
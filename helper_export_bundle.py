@@ -0,0 +1,129 @@
+import gzip
+import hashlib
+import json
+import os
+import logging
+from datetime import datetime
+from itertools import islice
+
+from helper_db_operation import CopyRowStream
+from helper_arrow_handoff import clear_ingest_run
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; bundles fall back to gzip without it
+    zstandard = None
+
+MANIFEST_FILE = 'manifest.json'
+COPY_READ_SIZE = 1024 * 1024
+FILE_EXTENSIONS = {'zstd': '.copy.zst', 'gzip': '.copy.gz'}
+
+def resolve_compression(compression):
+    if compression == 'zstd' and zstandard is None:
+        logging.warning("zstandard is not installed; writing gzip-compressed bundles instead.")
+        return 'gzip'
+    if compression not in FILE_EXTENSIONS:
+        raise ValueError(f"Unsupported bundle compression: {compression}")
+    return compression
+
+def open_compressed(path, mode, compression):
+    """ Open a compressed chunk file as a text stream ('wt' or 'rt'). """
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImportError("zstandard is required to read zstd-compressed bundles.")
+        return zstandard.open(path, mode, encoding='utf-8')
+    return gzip.open(path, mode, encoding='utf-8')
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(COPY_READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class BundleWriter:
+    """
+    Writes one table as a directory of compressed COPY text-format chunk files plus a manifest,
+    so the extract can be shipped to a remote PostgreSQL and loaded there with load_bundle().
+    """
+    def __init__(self, bundle_root, target_table, columns, create_query=None, compression='zstd',
+                 chunk_rows=100000, lob_columns=(), source=None):
+        self.bundle_dir = os.path.join(bundle_root, target_table)
+        os.makedirs(self.bundle_dir, exist_ok=True)
+        self.compression = resolve_compression(compression)
+        self.chunk_rows = chunk_rows
+        self.lob_columns = lob_columns
+        self.manifest = {
+            'target_table': target_table,
+            'columns': list(columns),
+            'create_query': create_query,
+            'compression': self.compression,
+            'source': source,
+            'created_at': datetime.now().isoformat(),
+            'chunks': [],
+        }
+
+    def write_rows(self, rows):
+        """
+        Write an iterable of row tuples as one or more chunk files. Rows are consumed lazily, so LOB
+        locators are read before the source cursor fetches its next batch (which invalidates them).
+        """
+        rows = iter(rows)
+        while self._write_chunk(islice(rows, self.chunk_rows)):
+            pass
+
+    def _write_chunk(self, rows):
+        file_name = f"chunk_{len(self.manifest['chunks']):05d}{FILE_EXTENSIONS[self.compression]}"
+        path = os.path.join(self.bundle_dir, file_name)
+        stream = CopyRowStream(rows, lob_columns=self.lob_columns)
+        with open_compressed(path, 'wt', self.compression) as f:
+            for data in iter(lambda: stream.read(COPY_READ_SIZE), ''):
+                f.write(data)
+        if not stream.rows_written:
+            os.remove(path)
+            return 0
+        self.manifest['chunks'].append({
+            'file': file_name,
+            'rows': stream.rows_written,
+            'compressed_bytes': os.path.getsize(path),
+            'sha256': file_sha256(path),
+        })
+        logging.debug(f"Wrote {stream.rows_written} rows to {path}.")
+        return stream.rows_written
+
+    def close(self):
+        with open(os.path.join(self.bundle_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        total_rows = sum(chunk['rows'] for chunk in self.manifest['chunks'])
+        total_bytes = sum(chunk['compressed_bytes'] for chunk in self.manifest['chunks'])
+        print(f"Exported {total_rows} rows of '{self.manifest['target_table']}' to {self.bundle_dir} "
+              f"({len(self.manifest['chunks'])} {self.compression} chunks, {total_bytes / 1024 / 1024:.1f} MB)")
+        return self.manifest
+
+def load_bundle(postgres_db, bundle_dir, drop_existing=False):
+    """
+    Load one table bundle into PostgreSQL: create the table from the manifest's CREATE statement,
+    then stream-decompress every chunk straight into COPY after checking its checksum.
+    """
+    with open(os.path.join(bundle_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    target_table = manifest['target_table']
+
+    # The bundle replaces what the recorded ingest run loaded, so that run's Arrow handoff no longer applies
+    clear_ingest_run(postgres_db, target_table)
+    if drop_existing:
+        postgres_db.execute_query(f"DROP TABLE IF EXISTS {target_table} CASCADE;")
+    if manifest.get('create_query'):
+        postgres_db.execute_query(manifest['create_query'])
+
+    for chunk in manifest['chunks']:
+        path = os.path.join(bundle_dir, chunk['file'])
+        if file_sha256(path) != chunk['sha256']:
+            raise ValueError(f"Checksum mismatch for {path}; the bundle is incomplete or corrupted.")
+        with open_compressed(path, 'rt', manifest['compression']) as stream:
+            postgres_db.copy_from_stream(target_table, manifest['columns'], stream)
+        logging.debug(f"Loaded {chunk['rows']} rows from {path} into {target_table}.")
+
+    total_rows = sum(chunk['rows'] for chunk in manifest['chunks'])
+    logging.info(f"Loaded {total_rows} rows into {target_table} from {bundle_dir}.")
+    return total_rows
@@ -0,0 +1,226 @@
+from datetime import date
+import logging
+
+# Per-target record of which fingerprint each case_year was last loaded from
+YEAR_REFRESH_STATE_TABLE = 'fusion_year_refresh_state'
+
+def case_year_expression(alias=''):
+    """ SQL equivalent of extract_case_year(): occurence_timestamp, falling back to reported_timestamp. """
+    prefix = f"{alias}." if alias else ""
+    return f"EXTRACT(YEAR FROM COALESCE({prefix}occurence_timestamp, {prefix}reported_timestamp))::INTEGER"
+
+def own_case_year_expression(alias=''):
+    """
+    Case year of a source row that carries its own case_year (analytics_collisions): that value where it is a whole
+    number, otherwise case_year_expression(). Used to fetch, fingerprint and load those rows alike.
+    """
+    prefix = f"{alias}." if alias else ""
+    return (f"COALESCE(CASE WHEN {prefix}case_year::TEXT ~ '^\\s*[0-9]+(\\.0*)?\\s*$' THEN TRIM({prefix}case_year::TEXT)::NUMERIC::INTEGER END, "
+            f"{case_year_expression(alias)})")
+
+def _collision_cutoff_ctes(collisions_table, status_history_table, cutoff_table):
+    """
+    CTEs shared by the fingerprints and the cutoffs: per collision, its case year and, through the created year of
+    its status history (as in vw_valid_collision_from_oracle), the collision_cutoff_dates row deciding its validity.
+    """
+    return f"""
+        collision_hashes AS (
+            SELECT src.id, {case_year_expression('src')} AS case_year, hashtextextended(src::TEXT, 0) AS row_hash
+            FROM {collisions_table} src
+        ),
+        status_hashes AS (
+            SELECT csh.collision_id, SUM(hashtextextended(csh::TEXT, 0)) AS row_hash,
+                   EXTRACT(YEAR FROM MIN(csh.created_timestamp))::INTEGER AS created_year
+            FROM {status_history_table} csh
+            GROUP BY csh.collision_id
+        ),
+        collision_cutoffs AS (
+            SELECT ch.case_year, ch.row_hash, sh.row_hash AS status_hash, sh.created_year,
+                   ccd.created_year AS cutoff_year, ccd.cutoff_end_date,
+                   CASE WHEN ccd.created_year IS NOT NULL THEN hashtextextended(ccd::TEXT, 0) END AS cutoff_hash
+            FROM collision_hashes ch
+            LEFT JOIN status_hashes sh ON sh.collision_id = ch.id
+            LEFT JOIN {cutoff_table} ccd ON ccd.created_year = sh.created_year
+        )
+    """
+
+def get_case_year_cutoffs(postgres_db, collisions_table, status_history_table, cutoff_table='collision_cutoff_dates'):
+    """
+    Return {case_year: cutoff_end_date} for plan_year_refresh(). The view picks a collision's cutoff by the created
+    year of its status history, not by its case year, so a case year waits for the latest cutoff among its
+    collisions; it maps to None while any of them has a created year without a collision_cutoff_dates row.
+    """
+    query = f"""
+        WITH {_collision_cutoff_ctes(collisions_table, status_history_table, cutoff_table)}
+        SELECT case_year,
+               CASE WHEN BOOL_OR(created_year IS NOT NULL AND cutoff_year IS NULL) THEN NULL
+                    ELSE MAX(cutoff_end_date) END AS cutoff_end_date
+        FROM collision_cutoffs
+        GROUP BY case_year
+    """
+    cursor = postgres_db.conn.cursor()
+    try:
+        cursor.execute(query)
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+def get_source_fingerprints(postgres_db, collisions_table, status_history_table, cutoff_table='collision_cutoff_dates'):
+    """
+    Return {case_year: fingerprint} over the source rows that feed a case_year: the collisions
+    themselves, their status history and the cutoff rows of its created years (which decide validity).
+    Any insert, update or delete in those tables changes the fingerprint of the affected year.
+    """
+    query = f"""
+        WITH {_collision_cutoff_ctes(collisions_table, status_history_table, cutoff_table)}
+        SELECT
+            case_year,
+            COUNT(*)::TEXT || ':' || SUM(row_hash)::TEXT || ':' || COALESCE(SUM(status_hash), 0)::TEXT
+                || ':' || COALESCE(SUM(cutoff_hash), 0)::TEXT AS fingerprint
+        FROM collision_cutoffs
+        GROUP BY case_year
+    """
+    cursor = postgres_db.conn.cursor()
+    try:
+        cursor.execute(query)
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+def get_table_fingerprints(postgres_db, table_name, expression=None):
+    """
+    Return {case_year: fingerprint} over the rows of a single source table (e.g. analytics_collisions), grouped by
+    `expression` over the alias `src` (default: the year derived from the timestamps).
+    """
+    query = f"""
+        SELECT {expression or case_year_expression('src')} AS case_year,
+               COUNT(*)::TEXT || ':' || SUM(hashtextextended(src::TEXT, 0))::TEXT AS fingerprint
+        FROM {table_name} src
+        GROUP BY 1
+    """
+    cursor = postgres_db.conn.cursor()
+    try:
+        cursor.execute(query)
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+def combine_fingerprints(*fingerprint_maps):
+    """ Combine per-source {case_year: fingerprint} maps into one, so a change in any source refreshes the year. """
+    case_years = set().union(*fingerprint_maps)
+    return {case_year: '|'.join(fingerprints.get(case_year, '') for fingerprints in fingerprint_maps)
+            for case_year in case_years}
+
+def year_refresh_key(target_table):
+    """ Name `target_table` is recorded under: folded to lowercase, as PostgreSQL folds the unquoted table name. """
+    return target_table.lower()
+
+def get_recorded_fingerprints(postgres_db, target_table):
+    """ Return {case_year: fingerprint} recorded by the last successful load of `target_table`. """
+    create_query = f"""
+        CREATE TABLE IF NOT EXISTS {YEAR_REFRESH_STATE_TABLE} (
+            target_table TEXT NOT NULL,
+            case_year INTEGER NOT NULL,
+            source_fingerprint TEXT NOT NULL,
+            refreshed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (target_table, case_year)
+        );
+    """
+    postgres_db.execute_query(create_query)
+    cursor = postgres_db.conn.cursor()
+    try:
+        cursor.execute(
+            f"SELECT case_year, source_fingerprint FROM {YEAR_REFRESH_STATE_TABLE} WHERE target_table = %s",
+            (year_refresh_key(target_table),)
+        )
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+def get_loaded_case_years(postgres_db, target_table, case_years):
+    """ Return the set of `case_years` that still have rows in `target_table` (one index/partition probe per year). """
+    years = [int(year) for year in case_years if year is not None]
+    if not years:
+        return set()
+    query = f"""
+        SELECT y.case_year
+        FROM unnest(%s::INTEGER[]) AS y(case_year)
+        WHERE EXISTS (SELECT 1 FROM {target_table} t WHERE t.case_year = y.case_year)
+    """
+    cursor = postgres_db.conn.cursor()
+    try:
+        cursor.execute(query, (years,))
+        return {case_year for case_year, in cursor.fetchall()}
+    finally:
+        postgres_db.conn.rollback()  # end the read-only transaction
+        cursor.close()
+
+def clear_year_refresh_state(postgres_db, target_table):
+    """ Forget the recorded years of `target_table`, e.g. after it was dropped, so every year is loaded again. """
+    postgres_db.execute_query(f"""
+        DO $$
+        BEGIN
+            IF to_regclass('{YEAR_REFRESH_STATE_TABLE}') IS NOT NULL THEN
+                DELETE FROM {YEAR_REFRESH_STATE_TABLE} WHERE target_table = '{year_refresh_key(target_table)}';
+            END IF;
+        END $$;
+    """)
+
+def plan_year_refresh(source_fingerprints, recorded_fingerprints, cutoff_calendar, today=None, loaded_years=None):
+    """
+    Split the case years in `source_fingerprints` into (years_to_refresh, frozen_years).
+
+    A year is frozen when its cutoff date in `cutoff_calendar` (see get_case_year_cutoffs) has passed and
+    its source fingerprint matches the one recorded at the last load; every other year (cutoff still open, no cutoff defined, new, changed
+    or removed source data, or no case year at all) is refreshed. With `loaded_years` (see
+    get_loaded_case_years), a year missing from the target, e.g. after a truncate, is refreshed as well.
+    """
+    today = today or date.today()
+    years_to_refresh, frozen_years = [], []
+    for case_year, fingerprint in source_fingerprints.items():
+        cutoff_end_date = cutoff_calendar.get(case_year)
+        cutoff_passed = cutoff_end_date is not None and cutoff_end_date < today
+        still_loaded = loaded_years is None or case_year in loaded_years
+        if cutoff_passed and still_loaded and recorded_fingerprints.get(case_year) == fingerprint:
+            frozen_years.append(case_year)
+        else:
+            years_to_refresh.append(case_year)
+    # Years that were loaded before but have no source rows left are refreshed so their rows get removed
+    years_to_refresh.extend(case_year for case_year in recorded_fingerprints if case_year not in source_fingerprints)
+    logging.info(f"Refreshing case years {sorted(years_to_refresh, key=str)}; skipping {len(frozen_years)} frozen years.")
+    return years_to_refresh, frozen_years
+
+def case_year_filter(case_years, expression=None):
+    """
+    SQL predicate that keeps only rows whose case year is in `case_years` (None matches a missing year).
+    `expression` defaults to deriving the case year from the source timestamps; pass 'case_year' for fusion tables.
+    """
+    expression = expression or case_year_expression()
+    years = [int(year) for year in case_years if year is not None]
+    predicates = []
+    if years:
+        predicates.append(f"{expression} IN ({', '.join(str(year) for year in years)})")
+    if None in case_years:
+        predicates.append(f"{expression} IS NULL")
+    return f"({' OR '.join(predicates)})" if predicates else "FALSE"
+
+def record_year_refresh(postgres_db, target_table, source_fingerprints, case_years):
+    """
+    Record the fingerprints that the refreshed `case_years` of `target_table` were loaded from.
+    Rows without a case year have no cutoff and are never frozen, so they are not recorded.
+    """
+    target_table = year_refresh_key(target_table)
+    for case_year in case_years:
+        if case_year is None:
+            continue
+        if case_year not in source_fingerprints:
+            delete_query = f"DELETE FROM {YEAR_REFRESH_STATE_TABLE} WHERE target_table = %s AND case_year = %s"
+            postgres_db.execute_query(delete_query, (target_table, case_year))
+            continue
+        upsert_query = f"""
+            INSERT INTO {YEAR_REFRESH_STATE_TABLE} (target_table, case_year, source_fingerprint, refreshed_at)
+            VALUES (%s, %s, %s, NOW())
+            ON CONFLICT (target_table, case_year)
+            DO UPDATE SET source_fingerprint = EXCLUDED.source_fingerprint, refreshed_at = EXCLUDED.refreshed_at
+        """
+        postgres_db.execute_query(upsert_query, (target_table, case_year, source_fingerprints[case_year]))
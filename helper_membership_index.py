@@ -0,0 +1,125 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+import logging
+
+from helper_arrow_handoff import get_recorded_ingest_run, ingest_table_key
+
+# One index per (view) per process, so every fusion table transform in a run shares it
+_membership_indexes = {}
+
+VALID_COLLISION_VIEW = 'vw_valid_collision_from_oracle'
+
+class MembershipIndex:
+    """
+    Sorted, de-duplicated int64 array of IDs (negative pre-2016 collision IDs included).
+
+    Membership of a whole column is one np.searchsorted call, O(n log m) with no Python objects, and
+    the array can be saved as .npy and memory-mapped by other processes instead of being rebuilt.
+    """
+    def __init__(self, ids, already_sorted=False):
+        ids = np.asarray(ids, dtype=np.int64)
+        self.ids = ids if already_sorted else np.unique(ids)
+        logging.debug(f"Built membership index with {len(self.ids)} ids.")
+
+    @classmethod
+    def from_postgres(cls, postgres_db, query):
+        """ Build the index from the first column of `query`. """
+        cursor = postgres_db.conn.cursor()
+        try:
+            cursor.execute(query)
+            return cls(np.fromiter((row[0] for row in cursor), dtype=np.int64))
+        finally:
+            cursor.close()
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """ Load an index saved with save(); with `mmap` the array is memory-mapped read-only, not copied. """
+        return cls(np.load(path, mmap_mode='r' if mmap else None), already_sorted=True)
+
+    def save(self, path):
+        np.save(path, self.ids)
+        logging.debug(f"Saved membership index of {len(self.ids)} ids to {path}.")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def contains(self, values):
+        """ Vectorized membership test; returns a boolean array (False for NULL values). """
+        values = pd.Series(values) if not isinstance(values, pd.Series) else values
+        present = values.notna().to_numpy()
+        keys = values.where(present, 0).to_numpy(dtype=np.int64)
+        if len(self.ids) == 0:
+            return np.zeros(len(keys), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.ids, keys), len(self.ids) - 1)
+        return present & (self.ids[positions] == keys)
+
+    def filter(self, df, column):
+        """ Keep only the rows of `df` whose `column` is in the index. """
+        return df[self.contains(df[column])]
+
+def get_view_source_markers(postgres_db, view):
+    """
+    Return (definition, [(table, marker)]) for `view`: its SQL and, for each table it reads, the ingest run that
+    last loaded the table (see helper_arrow_handoff.py) or, for tables without a recorded run, a hash of their rows.
+    """
+    cursor = postgres_db.conn.cursor()
+    try:
+        cursor.execute("SELECT pg_get_viewdef(%s::regclass)", (view,))
+        definition = cursor.fetchone()[0]
+        cursor.execute("""
+            SELECT DISTINCT table_schema, table_name
+            FROM information_schema.view_table_usage
+            WHERE view_name = %s
+            ORDER BY table_schema, table_name
+        """, (view,))
+        source_tables = cursor.fetchall()
+        markers = []
+        for table_schema, table_name in source_tables:
+            # Runs are recorded under the folded name, which is also what information_schema reports
+            recorded_run = get_recorded_ingest_run(postgres_db, ingest_table_key(table_name))
+            if recorded_run is not None:
+                marker = f"run:{recorded_run[0]}"
+            else:
+                cursor.execute(f"SELECT COUNT(*)::TEXT || ':' || COALESCE(SUM(hashtextextended(t::TEXT, 0)), 0)::TEXT "
+                               f"FROM {table_schema}.{table_name} t")
+                marker = f"rows:{cursor.fetchone()[0]}"
+            markers.append((f"{table_schema}.{table_name}", marker))
+        return definition, markers
+    finally:
+        postgres_db.conn.rollback()  # end the read-only transaction
+        cursor.close()
+
+def get_view_source_key(postgres_db, view):
+    """ Key of what `view` currently returns, built from get_view_source_markers(). """
+    definition, markers = get_view_source_markers(postgres_db, view)
+    digest = hashlib.sha256(definition.encode())
+    for table, marker in markers:
+        digest.update(f"|{table}={marker}".encode())
+    return digest.hexdigest()
+
+def get_valid_collision_index(postgres_db, view=VALID_COLLISION_VIEW, cache_path=None):
+    """
+    Return the process-wide index of valid collision IDs, building it from `view` on first use.
+    With `cache_path`, the .npy file there is memory-mapped instead when its `<cache_path>.key` matches
+    get_view_source_key(); otherwise the index is rebuilt and saved there, with its key, for other processes.
+    """
+    if view not in _membership_indexes:
+        source_key = get_view_source_key(postgres_db, view) if cache_path else None
+        key_path = f"{cache_path}.key"
+        cached_key = None
+        if cache_path and os.path.exists(cache_path) and os.path.exists(key_path):
+            with open(key_path) as f:
+                cached_key = f.read().strip()
+        if cached_key is not None and cached_key == source_key:
+            _membership_indexes[view] = MembershipIndex.load(cache_path)
+        else:
+            if cache_path and os.path.exists(cache_path):
+                logging.info(f"Valid ID cache {cache_path} was built from other {view} data; rebuilding it.")
+            _membership_indexes[view] = MembershipIndex.from_postgres(postgres_db, f"SELECT collision_id FROM {view}")
+            if cache_path:
+                _membership_indexes[view].save(cache_path)
+                with open(key_path, 'w') as f:
+                    f.write(source_key)
+    return _membership_indexes[view]
@@ -0,0 +1,130 @@
+import pandas as pd
+import numpy as np
+import logging
+
+from helper_frozen_years import case_year_filter
+
+# Default source precedence for fusion tables: the first source wins a duplicate
+DEFAULT_SOURCE_PRECEDENCE = ('eCollision Oracle', 'eCollision Analytics')
+
+def merge_by_precedence(df_sources, keys=('id', 'case_nbr'), source_precedence=DEFAULT_SOURCE_PRECEDENCE,
+                        column_precedence=None, fill_missing=True, source_column='source'):
+    """
+    Merge rows from several sources into one DataFrame, resolving duplicates by source precedence.
+
+    - df_sources: DataFrames that each carry a `source_column`.
+    - keys: join keys checked in order; two rows that share a non-null value on any key are duplicates.
+      Each key is resolved with a single hash pass (DataFrame.duplicated), so the merge is linear in rows.
+    - source_precedence: sources in winning order; unlisted sources lose to listed ones.
+    - column_precedence: {column: (source, ...)} overrides the row winner for individual columns, e.g.
+      take `loc_gps_lat` from Analytics even when the Oracle row wins.
+    - fill_missing: fill NULLs in the winning row from the losing row.
+
+    Returns (df_merged, df_conflicts). df_conflicts has one row per duplicate pair, listing the
+    columns whose non-null values disagree.
+    """
+    column_precedence = column_precedence or {}
+    df_all = pd.concat(df_sources, ignore_index=True, sort=False)
+    source_rank = {source: rank for rank, source in enumerate(source_precedence)}
+    df_all['_source_rank'] = df_all[source_column].map(source_rank).fillna(len(source_rank)).astype('int64')
+    df_all = df_all.sort_values('_source_rank', kind='stable')
+
+    keep = pd.Series(True, index=df_all.index)
+    pairs = []
+    for key in keys:
+        if key not in df_all.columns:
+            continue
+        candidates = df_all[keep & df_all[key].notna()]
+        # Hash index on the key: the first (highest-precedence) row per key value is the winner
+        winner_by_value = candidates.drop_duplicates(subset=key, keep='first')
+        winner_index = pd.Series(winner_by_value.index, index=winner_by_value[key].to_numpy())
+        losers = candidates[candidates.duplicated(subset=key, keep='first')]
+        if losers.empty:
+            continue
+        pairs.append(pd.DataFrame({
+            'key': key,
+            'key_value': losers[key].astype(str).to_numpy(),
+            'winner_index': winner_index.loc[losers[key].to_numpy()].to_numpy(),
+            'loser_index': losers.index.to_numpy(),
+        }))
+        keep.loc[losers.index] = False
+
+    df_pairs = pd.concat(pairs, ignore_index=True) if pairs else pd.DataFrame(
+        columns=['key', 'key_value', 'winner_index', 'loser_index']
+    )
+    df_conflicts = build_conflict_report(df_all, df_pairs, source_column)
+
+    df_merged = df_all.copy()
+    if not df_pairs.empty:
+        winners = df_pairs['winner_index'].to_numpy()
+        losers = df_pairs['loser_index'].to_numpy()
+        for column in df_merged.columns.drop(['_source_rank', source_column]):
+            winner_values = df_merged.loc[winners, column].to_numpy()
+            loser_values = df_merged.loc[losers, column].to_numpy()
+            take_loser = np.zeros(len(df_pairs), dtype=bool)
+            if fill_missing:
+                take_loser |= pd.isna(winner_values) & ~pd.isna(loser_values)
+            if column in column_precedence:
+                column_rank = {source: rank for rank, source in enumerate(column_precedence[column])}
+                winner_rank = df_merged.loc[winners, source_column].map(column_rank).fillna(len(column_rank)).to_numpy()
+                loser_rank = df_merged.loc[losers, source_column].map(column_rank).fillna(len(column_rank)).to_numpy()
+                take_loser |= (loser_rank < winner_rank) & ~pd.isna(loser_values)
+            if take_loser.any():
+                df_merged.loc[winners[take_loser], column] = loser_values[take_loser]
+
+    df_merged = df_merged[keep.reindex(df_merged.index).to_numpy()].drop(columns='_source_rank')
+    logging.info(f"Merged {len(df_all)} rows into {len(df_merged)}; resolved {len(df_pairs)} duplicates.")
+    return df_merged, df_conflicts
+
+def build_conflict_report(df_all, df_pairs, source_column='source'):
+    """ Describe each duplicate pair: sources, ids, the winner's case_year and the columns whose non-null values differ. """
+    if df_pairs.empty:
+        return pd.DataFrame(columns=['key', 'key_value', 'winner_source', 'winner_id', 'loser_source', 'loser_id',
+                                     'case_year', 'differing_columns'])
+    winners = df_all.loc[df_pairs['winner_index'].to_numpy()]
+    losers = df_all.loc[df_pairs['loser_index'].to_numpy()]
+
+    differing = [[] for _ in range(len(df_pairs))]
+    for column in df_all.columns.drop(['_source_rank', source_column]):
+        winner_values = winners[column].to_numpy()
+        loser_values = losers[column].to_numpy()
+        both_present = ~pd.isna(winner_values) & ~pd.isna(loser_values)
+        differs = np.zeros(len(df_pairs), dtype=bool)
+        differs[both_present] = winner_values[both_present] != loser_values[both_present]
+        for position in np.flatnonzero(differs):
+            differing[position].append(column)
+
+    return pd.DataFrame({
+        'key': df_pairs['key'].to_numpy(),
+        'key_value': df_pairs['key_value'].to_numpy(),
+        'winner_source': winners[source_column].to_numpy(),
+        'winner_id': winners['id'].to_numpy() if 'id' in winners.columns else None,
+        'loser_source': losers[source_column].to_numpy(),
+        'loser_id': losers['id'].to_numpy() if 'id' in losers.columns else None,
+        'case_year': winners['case_year'].to_numpy() if 'case_year' in winners.columns else None,
+        'differing_columns': [', '.join(columns) for columns in differing],
+    })
+
+def write_conflict_report(postgres_db, df_conflicts, report_table, case_years=None):
+    """
+    Replace the conflicts of `case_years` (default: all) in `report_table` with the latest merge conflict report,
+    so the conflicts found when frozen years were last loaded stay in the report.
+    """
+    create_query = f"""
+        CREATE TABLE IF NOT EXISTS {report_table} (
+            key TEXT,
+            key_value TEXT,
+            winner_source TEXT,
+            winner_id BIGINT,
+            loser_source TEXT,
+            loser_id BIGINT,
+            differing_columns TEXT,
+            reported_at TIMESTAMP DEFAULT NOW()
+        );
+        ALTER TABLE {report_table} ADD COLUMN IF NOT EXISTS case_year INTEGER;
+        DELETE FROM {report_table} WHERE {case_year_filter(case_years, 'case_year') if case_years is not None else 'TRUE'};
+    """
+    postgres_db.execute_query(create_query)
+    if not df_conflicts.empty:
+        postgres_db.bulk_insert_dataframe(df_conflicts, report_table)
+    logging.info(f"Wrote {len(df_conflicts)} merge conflicts to {report_table}.")
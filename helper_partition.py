@@ -0,0 +1,82 @@
+import logging
+
+# Fusion tables are range partitioned on this column when partition_by_case_year is enabled
+PARTITION_COLUMN = 'case_year'
+
+def case_year_partition_name(target_table, case_year):
+    """ Name of the partition holding `case_year`; rows without a case year live in the default partition. """
+    return f"{target_table}_default" if case_year is None else f"{target_table}_y{int(case_year)}"
+
+def get_attached_partitions(postgres_db, target_table):
+    """ Return the names of the partitions currently attached to `target_table`. """
+    query = f"""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON pg_inherits.inhparent = parent.oid
+        JOIN pg_class child ON pg_inherits.inhrelid = child.oid
+        WHERE parent.relname = '{target_table.lower()}'
+    """
+    cursor = postgres_db.conn.cursor()
+    try:
+        cursor.execute(query)
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+def swap_case_year_partition(postgres_db, target_table, case_year, df):
+    """
+    Replace one case_year partition of `target_table` with the rows in `df`.
+
+    The rows are loaded into a detached staging table first, with a CHECK constraint matching the
+    partition bounds so that ATTACH PARTITION can skip its validation scan. The old partition is then
+    detached and dropped and the staging table attached in its place, all in a single transaction,
+    so readers never see a half-loaded year and no full-table DELETE (or the bloat it leaves) is needed.
+    """
+    partition_name = case_year_partition_name(target_table, case_year)
+    staging_name = f"{partition_name}_staging"
+
+    create_staging_query = f"""
+        DROP TABLE IF EXISTS {staging_name};
+        CREATE TABLE {staging_name} (LIKE {target_table} INCLUDING DEFAULTS INCLUDING INDEXES);
+    """
+    if case_year is None:
+        bounds = "DEFAULT"
+    else:
+        year = int(case_year)
+        bounds = f"FOR VALUES FROM ({year}) TO ({year + 1})"
+        create_staging_query += f"""
+        ALTER TABLE {staging_name} ADD CONSTRAINT {staging_name}_bounds
+            CHECK ({PARTITION_COLUMN} IS NOT NULL AND {PARTITION_COLUMN} >= {year} AND {PARTITION_COLUMN} < {year + 1});
+        """
+    postgres_db.execute_query(create_staging_query)
+    postgres_db.bulk_insert_dataframe(df, staging_name)
+
+    swap_query = ""
+    if partition_name in get_attached_partitions(postgres_db, target_table):
+        swap_query += f"ALTER TABLE {target_table} DETACH PARTITION {partition_name};\n"
+    swap_query += f"""
+        DROP TABLE IF EXISTS {partition_name};
+        ALTER TABLE {staging_name} RENAME TO {partition_name};
+        ALTER TABLE {target_table} ATTACH PARTITION {partition_name} {bounds};
+    """
+    if case_year is not None:
+        # The bounds constraint has served its purpose once the partition is attached
+        swap_query += f"ALTER TABLE {partition_name} DROP CONSTRAINT {staging_name}_bounds;\n"
+    postgres_db.execute_query(swap_query)
+    logging.debug(f"Swapped partition {partition_name} of {target_table} with {len(df)} rows.")
+
+def load_by_case_year_partitions(postgres_db, target_table, df, case_years=None):
+    """
+    Swap in one partition per case_year present in `df`. If `case_years` is given, every year in it is
+    swapped too (with an empty partition when `df` has no rows for it); other years are left untouched.
+    """
+    import pandas as pd
+
+    df_by_year = {
+        None if pd.isna(case_year) else int(case_year): df_year  # rows without a case year go to the default partition
+        for case_year, df_year in df.groupby(PARTITION_COLUMN, dropna=False)
+    }
+    for case_year in case_years or ():
+        df_by_year.setdefault(case_year, df.iloc[0:0])
+    for case_year, df_year in df_by_year.items():
+        swap_case_year_partition(postgres_db, target_table, case_year, df_year)
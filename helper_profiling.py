@@ -0,0 +1,93 @@
+import cProfile
+import pstats
+import os
+import re
+import sys
+import time
+import threading
+import logging
+from collections import Counter
+from contextlib import contextmanager
+
+# Directory that per-stage profiles are written to; None means profiling is off
+_profile_dir = None
+_stage_counts = Counter()
+
+SAMPLE_INTERVAL_SECONDS = 0.005
+TOP_FUNCTIONS = 15
+
+def enable_profiling(profile_dir):
+    """ Turn on per-stage profiling; every profile_stage() from now on writes its files to `profile_dir`. """
+    global _profile_dir
+    os.makedirs(profile_dir, exist_ok=True)
+    _profile_dir = profile_dir
+    logging.info(f"Profiling enabled, writing stage profiles to {profile_dir}.")
+
+class StackSampler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a background thread and counts
+    identical stacks, producing the collapsed-stack format read by flamegraph.pl and speedscope.
+    """
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+@contextmanager
+def profile_stage(stage_name):
+    """
+    Profile the enclosed block as one stage. When profiling is enabled this writes
+    `<stage>.pstats` (cProfile) and `<stage>.collapsed` (sampled stacks, for flame graphs) and prints
+    the stage's hottest functions; when it is disabled the block runs with no profiler attached.
+    """
+    if _profile_dir is None:
+        yield
+        return
+
+    _stage_counts[stage_name] += 1
+    file_stem = re.sub(r'[^A-Za-z0-9_.-]+', '_', stage_name)
+    if _stage_counts[stage_name] > 1:
+        file_stem += f"_{_stage_counts[stage_name]}"
+    file_stem = os.path.join(_profile_dir, file_stem)
+
+    profiler = cProfile.Profile()
+    sampler = StackSampler(threading.get_ident())
+    start_time = time.time()
+    sampler.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        sampler.stop()
+        execution_time = time.time() - start_time
+
+        profiler.dump_stats(f"{file_stem}.pstats")
+        sampler.write_collapsed(f"{file_stem}.collapsed")
+        print(f"Profile of stage '{stage_name}': {execution_time:.2f} seconds, written to {file_stem}.pstats/.collapsed")
+        pstats.Stats(profiler).sort_stats('tottime').print_stats(TOP_FUNCTIONS)
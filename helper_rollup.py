@@ -0,0 +1,77 @@
+import logging
+
+from helper_frozen_years import case_year_filter
+
+# Dimensions the rollup is grouped by; any aggregate over a subset of them can be answered from the rollup
+ROLLUP_DIMENSIONS = ('case_year', 'case_month', 'source', 'file_status_id')
+ROLLUP_SUFFIX = '_rollup'
+
+def rollup_table_name(target_table):
+    return f"{target_table}{ROLLUP_SUFFIX}"
+
+def create_rollup_table_query(target_table):
+    rollup_table = rollup_table_name(target_table)
+    return f"""
+        CREATE TABLE IF NOT EXISTS {rollup_table} (
+            case_year INTEGER,
+            case_month INTEGER,
+            source TEXT,
+            file_status_id BIGINT,
+            collision_count BIGINT NOT NULL,
+            refreshed_at TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+        CREATE INDEX IF NOT EXISTS {rollup_table}_dims_idx ON {rollup_table} (case_year, source, file_status_id);
+    """
+
+def refresh_rollup(postgres_db, target_table, case_years=None):
+    """
+    Recompute the rollup rows of `target_table` for `case_years` (all years when None) in one transaction,
+    so only the years the ETL just reloaded are rescanned and readers never see a half-refreshed year.
+    """
+    rollup_table = rollup_table_name(target_table)
+    year_filter = case_year_filter(case_years, 'case_year') if case_years is not None else 'TRUE'
+    refresh_query = f"""
+        {create_rollup_table_query(target_table)}
+        DELETE FROM {rollup_table} WHERE {year_filter};
+        INSERT INTO {rollup_table} (case_year, case_month, source, file_status_id, collision_count)
+        SELECT
+            case_year,
+            EXTRACT(MONTH FROM COALESCE(occurence_timestamp, reported_timestamp))::INTEGER AS case_month,
+            source,
+            file_status_id,
+            COUNT(*)
+        FROM {target_table}
+        WHERE {year_filter}
+        GROUP BY 1, 2, 3, 4;
+    """
+    postgres_db.execute_query(refresh_query)
+    logging.info(f"Refreshed {rollup_table} for case years {'all' if case_years is None else sorted(case_years, key=str)}.")
+
+def query_rollup(postgres_db, target_table, group_by=('case_year',), filters=None):
+    """
+    Answer a collision count question from the rollup instead of scanning `target_table`, e.g.
+        query_rollup(db, 'fusion_collisions', group_by=('case_year', 'source'), filters={'case_year': [2022, 2023]})
+    `filters` maps a dimension to a value or a list of values. Returns a DataFrame with the group_by
+    columns and collision_count; raises ValueError for dimensions the rollup does not carry.
+    """
+    import pandas as pd
+
+    filters = filters or {}
+    unsupported = [dimension for dimension in (*group_by, *filters) if dimension not in ROLLUP_DIMENSIONS]
+    if unsupported:
+        raise ValueError(f"The rollup cannot answer queries on {unsupported}; supported dimensions are {ROLLUP_DIMENSIONS}.")
+
+    predicates, params = [], []
+    for dimension, value in filters.items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        predicates.append(f"{dimension} IN ({', '.join(['%s'] * len(values))})")
+        params.extend(values)
+
+    select_columns = ', '.join(group_by)
+    query = f"""
+        SELECT {select_columns + ', ' if group_by else ''}SUM(collision_count)::BIGINT AS collision_count
+        FROM {rollup_table_name(target_table)}
+        WHERE {' AND '.join(predicates) or 'TRUE'}
+        {f'GROUP BY {select_columns} ORDER BY {select_columns}' if group_by else ''}
+    """
+    return pd.read_sql(query, postgres_db.conn, params=params)
@@ -0,0 +1,59 @@
+import math
+import logging
+
+# Planning assumptions; tune these from the execution times printed by real runs
+THROUGHPUT_BYTES_PER_SECOND = 8 * 1024 * 1024   # sustained extract + load rate of a single stream
+TABLE_OVERHEAD_SECONDS = 2.0                    # metadata queries, CREATE TABLE, commits
+TARGET_BATCH_BYTES = 4 * 1024 * 1024            # bytes per insert batch
+TARGET_SLICE_BYTES = 256 * 1024 * 1024          # bytes per extraction query, bounds client memory
+MIN_BATCH_SIZE = 100
+MAX_BATCH_SIZE = 50000
+MAX_SLICES = 64
+DEFAULT_AVG_ROW_LEN = 200                       # used when a table has never been analyzed
+
+def plan_table(table_name, num_rows, avg_row_len, sample_size=None):
+    """
+    Size the extraction of one table from its row count and average row length. Slices are extracted one after
+    another over a single stream, so the estimate does not divide by them.
+    """
+    avg_row_len = avg_row_len or DEFAULT_AVG_ROW_LEN
+    est_rows = min(num_rows, sample_size) if sample_size else num_rows
+    est_bytes = est_rows * avg_row_len
+
+    batch_size = max(MIN_BATCH_SIZE, min(MAX_BATCH_SIZE, TARGET_BATCH_BYTES // avg_row_len))
+    slices = max(1, min(MAX_SLICES, math.ceil(est_bytes / TARGET_SLICE_BYTES)))
+    est_seconds = TABLE_OVERHEAD_SECONDS + est_bytes / THROUGHPUT_BYTES_PER_SECOND
+
+    return {
+        'table_name': table_name,
+        'est_rows': est_rows,
+        'avg_row_len': avg_row_len,
+        'est_bytes': est_bytes,
+        'batch_size': batch_size,
+        'slices': slices,
+        'est_seconds': est_seconds,
+    }
+
+def plan_run(table_names, source_db, sample_size=None):
+    """
+    Build a run plan for `table_names` from the source database's table statistics
+    (OracleDB/AnalyticsDB.get_table_stats). Tables are ordered largest first.
+    """
+    table_stats = source_db.get_table_stats(table_names)
+    plan = []
+    for table_name in table_names:
+        num_rows, avg_row_len = table_stats.get(table_name.upper(), (0, 0))
+        if table_name.upper() not in table_stats:
+            logging.warning(f"No statistics found for table {table_name}; planning it as empty.")
+        plan.append(plan_table(table_name, num_rows, avg_row_len, sample_size=sample_size))
+    plan.sort(key=lambda table_plan: table_plan['est_bytes'], reverse=True)
+    return plan
+
+def print_run_plan(plan):
+    """ Print the plan as a dry-run table with the estimated total duration. """
+    print(f"{'table':<36}{'est_rows':>12}{'est_MB':>10}{'batch':>8}{'slices':>8}{'est_s':>9}")
+    for table_plan in plan:
+        print(f"{table_plan['table_name']:<36}{table_plan['est_rows']:>12}{table_plan['est_bytes'] / 1024 / 1024:>10.1f}"
+              f"{table_plan['batch_size']:>8}{table_plan['slices']:>8}{table_plan['est_seconds']:>9.1f}")
+    total_seconds = sum(table_plan['est_seconds'] for table_plan in plan)
+    print(f"Estimated duration: {total_seconds:.0f} seconds ({total_seconds / 60:.1f} minutes) for {len(plan)} tables")
@@ -0,0 +1,76 @@
+import logging
+
+from reference import sampling_root_table, sampling_relations, sampling_reference_tables
+
+# Oracle rejects IN lists longer than 1000 items (ORA-01795)
+IN_LIST_CHUNK_SIZE = 1000
+
+# SQL that differs between the source databases
+SAMPLING_DIALECTS = {
+    'oracle': {
+        'table': "ECRDBA.{table_name}",
+        'case_year': "EXTRACT(YEAR FROM COALESCE(OCCURENCE_TIMESTAMP, REPORTED_TIMESTAMP))",
+        'row_hash': "ORA_HASH(ID, 4294967295, {seed})",
+        'ceil': "CEIL",
+    },
+    'analytics': {
+        'table': "[eCollisionAnalytics].[ECRDBA].{table_name}",
+        'case_year': "YEAR(COALESCE(OCCURENCE_TIMESTAMP, REPORTED_TIMESTAMP))",
+        'row_hash': "ABS(CHECKSUM(ID, {seed}))",
+        'ceil': "CEILING",
+    },
+}
+
+def in_list_predicate(column, ids, chunk_size=IN_LIST_CHUNK_SIZE):
+    """ `column IN (...)` over `ids`, split into OR-ed lists of at most `chunk_size` items. """
+    ids = sorted(set(ids))
+    if not ids:
+        return "1 = 0"
+    in_lists = [
+        f"{column} IN ({', '.join(str(int(i)) for i in ids[start:start + chunk_size])})"
+        for start in range(0, len(ids), chunk_size)
+    ]
+    return f"({' OR '.join(in_lists)})"
+
+def create_seed_query(dialect, sample_size, seed=0):
+    """
+    Select about `sample_size` collision ids, spread over case years in proportion to each year's size
+    (every year gets at least one). Ordering by a seeded hash keeps the sample stable between runs.
+    """
+    sql = SAMPLING_DIALECTS[dialect]
+    return f"""
+        SELECT ID FROM (
+            SELECT ID,
+                ROW_NUMBER() OVER (PARTITION BY {sql['case_year']} ORDER BY {sql['row_hash'].format(seed=seed)}) AS rn,
+                COUNT(*) OVER (PARTITION BY {sql['case_year']}) AS year_rows,
+                COUNT(*) OVER () AS total_rows
+            FROM {sql['table'].format(table_name=sampling_root_table)}
+        ) s
+        WHERE rn <= {sql['ceil']}(1.0 * {sample_size} * year_rows / total_rows)
+    """
+
+def build_sample_predicates(source_db, dialect, sample_size, seed=0):
+    """
+    Return {table_name: WHERE predicate} selecting a referentially consistent sample: the seed collisions,
+    the rows of every table in `sampling_relations` that hang off them, and all rows of the reference tables.
+    Tables missing from the result are not related to collisions and keep their usual row-limit sampling.
+    """
+    sql = SAMPLING_DIALECTS[dialect]
+    _, seed_rows = source_db.query_without_param(create_seed_query(dialect, sample_size, seed))
+    predicates = {sampling_root_table: in_list_predicate('ID', [row[0] for row in seed_rows])}
+    logging.info(f"Sampled {len(seed_rows)} seed collisions stratified by case year.")
+
+    for table_name, (column, parent_table, parent_column) in sampling_relations.items():
+        if parent_table == sampling_root_table and parent_column == 'ID':
+            parent_ids = [row[0] for row in seed_rows]
+        else:
+            parent_query = (f"SELECT {parent_column} FROM {sql['table'].format(table_name=parent_table)} "
+                            f"WHERE {predicates[parent_table]}")
+            _, parent_rows = source_db.query_without_param(parent_query)
+            parent_ids = [row[0] for row in parent_rows]
+        predicates[table_name] = in_list_predicate(column, parent_ids)
+        logging.debug(f"Sampling {table_name} through {len(parent_ids)} {parent_table}.{parent_column} values.")
+
+    for table_name in sampling_reference_tables:
+        predicates[table_name] = "1 = 1"
+    return predicates
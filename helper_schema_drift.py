@@ -0,0 +1,92 @@
+import logging
+
+from helper_db_operation import CopyRowStream
+
+# Type names produced by map_oracle_to_postgres/map_analytics_db_to_postgres, as information_schema spells them
+POSTGRES_TYPE_NAMES = {
+    'VARCHAR': 'character varying',
+    'CHAR': 'character',
+    'DECIMAL': 'numeric',
+    'TIMESTAMP': 'timestamp without time zone',
+    'TIMESTAMPTZ': 'timestamp with time zone',
+    'TIME': 'time without time zone',
+}
+
+def normalize_postgres_type(pg_data_type):
+    return POSTGRES_TYPE_NAMES.get(pg_data_type.upper(), pg_data_type.lower())
+
+def get_postgres_columns(postgres_db, table_name):
+    """ Return {column_name: data_type} of a PostgreSQL table from information_schema. """
+    cursor = postgres_db.conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = %s",
+            (table_name.lower(),)
+        )
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+def diff_table_schema(source_columns, target_columns, map_type):
+    """
+    Compare source columns (get_table_columns() rows: name, type, length, nullable) with the target's
+    {column_name: data_type} and return {'added': [(name, pg_type, not_null)], 'altered': [(name, old, pg_type)],
+    'removed': [name]}. Removed columns are only reported; the loaded data is kept.
+    """
+    drift = {'added': [], 'altered': [], 'removed': []}
+    source_names = set()
+    for column_name, data_type, _, nullable in source_columns:
+        name = column_name.lower()
+        source_names.add(name)
+        pg_data_type = map_type(data_type)
+        if name not in target_columns:
+            drift['added'].append((name, pg_data_type, nullable in ('N', 'NO')))
+        elif normalize_postgres_type(pg_data_type) != target_columns[name]:
+            drift['altered'].append((name, target_columns[name], pg_data_type))
+    drift['removed'] = sorted(name for name in target_columns if name not in source_names)
+    return drift
+
+def apply_schema_drift(postgres_db, target_table, drift):
+    """
+    ALTER the target table in place: add new columns (nullable until they are backfilled) and convert
+    columns whose type changed, in one transaction.
+    """
+    statements = [f"ALTER TABLE {target_table} ADD COLUMN IF NOT EXISTS {name} {pg_data_type};"
+                  for name, pg_data_type, _ in drift['added']]
+    statements += [f"ALTER TABLE {target_table} ALTER COLUMN {name} TYPE {pg_data_type} USING {name}::{pg_data_type};"
+                   for name, _, pg_data_type in drift['altered']]
+    if statements:
+        postgres_db.execute_query('\n'.join(statements))
+        logging.info(f"Applied {len(statements)} schema changes to {target_table}.")
+    if drift['removed']:
+        logging.warning(f"Columns {drift['removed']} of {target_table} no longer exist in the source; they are kept as they are.")
+
+def backfill_new_columns(postgres_db, target_table, key_column, added_columns, rows):
+    """
+    Fill newly added columns of existing rows from source `rows` of (key, *added column values):
+    COPY them into a temporary table, then UPDATE the target from it by key. Only the new columns are
+    transferred, never the whole table. NOT NULL is restored afterwards where the source declares it.
+    """
+    column_names = [name for name, _, _ in added_columns]
+    staging_table = f"{target_table}_backfill"
+    postgres_db.execute_query(
+        f"DROP TABLE IF EXISTS {staging_table}; "
+        f"CREATE TEMP TABLE {staging_table} AS SELECT {key_column}, {', '.join(column_names)} FROM {target_table} WITH NO DATA;"
+    )
+    stream = CopyRowStream(rows)
+    postgres_db.copy_from_stream(staging_table, [key_column] + column_names, stream)
+    postgres_db.execute_query(f"""
+        UPDATE {target_table} t
+        SET {', '.join(f'{name} = s.{name}' for name in column_names)}
+        FROM {staging_table} s
+        WHERE t.{key_column} = s.{key_column};
+        DROP TABLE {staging_table};
+    """)
+    logging.info(f"Backfilled {column_names} for {stream.rows_written} rows of {target_table}.")
+
+    for name, _, not_null in added_columns:
+        if not_null:
+            try:
+                postgres_db.execute_query(f"ALTER TABLE {target_table} ALTER COLUMN {name} SET NOT NULL;")
+            except Exception as e:
+                logging.warning(f"Could not set {target_table}.{name} NOT NULL after the backfill: {e}")
@@ -0,0 +1,210 @@
+import os
+import logging
+from itertools import islice
+
+from helper_export_bundle import BundleWriter
+from helper_arrow_handoff import (handoff_path, ingest_table_key, postgres_type_to_arrow, to_arrow_value, record_ingest_run,
+                                  clear_ingest_run)
+from helper_validation import ChunkValidator, get_target_schema, load_validated_batch, VALIDATION_CHUNK_SIZE
+
+# Sink targets accepted by the ingest functions
+SINK_TARGETS = ('prod', 'dev', 'export', 'arrow')
+
+class PostgresTableSink:
+    """
+    Loads rows into one PostgreSQL table, e.g. the prod or the dev copy of a source table. Rows are
+    buffered up to `batch_size`, validated (see helper_validation.py) and COPYed; rejects go to
+    `<table>_rejects`. A failed COPY is bisected so only the offending rows are rejected, and the sink keeps going.
+    With a `run_id`, the finished load is recorded in fusion_ingest_runs (see helper_arrow_handoff.py).
+    Tables with LOB columns get a LOB transfer report when the sink closes.
+    """
+    def __init__(self, postgres_db, dev_mode=False, drop_existing=False, batch_size=VALIDATION_CHUNK_SIZE,
+                 lob_chunk_size=1024 * 1024, run_id=None):
+        self.postgres_db = postgres_db
+        self.run_id = run_id
+        self.lob_chunk_size = lob_chunk_size
+        self.dev_mode = dev_mode
+        self.drop_existing = drop_existing
+        self.batch_size = batch_size or VALIDATION_CHUNK_SIZE
+        self.name = 'dev' if dev_mode else 'prod'
+
+    def open(self, target_table, columns, create_query, lob_columns=(), column_types=None):
+        self.target_table = target_table
+        self.columns = list(columns)
+        self.lob_columns = lob_columns
+        self.loaded = self.rejected = 0
+        self.lob_totals = {}
+        self._buffer = []
+        # Until close() records this run, the table no longer holds what the previous run recorded
+        clear_ingest_run(self.postgres_db, target_table)
+        if self.drop_existing:
+            logging.info(f"Dropping existing table {target_table} in PostgreSQL.")
+            self.postgres_db.execute_query(f"DROP TABLE IF EXISTS {target_table} CASCADE")
+        self.postgres_db.execute_query(create_query)
+        self.validator = ChunkValidator(get_target_schema(self.postgres_db, target_table), self.columns)
+
+    def write(self, rows):
+        self._buffer.extend(rows)
+        # LOB locators are only valid until the source fetches its next batch, so LOB rows are never held over
+        while len(self._buffer) >= self.batch_size or (self.lob_columns and self._buffer):
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            self._load(batch)
+
+    def _load(self, batch):
+        loaded, rejected = load_validated_batch(self.postgres_db, self.target_table, self.columns, self.validator, batch,
+                                                lob_columns=self.lob_columns, lob_chunk_size=self.lob_chunk_size,
+                                                lob_totals=self.lob_totals)
+        self.loaded += loaded
+        self.rejected += rejected
+
+    def close(self):
+        if self._buffer:
+            self._load(self._buffer)
+            self._buffer = []
+        logging.info(f"Loaded {self.loaded} rows into {self.target_table}; {self.rejected} rejected.")
+        if self.lob_columns:
+            # Lengths as Oracle counts them: characters for CLOB/NCLOB, bytes for BLOB
+            logging.info(f"LOB transfer for '{self.target_table}': {self.lob_totals.get('lob_values', 0)} LOB values, "
+                         f"{self.lob_totals.get('lob_length_inline', 0)} inline, {self.lob_totals.get('lob_length_streamed', 0)} streamed, "
+                         f"{self.lob_totals.get('lob_seconds', 0.0):.2f} seconds reading LOBs")
+        if self.run_id is not None:
+            record_ingest_run(self.postgres_db, self.target_table, self.run_id, self.loaded, self.rejected)
+
+class BundleSink:
+    """ Writes rows to a compressed COPY bundle (see helper_export_bundle.py), `chunk_rows` rows per chunk file. """
+    def __init__(self, export_dir, dev_mode=False, compression='zstd', chunk_rows=100000, source=None):
+        self.export_dir = export_dir
+        self.dev_mode = dev_mode
+        self.compression = compression
+        self.chunk_rows = chunk_rows
+        self.source = source
+        self.name = 'export'
+
+    def open(self, target_table, columns, create_query, lob_columns=(), column_types=None):
+        self.lob_columns = lob_columns
+        self._buffer = []
+        self.writer = BundleWriter(self.export_dir, target_table, columns, create_query=create_query,
+                                   compression=self.compression, chunk_rows=self.chunk_rows, lob_columns=lob_columns,
+                                   source=self.source)
+
+    def write(self, rows):
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.chunk_rows or self.lob_columns:
+            self.writer.write_rows(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        if self._buffer:
+            self.writer.write_rows(self._buffer)
+            self._buffer = []
+        self.writer.close()
+
+class ArrowIpcSink:
+    """
+    Writes rows to `<handoff_dir>/<table>.arrow`, an Arrow IPC file the fusion ETL memory-maps instead of
+    reading the table back from PostgreSQL. The ingest `run_id` is stored in the schema metadata. The file is
+    written under a temporary name and renamed on close, so readers never see a partial file.
+    """
+    def __init__(self, handoff_dir, dev_mode=False, run_id=None, source=None):
+        self.handoff_dir = handoff_dir
+        self.dev_mode = dev_mode
+        self.run_id = run_id
+        self.source = source
+        self.name = 'arrow'
+
+    def open(self, target_table, columns, create_query, lob_columns=(), column_types=None):
+        import pyarrow as pa
+
+        if column_types is None:
+            raise ValueError(f"The Arrow handoff of {target_table} needs the column types.")
+        os.makedirs(self.handoff_dir, exist_ok=True)
+        self.path = handoff_path(self.handoff_dir, target_table)
+        self._temp_path = f"{self.path}.{self.run_id}.tmp"
+        metadata = {'run_id': self.run_id or '', 'table_name': ingest_table_key(target_table), 'source': self.source or ''}
+        self.schema = pa.schema([(column.lower(), postgres_type_to_arrow(pg_data_type)) for column, pg_data_type in zip(columns, column_types)],
+                                metadata=metadata)
+        self.writer = pa.ipc.new_file(self._temp_path, self.schema)
+        self.rows_written = 0
+
+    def write(self, rows):
+        # Each chunk becomes one record batch, converted right away so LOB locators are read while still valid
+        import pyarrow as pa
+
+        arrays = [pa.array([to_arrow_value(row[i], field.type) for row in rows], type=field.type)
+                  for i, field in enumerate(self.schema)]
+        self.writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.rows_written += len(rows)
+
+    def close(self):
+        self.writer.close()
+        os.replace(self._temp_path, self.path)
+        logging.info(f"Wrote {self.rows_written} rows to the Arrow handoff {self.path} (run {self.run_id}).")
+
+def build_sinks(targets, postgres_db=None, drop_existing=False, batch_size=None, export_dir=None,
+                export_compression='zstd', export_dev_mode=False, source=None, lob_chunk_size=1024 * 1024,
+                handoff_dir=None, run_id=None):
+    """
+    Build one sink per target: 'prod' and 'dev' load the unsuffixed and `_dev` PostgreSQL tables,
+    'export' writes bundles to `export_dir` and 'arrow' Arrow IPC handoff files to `handoff_dir`
+    (both named like the dev tables when `export_dev_mode`). `run_id` identifies this ingest run.
+    """
+    unknown = [target for target in targets if target not in SINK_TARGETS]
+    if unknown:
+        raise ValueError(f"Unknown sink targets {unknown}; expected some of {SINK_TARGETS}.")
+    sinks = []
+    for target in targets:
+        if target == 'export':
+            sinks.append(BundleSink(export_dir, dev_mode=export_dev_mode, compression=export_compression, source=source))
+        elif target == 'arrow':
+            sinks.append(ArrowIpcSink(handoff_dir, dev_mode=export_dev_mode, run_id=run_id, source=source))
+        else:
+            sinks.append(PostgresTableSink(postgres_db, dev_mode=(target == 'dev'), drop_existing=drop_existing,
+                                           batch_size=batch_size, lob_chunk_size=lob_chunk_size, run_id=run_id))
+    return sinks
+
+def open_sinks(sinks, table_name, columns, create_query_for, lob_columns=(), column_types=None):
+    """
+    Open every sink for one table; `create_query_for(dev_mode)` returns (target_table, create_query).
+    `column_types` are the PostgreSQL types of `columns`, which the Arrow handoff sink needs.
+    Returns the sinks that opened; a sink that fails is logged and left out for this table.
+    """
+    opened = []
+    for sink in sinks:
+        try:
+            target_table, create_query = create_query_for(sink.dev_mode)
+            sink.open(target_table, columns, create_query, lob_columns=lob_columns, column_types=column_types)
+            opened.append(sink)
+        except Exception as e:
+            logging.error(f"Sink '{sink.name}' could not be opened for {table_name}: {e}")
+    return opened
+
+def fan_out(rows, sinks, chunk_size=1000):
+    """
+    Read `rows` once and hand every chunk of `chunk_size` rows to each sink in turn. Keep `chunk_size`
+    equal to the source cursor's arraysize so LOB locators in a chunk are still valid for every sink.
+    A sink that raises is logged and dropped for the rest of the stream; the others keep receiving rows.
+    """
+    rows = iter(rows)
+    active = list(sinks)
+    while active:
+        chunk = [tuple(row) for row in islice(rows, chunk_size)]
+        if not chunk:
+            break
+        for sink in list(active):
+            try:
+                sink.write(chunk)
+            except Exception as e:
+                logging.error(f"Sink '{sink.name}' failed and stops receiving rows: {e}")
+                active.remove(sink)
+    return active
+
+def close_sinks(sinks):
+    """ Close every sink; returns the sinks that closed cleanly. """
+    closed = []
+    for sink in sinks:
+        try:
+            sink.close()
+            closed.append(sink)
+        except Exception as e:
+            logging.error(f"Sink '{sink.name}' failed to close: {e}")
+    return closed
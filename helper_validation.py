@@ -0,0 +1,175 @@
+import json
+import logging
+from datetime import date, datetime
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from helper_db_operation import CopyRowStream
+
+REJECTS_SUFFIX = '_rejects'
+VALIDATION_CHUNK_SIZE = 10000
+
+# Value ranges of the PostgreSQL integer types
+INTEGER_RANGES = {
+    'smallint': (-2 ** 15, 2 ** 15 - 1),
+    'integer': (-2 ** 31, 2 ** 31 - 1),
+    'bigint': (-2 ** 63, 2 ** 63 - 1),
+}
+DATE_TYPES = ('date', 'timestamp without time zone', 'timestamp with time zone')
+
+def get_target_schema(postgres_db, table_name):
+    """ Return the column definitions of a PostgreSQL table from information_schema, in column order. """
+    cursor = postgres_db.conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT column_name, data_type, character_maximum_length, numeric_precision, numeric_scale, is_nullable
+            FROM information_schema.columns
+            WHERE table_name = %s
+            ORDER BY ordinal_position
+        """, (table_name.lower(),))
+        header = [description[0] for description in cursor.description]
+        return [dict(zip(header, row)) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+class ChunkValidator:
+    """
+    Checks chunks of source rows against a target table's schema before they are bulk loaded:
+    NOT NULL, VARCHAR/CHAR length, integer and NUMERIC(p, s) range, and date parsing. Each check
+    runs once per column over the whole chunk, so a bad row costs no more than a good one.
+    """
+    def __init__(self, target_schema, columns):
+        schema_by_name = {column['column_name'].lower(): column for column in target_schema}
+        self.columns = list(columns)
+        self.column_schemas = [(column, schema_by_name.get(column.lower())) for column in self.columns]
+
+    def validate(self, rows):
+        """ Split a list of row tuples into (valid_rows, rejects); rejects are (row_dict, reason) pairs. """
+        if not rows:
+            return [], []
+        df = pd.DataFrame.from_records(rows, columns=self.columns, coerce_float=False)
+        reasons = np.full(len(df), '', dtype=object)
+        for column, column_schema in self.column_schemas:
+            if column_schema is None:
+                continue
+            for mask, problem in self._check_column(df[column], column_schema):
+                if mask.any():
+                    reasons[mask] += f"{column}: {problem}; "
+
+        rejected = reasons != ''
+        valid_rows = [rows[i] for i in np.flatnonzero(~rejected)]
+        rejects = [(dict(zip(self.columns, rows[i])), reasons[i].rstrip('; ')) for i in np.flatnonzero(rejected)]
+        return valid_rows, rejects
+
+    def _check_column(self, series, column_schema):
+        """ Yield (boolean mask, problem) for every check that applies to the column's type. """
+        present = series.notna().to_numpy()
+        data_type = column_schema['data_type']
+
+        if column_schema['is_nullable'] == 'NO':
+            yield ~present, "NULL in NOT NULL column"
+
+        max_length = column_schema['character_maximum_length']
+        if max_length is not None:
+            strings = series.where(present, None).astype(str)
+            # CHAR(n) ignores trailing spaces beyond n, like PostgreSQL does
+            lengths = (strings.str.rstrip(' ') if data_type == 'character' else strings).str.len().to_numpy()
+            yield present & (lengths > max_length), f"longer than {max_length} characters"
+
+        if data_type in INTEGER_RANGES or data_type == 'numeric' or data_type in ('real', 'double precision'):
+            numbers = pd.to_numeric(series.where(present, None), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+            yield present & np.isnan(numbers), "not a number"
+            if data_type in INTEGER_RANGES:
+                low, high = INTEGER_RANGES[data_type]
+                yield present & ((numbers < low) | (numbers > high)), f"out of {data_type} range"
+            elif data_type == 'numeric' and column_schema['numeric_precision'] is not None:
+                limit = 10.0 ** (column_schema['numeric_precision'] - (column_schema['numeric_scale'] or 0))
+                yield present & (np.abs(numbers) >= limit), (
+                    f"out of numeric({column_schema['numeric_precision']}, {column_schema['numeric_scale']}) range")
+
+        if data_type in DATE_TYPES:
+            # Driver-native dates pass as they are; only strings need to parse
+            is_string = series.map(lambda value: isinstance(value, str)).to_numpy()
+            if is_string.any():
+                parsed = pd.to_datetime(series[is_string], errors='coerce', format='mixed')
+                unparseable = np.zeros(len(series), dtype=bool)
+                unparseable[np.flatnonzero(is_string)] = parsed.isna().to_numpy()
+                yield unparseable, "not a valid date"
+            not_a_date = present & ~is_string & ~series.map(lambda value: isinstance(value, (date, datetime))).to_numpy()
+            yield not_a_date, "not a date"
+
+def create_rejects_table_query(table_name):
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table_name}{REJECTS_SUFFIX} (
+            row JSONB,
+            reason TEXT,
+            rejected_at TIMESTAMP DEFAULT NOW()
+        );
+    """
+
+def write_rejects(postgres_db, table_name, rejects):
+    """ Divert rejected rows to `<table_name>_rejects` with the reason they failed validation. """
+    if not rejects:
+        return
+    postgres_db.execute_query(create_rejects_table_query(table_name))
+    insert_query = f"INSERT INTO {table_name}{REJECTS_SUFFIX} (row, reason) VALUES (%s, %s)"
+    postgres_db.batch_insert(insert_query, [(json.dumps(row, default=str), reason) for row, reason in rejects])
+    logging.warning(f"Diverted {len(rejects)} rows to {table_name}{REJECTS_SUFFIX}; first reason: {rejects[0][1]}")
+
+def copy_bisecting(postgres_db, table_name, columns, rows, lob_columns=(), lob_chunk_size=1024 * 1024, lob_totals=None):
+    """
+    COPY `rows` into `table_name`; when the COPY fails on the data (a bad value or a violated constraint such as
+    a duplicate key), split the rows in halves and retry each, so only the offending rows are left. Returns
+    (loaded, rejects) with a reject per failing row. Any other error (lost connection, missing table, permissions)
+    is not about the rows and is raised.
+    The LOB counters of the COPYs that succeeded are added to `lob_totals` (see CopyRowStream.add_lob_counters).
+    """
+    try:
+        stream = CopyRowStream(rows, lob_columns=lob_columns, lob_chunk_size=lob_chunk_size)
+        postgres_db.copy_from_stream(table_name, columns, stream)
+        if lob_totals is not None:
+            stream.add_lob_counters(lob_totals)
+        return len(rows), []
+    except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+        if len(rows) == 1:
+            return 0, [(dict(zip(columns, rows[0])), f"COPY failed: {e}")]
+    middle = len(rows) // 2
+    loaded, rejects = copy_bisecting(postgres_db, table_name, columns, rows[:middle], lob_columns, lob_chunk_size, lob_totals)
+    second_loaded, second_rejects = copy_bisecting(postgres_db, table_name, columns, rows[middle:], lob_columns, lob_chunk_size,
+                                                   lob_totals)
+    return loaded + second_loaded, rejects + second_rejects
+
+def load_validated_batch(postgres_db, table_name, columns, validator, batch, lob_columns=(), lob_chunk_size=1024 * 1024,
+                         lob_totals=None):
+    """
+    Validate one batch with `validator`, COPY the valid rows into `table_name` and divert the rest to
+    `<table_name>_rejects`. When the COPY still fails (e.g. a duplicate key), the batch is bisected (see
+    copy_bisecting) and only the rows that fail on their own are rejected with the database error.
+    LOB counters of the loaded rows are added to `lob_totals`. Returns (loaded, rejected).
+    """
+    valid_rows, rejects = validator.validate(batch)
+    loaded = 0
+    if valid_rows:
+        loaded, copy_rejects = copy_bisecting(postgres_db, table_name, columns, valid_rows,
+                                              lob_columns=lob_columns, lob_chunk_size=lob_chunk_size, lob_totals=lob_totals)
+        rejects.extend(copy_rejects)
+    write_rejects(postgres_db, table_name, rejects)
+    return loaded, len(rejects)
+
+def load_validated_rows(postgres_db, table_name, columns, rows, chunk_size=VALIDATION_CHUNK_SIZE):
+    """ Validate and load `rows` into `table_name` chunk by chunk (see load_validated_batch). Returns (loaded, rejected). """
+    validator = ChunkValidator(get_target_schema(postgres_db, table_name), columns)
+    rows = iter(rows)
+    loaded = rejected = 0
+    while True:
+        chunk = [tuple(row) for row in islice(rows, chunk_size)]
+        if not chunk:
+            break
+        chunk_loaded, chunk_rejected = load_validated_batch(postgres_db, table_name, columns, validator, chunk)
+        loaded += chunk_loaded
+        rejected += chunk_rejected
+    logging.info(f"Loaded {loaded} rows into {table_name}; rejected {rejected}.")
+    return loaded, rejected
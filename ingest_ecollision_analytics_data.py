@@ -1,4 +1,3 @@
-import pandas as pd
 from dotenv import load_dotenv
 import os
 import logging
@@ -6,6 +5,12 @@ import logging
 from reference import ecollision_analytics_db_table_primary_key 
 from helper import time_execution
 from helper_db_operation import AnalyticsDB, PostgreSQLDB, map_analytics_db_to_postgres
+from helper_run_planner import plan_run, print_run_plan
+from helper_profiling import profile_stage
+from helper_sinks import PostgresTableSink, build_sinks, open_sinks, fan_out, close_sinks
+from helper_arrow_handoff import new_ingest_run_id, clear_ingest_run
+from helper_sampling import build_sample_predicates
+from helper_schema_drift import get_postgres_columns, diff_table_schema, apply_schema_drift, backfill_new_columns
 
 # Set up logging configuration
 logging.basicConfig(level=logging.CRITICAL, 
@@ -42,8 +47,62 @@ def create_analytics_table_query(table_name, columns, constraints, dev_mode=Fals
     logging.debug(f"Generated CREATE TABLE query for {prefixed_table_name}: {create_query}")
     return create_query
 
+def create_analytics_select_queries(table_name, sample_size=None, slices=1, sample_predicate=None):
+    """
+    Construct the extraction queries for a table, split into `slices` queries on the primary key when it has one.
+    A `sample_predicate` (from helper_sampling.build_sample_predicates) replaces TOP-N sampling.
+    """
+    if sample_predicate:
+        return [f"SELECT * FROM [eCollisionAnalytics].[ECRDBA].{table_name} WHERE {sample_predicate}"]
+    select_query = f"SELECT TOP {sample_size} * FROM [eCollisionAnalytics].[ECRDBA].{table_name}" if sample_size else f"SELECT * FROM [eCollisionAnalytics].[ECRDBA].{table_name}"
+    primary_key_column = ecollision_analytics_db_table_primary_key.get(table_name)
+    if slices <= 1 or sample_size or not primary_key_column:
+        return [select_query]
+    return [f"{select_query} WHERE ABS({primary_key_column}) % {slices} = {i}" for i in range(slices)]
+
+def sync_analytics_table_schema(analytics_db, postgres_db, table_name, prefixed_table_name, columns, target_columns):
+    """
+    Bring an existing PostgreSQL copy of an Analytics DB table up to the current source schema with ALTER TABLE,
+    then copy only the values of newly added columns (keyed on the table's primary key) instead of every row.
+    """
+    clear_ingest_run(postgres_db, prefixed_table_name)  # Arrow handoffs of the old schema must not be read any more
+    drift = diff_table_schema(columns, target_columns, map_analytics_db_to_postgres)
+    apply_schema_drift(postgres_db, prefixed_table_name, drift)
+    if drift['added']:
+        primary_key_column = ecollision_analytics_db_table_primary_key.get(table_name)
+        if not primary_key_column:
+            logging.warning(f"{table_name} has no primary key to backfill new columns by; rerun it with drop_existing=True.")
+        else:
+            added_names = [name for name, _, _ in drift['added']]
+            backfill_query = f"SELECT {primary_key_column}, {', '.join(added_names)} FROM [eCollisionAnalytics].[ECRDBA].{table_name}"
+            _, rows = analytics_db.query_without_param(backfill_query)
+            backfill_new_columns(postgres_db, prefixed_table_name, primary_key_column.lower(), drift['added'], rows)
+    logging.info(f"Schema of {prefixed_table_name}: {len(drift['added'])} columns added, {len(drift['altered'])} altered, "
+                 f"{len(drift['removed'])} no longer in the source.")
+    return drift
+
 @time_execution
-def backup_analytics_to_postgres(tables=None, sample_size=None, batch_size=100, drop_existing=False, dev_mode=False):
+def backup_analytics_to_postgres(tables=None, sample_size=None, batch_size=100, drop_existing=False, dev_mode=False,
+                                 use_run_plan=False, dry_run=False, export_dir=None, export_compression='zstd',
+                                 consistent_sample=False, sample_seed=0, sync_schema_only=False, targets=None,
+                                 raise_errors=False, handoff_dir=None):
+    """
+    `targets` lists where each extracted table goes, any of 'prod', 'dev', 'export' and 'arrow' (see helper_sinks.py);
+    every table is read from the Analytics DB once and fanned out to all of them. It defaults to the dev or
+    prod tables per `dev_mode`, or to 'export' when `export_dir` is set.
+    With `sync_schema_only`, tables that already exist in PostgreSQL are only ALTERed to the current source
+    schema and have their new columns backfilled (see helper_schema_drift.py); missing tables are loaded as usual.
+    With `consistent_sample`, `sample_size` picks that many COLLISIONS stratified by case year and only the
+    child rows related to them (see helper_sampling.py), instead of the TOP `sample_size` rows of every table.
+    With `use_run_plan`, batch size, slice count and load order (largest first) come from the Analytics DB's
+    table statistics instead of `batch_size`; `dry_run` prints that plan and returns without loading anything.
+    With `export_dir`, each table is written as a compressed bundle there (see load_export_bundles.py);
+    PostgreSQL is not contacted at all unless 'prod' or 'dev' is also a target.
+    Errors are logged; with `raise_errors` (e.g. from run_fusion_pipeline.py) a failed run or a table that
+    lost a sink is raised, so callers can tell it apart from a clean run.
+    The 'arrow' target writes Arrow IPC files to `handoff_dir` for the fusion ETL to memory-map; they are
+    stamped with this run's ID, which the 'prod'/'dev' sinks record in fusion_ingest_runs (see helper_arrow_handoff.py).
+    """
     try:
         logging.info("Starting backup operation from eCollision AnalyticsDB to PostgreSQL.")
         
@@ -57,15 +116,6 @@ def backup_analytics_to_postgres(tables=None, sample_size=None, batch_size=100,
         logging.debug("Initializing AnalyticsDB connection.")
         analytics_db = AnalyticsDB(analytics_db_name, analytics_db_server, analytics_db_driver, analytics_db_trusted_connection)
         
-        # Connect to PostgreSQL
-        postgres_host = os.getenv('ECOLLISION_FUSION_SQL_HOST_NAME')
-        postgres_db_name = os.getenv('ECOLLISION_FUSION_SQL_DATABASE_NAME')
-        postgres_user = os.getenv('ECOLLISION_FUSION_SQL_USERNAME')
-        postgres_password = os.getenv('ECOLLISION_FUSION_SQL_PASSWORD')
-        
-        logging.debug("Connecting to PostgreSQL DB.")
-        postgres_db = PostgreSQLDB(postgres_user, postgres_password, postgres_host, postgres_db_name)
-
         if tables is None:
             analytics_db_tables_query = """
             SELECT table_name FROM information_schema.tables WHERE table_schema = 'public'
@@ -76,67 +126,105 @@ def backup_analytics_to_postgres(tables=None, sample_size=None, batch_size=100,
             logging.warning("No tables found in the eCollision Analytics DB.")
             return
 
-        for table in tables:
-            table_name = table if isinstance(table, str) else table[0]
-            logging.debug(f"Processing table: {table_name}")
-            
-            # Drop existing table if the option is enabled
-            suffix = "_dev" if dev_mode else ""
-            prefixed_table_name = f"analytics_{table_name}{suffix}"
-            if drop_existing:
-                drop_query = f"DROP TABLE IF EXISTS {prefixed_table_name} CASCADE;"
-                try:
-                    logging.debug(f"Dropping existing table: {prefixed_table_name}")
-                    postgres_db.execute_query(drop_query)
-                except Exception as e:
-                    logging.error(f"Failed to drop table {table_name}: {e}")
-                    continue
+        table_names = [table if isinstance(table, str) else table[0] for table in tables]
+        table_plans = {}
+        if use_run_plan or dry_run:
+            run_plan = plan_run(table_names, analytics_db, sample_size=sample_size)
+            print_run_plan(run_plan)
+            if dry_run:
+                analytics_db.close_connection()
+                return
+            table_names = [table_plan['table_name'] for table_plan in run_plan]
+            table_plans = {table_plan['table_name']: table_plan for table_plan in run_plan}
+
+        sample_predicates = {}
+        if consistent_sample and sample_size:
+            sample_predicates = build_sample_predicates(analytics_db, 'analytics', sample_size, seed=sample_seed)
+
+        if targets is None:
+            targets = ['export'] if export_dir is not None else ['dev' if dev_mode else 'prod']
+            if handoff_dir is not None:
+                targets.append('arrow')
+
+        # Connect to PostgreSQL
+        postgres_db = None
+        if any(target in ('prod', 'dev') for target in targets):
+            postgres_host = os.getenv('ECOLLISION_FUSION_SQL_HOST_NAME')
+            postgres_db_name = os.getenv('ECOLLISION_FUSION_SQL_DATABASE_NAME')
+            postgres_user = os.getenv('ECOLLISION_FUSION_SQL_USERNAME')
+            postgres_password = os.getenv('ECOLLISION_FUSION_SQL_PASSWORD')
             
+            logging.debug("Connecting to PostgreSQL DB.")
+            postgres_db = PostgreSQLDB(postgres_user, postgres_password, postgres_host, postgres_db_name)
+
+        sinks = build_sinks(targets, postgres_db=postgres_db, drop_existing=drop_existing, batch_size=batch_size,
+                            export_dir=export_dir, export_compression=export_compression, export_dev_mode=dev_mode,
+                            source="eCollision Analytics ECRDBA", handoff_dir=handoff_dir, run_id=new_ingest_run_id())
+
+        failed_tables = []
+        for table_name in table_names:
+            logging.debug(f"Processing table: {table_name}")
+            table_plan = table_plans.get(table_name, {})
+            table_batch_size = table_plan.get('batch_size', batch_size)
             columns = analytics_db.get_table_columns(table_name)
             constraints = analytics_db.get_constraints(table_name)
-            create_query = create_analytics_table_query(table_name, columns, constraints, dev_mode=dev_mode)
-
-            try:
-                logging.debug(f"Executing create table query for {table_name}.")
-                postgres_db.execute_query(create_query)
-            except Exception as e:
-                logging.error(f"Failed to create table {table_name}: {e}")
-                continue
 
-            select_query = f"SELECT TOP {sample_size} * FROM [eCollisionAnalytics].[ECRDBA].{table_name}" if sample_size else f"SELECT * FROM [eCollisionAnalytics].[ECRDBA].{table_name}"
-            
-            logging.debug(f"Selecting data from {table_name}. Query: {select_query}")
-            header, data = analytics_db.query_without_param(select_query)
+            def create_query_for(sink_dev_mode):
+                prefixed_table_name = f"analytics_{table_name}{'_dev' if sink_dev_mode else ''}"
+                return prefixed_table_name, create_analytics_table_query(table_name, columns, constraints, dev_mode=sink_dev_mode)
+
+            # Schema sync mode picks up source schema changes in place instead of a drop and full reload
+            table_sinks = sinks
+            if sync_schema_only and not drop_existing:
+                table_sinks = []
+                for sink in sinks:
+                    if isinstance(sink, PostgresTableSink):
+                        prefixed_table_name = create_query_for(sink.dev_mode)[0]
+                        target_columns = get_postgres_columns(postgres_db, prefixed_table_name)
+                        if target_columns:
+                            try:
+                                with profile_stage(f"sync_schema_analytics_{table_name}"):
+                                    sync_analytics_table_schema(analytics_db, postgres_db, table_name, prefixed_table_name,
+                                                                columns, target_columns)
+                            except Exception as e:
+                                logging.error(f"Failed to sync the schema of {prefixed_table_name}: {e}")
+                            continue
+                    table_sinks.append(sink)
+                if not table_sinks:
+                    continue
 
-            insert_query = f"INSERT INTO {prefixed_table_name} ({', '.join(header)}) VALUES ({', '.join(['%s'] * len(header))})"
-            
-            batch = []
-            for i, row in enumerate(data):
-                batch.append(row)
-                if len(batch) == batch_size:
-                    try:
-                        logging.debug(f"Inserting batch of {batch_size} rows into {table_name}.")
-                        postgres_db.batch_insert(insert_query, batch)
-                    except Exception as e:
-                        logging.error(f"Failed to insert batch into {table_name}. Error: {e}")
-                    batch = []
-
-            # Insert remaining rows in the last batch if not empty
-            if batch:
-                try:
-                    logging.debug(f"Inserting final batch of {len(batch)} rows into {table_name}.")
-                    postgres_db.batch_insert(insert_query, batch)
-                except Exception as e:
-                    logging.error(f"Failed to insert final batch into {table_name}. Error: {e}")
+            # Read the table once and hand every batch to all sinks; each sink batches, validates and fails on its own
+            select_queries = create_analytics_select_queries(table_name, sample_size=sample_size, slices=table_plan.get('slices', 1),
+                                                              sample_predicate=sample_predicates.get(table_name.upper()))
+            expected_sinks = len(table_sinks)
+            with profile_stage(f"ingest_analytics_{table_name}"):
+                sinks_opened = False
+                for select_query in select_queries:
+                    logging.debug(f"Selecting data from {table_name}. Query: {select_query}")
+                    header, data = analytics_db.query_without_param(select_query)
+                    if not sinks_opened:
+                        column_types_by_name = {column[0].lower(): map_analytics_db_to_postgres(column[1]) for column in columns}
+                        table_sinks = open_sinks(table_sinks, table_name, header, create_query_for,
+                                                 column_types=[column_types_by_name.get(name.lower(), 'TEXT') for name in header])
+                        sinks_opened = True
+                    table_sinks = fan_out(data, table_sinks, chunk_size=table_batch_size)
+                table_sinks = close_sinks(table_sinks)
+            if len(table_sinks) < expected_sinks:
+                failed_tables.append(table_name)
 
         # Closing connections
         logging.debug("Closing database connections.")
         analytics_db.close_connection()
-        postgres_db.close_connection()
+        if postgres_db is not None:
+            postgres_db.close_connection()
+        if failed_tables:
+            raise RuntimeError(f"Not every sink received {failed_tables}")
         logging.info("Backup operation completed successfully.")
 
     except Exception as e:
         logging.error(f"An error occurred during the backup process: {e}")
+        if raise_errors:
+            raise
         
 if __name__ == "__main__":
     # tables_to_backup = ['COLLISIONS', 'CL_OBJECTS', 'CLOBJ_PARTY_INFO', 'CLOBJ_PROPERTY_INFO', 'ECR_COLL_PLOTTING_INFO',
@@ -153,7 +241,15 @@ if __name__ == "__main__":
     tables_to_backup = ['COLLISIONS']
     sample_size = 888
     batch_size = None
+    use_run_plan = False  # Set to True to size batches, slices and load order from the Analytics DB's table statistics
+    dry_run = False  # Set to True to only print the run plan
+    consistent_sample = True  # Sample COLLISIONS by case year and copy only their related child rows
+    sync_schema_only = False  # Set to True to ALTER existing tables to the source schema and backfill only new columns
+    targets = None  # e.g. ['prod', 'dev'] to fill both table sets from one read of the source; 'export' adds bundles
+    handoff_dir = None  # e.g. 'handoff' to also write Arrow IPC files for the fusion ETL (see helper_arrow_handoff.py)
     
     # Enable dev_mode to use _dev table suffix
     backup_analytics_to_postgres(tables=tables_to_backup, sample_size=sample_size, batch_size=batch_size, 
-                                 drop_existing=drop_existing, dev_mode=dev_mode)
\ No newline at end of file
+                                 drop_existing=drop_existing, dev_mode=dev_mode, use_run_plan=use_run_plan, dry_run=dry_run,
+                                 consistent_sample=consistent_sample,
+                                 sync_schema_only=sync_schema_only, targets=targets, handoff_dir=handoff_dir)
\ No newline at end of file
@@ -1,11 +1,16 @@
-import pandas as pd
 from dotenv import load_dotenv
 import os
 
 import logging
 
 from helper import time_execution
-from helper_db_operation import OracleDB, PostgreSQLDB, map_oracle_to_postgres
+from helper_run_planner import plan_run, print_run_plan
+from helper_profiling import profile_stage
+from helper_sinks import PostgresTableSink, build_sinks, open_sinks, fan_out, close_sinks
+from helper_arrow_handoff import new_ingest_run_id, clear_ingest_run
+from helper_sampling import build_sample_predicates
+from helper_schema_drift import get_postgres_columns, diff_table_schema, apply_schema_drift, backfill_new_columns
+from helper_db_operation import OracleDB, PostgreSQLDB, map_oracle_to_postgres, ORACLE_LOB_TYPES, LARGE_LOB_SUFFIX
 
 # Set up logging configuration
 logging.basicConfig(level=logging.ERROR, 
@@ -45,8 +50,98 @@ def create_oracle_table_query(table_name, columns, constraints, dev_mode=False):
     logging.debug(f"Create table query for {prefixed_table_name}: {create_query}")
     return create_query
 
+def create_slice_predicates(slices=1, sample_size=None):
+    """ Split a table into `slices` disjoint ROWID hash buckets; sampled extractions are never sliced. """
+    if slices <= 1 or sample_size is not None:
+        return [None]
+    return [f"ORA_HASH(ROWID, {slices - 1}) = {i}" for i in range(slices)]
+
+def create_where_clause(sample_size=None, slice_predicate=None):
+    predicates = []
+    if sample_size is not None:
+        predicates.append(f"ROWNUM <= {sample_size}")
+    if slice_predicate:
+        predicates.append(slice_predicate)
+    return f" WHERE {' AND '.join(predicates)}" if predicates else ""
+
+def create_lob_aware_select_query(owner, table_name, columns, inline_lob_max_length, sample_size=None, slice_predicate=None):
+    """
+    Construct a SELECT that splits every LOB column in two: values up to `inline_lob_max_length`
+    (as DBMS_LOB.GETLENGTH counts: characters for CLOB/NCLOB, bytes for BLOB) are returned under the column's own name (fetched inline by the LOB output type handler), and
+    larger values are returned as locators under `<column>__LOB` so they can be streamed in chunks.
+    """
+    select_items = []
+    for column in columns:
+        column_name, data_type = column[0], column[1]
+        if data_type in ORACLE_LOB_TYPES:
+            select_items.append(
+                f"CASE WHEN DBMS_LOB.GETLENGTH({column_name}) <= {inline_lob_max_length} THEN {column_name} END AS {column_name}"
+            )
+            select_items.append(
+                f"CASE WHEN DBMS_LOB.GETLENGTH({column_name}) > {inline_lob_max_length} THEN {column_name} END AS {column_name}{LARGE_LOB_SUFFIX}"
+            )
+        else:
+            select_items.append(column_name)
+
+    return f"SELECT {', '.join(select_items)} FROM {owner}.{table_name}{create_where_clause(sample_size, slice_predicate)}"
+
+def merge_lob_columns(header, rows):
+    """ Fold each `<column>__LOB` locator back into its column, yielding rows in table column order. """
+    large_lob_positions = {
+        header.index(name[:-len(LARGE_LOB_SUFFIX)]): i
+        for i, name in enumerate(header) if name.endswith(LARGE_LOB_SUFFIX)
+    }
+    keep_positions = [i for i, name in enumerate(header) if not name.endswith(LARGE_LOB_SUFFIX)]
+    for row in rows:
+        yield tuple(
+            row[large_lob_positions[i]] if i in large_lob_positions and row[i] is None else row[i]
+            for i in keep_positions
+        )
+
+def sync_oracle_table_schema(oracle_db, postgres_db, owner, table_name, prefixed_table_name, columns, target_columns,
+                             arraysize=1000):
+    """
+    Bring an existing PostgreSQL copy of an Oracle table up to the current Oracle schema with ALTER TABLE,
+    then copy only the values of newly added columns (keyed on ID) instead of re-ingesting every row.
+    """
+    clear_ingest_run(postgres_db, prefixed_table_name)  # Arrow handoffs of the old schema must not be read any more
+    drift = diff_table_schema(columns, target_columns, map_oracle_to_postgres)
+    apply_schema_drift(postgres_db, prefixed_table_name, drift)
+    if drift['added']:
+        key_column = next((column[0] for column in columns if column[0].lower() == 'id'), None)
+        if key_column is None:
+            logging.warning(f"{table_name} has no ID column to backfill new columns by; rerun it with drop_existing=True.")
+        else:
+            added_names = [name for name, _, _ in drift['added']]
+            backfill_query = f"SELECT {key_column}, {', '.join(added_names)} FROM {owner}.{table_name}"
+            _, rows = oracle_db.stream_query(backfill_query, arraysize=arraysize)
+            backfill_new_columns(postgres_db, prefixed_table_name, key_column.lower(), drift['added'], rows)
+    logging.info(f"Schema of {prefixed_table_name}: {len(drift['added'])} columns added, {len(drift['altered'])} altered, "
+                 f"{len(drift['removed'])} no longer in the source.")
+    return drift
+
 @time_execution
-def backup_oracle_to_postgres(tables=None, sample_size=None, drop_existing=False, dev_mode=False):
+def backup_oracle_to_postgres(tables=None, sample_size=None, drop_existing=False, dev_mode=False,
+                              inline_lob_max_length=32767, lob_chunk_size=1024 * 1024, use_run_plan=False, dry_run=False,
+                              export_dir=None, export_compression='zstd', consistent_sample=False, sample_seed=0,
+                              sync_schema_only=False, targets=None, raise_errors=False, handoff_dir=None):
+    """
+    `targets` lists where each extracted table goes, any of 'prod', 'dev', 'export' and 'arrow' (see helper_sinks.py);
+    every table is read from Oracle once and fanned out to all of them. It defaults to the dev or prod tables
+    per `dev_mode`, or to 'export' when `export_dir` is set.
+    With `sync_schema_only`, tables that already exist in PostgreSQL are only ALTERed to the current Oracle
+    schema and have their new columns backfilled (see helper_schema_drift.py); missing tables are loaded as usual.
+    With `consistent_sample`, `sample_size` picks that many COLLISIONS stratified by case year and only the
+    child rows related to them (see helper_sampling.py), instead of the first `sample_size` rows of every table.
+    With `use_run_plan`, the slice count, fetch batch size and load order (largest first) come from Oracle's
+    table statistics in all_tables; `dry_run` prints that plan and returns without loading anything.
+    With `export_dir`, each table is written as a compressed bundle there (see load_export_bundles.py);
+    PostgreSQL is not contacted at all unless 'prod' or 'dev' is also a target.
+    Errors are logged; with `raise_errors` (e.g. from run_fusion_pipeline.py) a failed run or a table that
+    lost a sink is raised, so callers can tell it apart from a clean run.
+    The 'arrow' target writes Arrow IPC files to `handoff_dir` for the fusion ETL to memory-map; they are
+    stamped with this run's ID, which the 'prod'/'dev' sinks record in fusion_ingest_runs (see helper_arrow_handoff.py).
+    """
     try:
         logging.info("Starting backup operation from Oracle to PostgreSQL.")
         
@@ -61,54 +156,114 @@ def backup_oracle_to_postgres(tables=None, sample_size=None, drop_existing=False
             oracle_username, oracle_password, oracle_host, oracle_port, oracle_service
         )
         
-        postgres_host = os.getenv('ECOLLISION_FUSION_SQL_HOST_NAME')
-        postgres_db_name = os.getenv('ECOLLISION_FUSION_SQL_DATABASE_NAME')
-        postgres_user = os.getenv('ECOLLISION_FUSION_SQL_USERNAME')
-        postgres_password = os.getenv('ECOLLISION_FUSION_SQL_PASSWORD')
-        
-        postgres_db = PostgreSQLDB(postgres_user, postgres_password, postgres_host, postgres_db_name)
-
         # Default to all tables if none specified
         if tables is None:
             oracle_tables_query = "SELECT table_name FROM all_tables WHERE owner = 'ECRDBA'"
             headers, tables = oracle_db.query_without_param(oracle_tables_query)
 
-        for table in tables:
-            table_name = table if isinstance(table, str) else table[0]
+        table_names = [table if isinstance(table, str) else table[0] for table in tables]
+        table_plans = {}
+        if use_run_plan or dry_run:
+            run_plan = plan_run(table_names, oracle_db, sample_size=sample_size)
+            print_run_plan(run_plan)
+            if dry_run:
+                oracle_db.close_connection()
+                return
+            table_names = [table_plan['table_name'] for table_plan in run_plan]
+            table_plans = {table_plan['table_name']: table_plan for table_plan in run_plan}
+
+        sample_predicates = {}
+        if consistent_sample and sample_size:
+            sample_predicates = build_sample_predicates(oracle_db, 'oracle', sample_size, seed=sample_seed)
+
+        if targets is None:
+            targets = ['export'] if export_dir is not None else ['dev' if dev_mode else 'prod']
+            if handoff_dir is not None:
+                targets.append('arrow')
+
+        postgres_db = None
+        if any(target in ('prod', 'dev') for target in targets):
+            postgres_host = os.getenv('ECOLLISION_FUSION_SQL_HOST_NAME')
+            postgres_db_name = os.getenv('ECOLLISION_FUSION_SQL_DATABASE_NAME')
+            postgres_user = os.getenv('ECOLLISION_FUSION_SQL_USERNAME')
+            postgres_password = os.getenv('ECOLLISION_FUSION_SQL_PASSWORD')
+            
+            postgres_db = PostgreSQLDB(postgres_user, postgres_password, postgres_host, postgres_db_name)
+
+        sinks = build_sinks(targets, postgres_db=postgres_db, drop_existing=drop_existing, export_dir=export_dir,
+                            export_compression=export_compression, export_dev_mode=dev_mode, lob_chunk_size=lob_chunk_size,
+                            source="eCollision Oracle ECRDBA", handoff_dir=handoff_dir, run_id=new_ingest_run_id())
+
+        failed_tables = []
+        for table_name in table_names:
+            table_plan = table_plans.get(table_name, {})
+            arraysize = table_plan.get('batch_size', 1000)
+            slice_predicates = create_slice_predicates(table_plan.get('slices', 1), sample_size)
+            table_sample_size = sample_size
+            if table_name.upper() in sample_predicates:
+                slice_predicates, table_sample_size = [sample_predicates[table_name.upper()]], None
             owner = oracle_db.get_table_owner(table_name)
             columns = oracle_db.get_table_columns(table_name)
             constraints = oracle_db.get_constraints(table_name)
 
-            create_query = create_oracle_table_query(table_name, columns, constraints, dev_mode=dev_mode)
-            prefixed_table_name = f"{'oracle_' + table_name}_dev" if dev_mode else f"oracle_{table_name}"
-
-            # Drop existing table if needed
-            if drop_existing:
-                drop_query = f"DROP TABLE IF EXISTS {prefixed_table_name} CASCADE"
-                logging.info(f"Dropping existing table {prefixed_table_name} in PostgreSQL.")
-                postgres_db.execute_query(drop_query)
-
-            # Create table in PostgreSQL
-            logging.info(f"Creating table {table_name} in PostgreSQL.")
-            postgres_db.execute_query(create_query)
+            def create_query_for(sink_dev_mode):
+                prefixed_table_name = f"{'oracle_' + table_name}_dev" if sink_dev_mode else f"oracle_{table_name}"
+                return prefixed_table_name, create_oracle_table_query(table_name, columns, constraints, dev_mode=sink_dev_mode)
 
-            # Fetch and insert data
-            data_query = f"SELECT * FROM {owner}.{table_name}" if sample_size is None else f"SELECT * FROM {owner}.{table_name} WHERE ROWNUM <= {sample_size}"
-            _, data = oracle_db.query_without_param(data_query)
-            insert_query = f"INSERT INTO {prefixed_table_name} ({', '.join([col[0] for col in columns])}) VALUES ({', '.join(['%s'] * len(columns))})"
+            # Schema sync mode picks up source schema changes in place instead of a drop and full reload
+            table_sinks = sinks
+            if sync_schema_only and not drop_existing:
+                table_sinks = []
+                for sink in sinks:
+                    if isinstance(sink, PostgresTableSink):
+                        prefixed_table_name = create_query_for(sink.dev_mode)[0]
+                        target_columns = get_postgres_columns(postgres_db, prefixed_table_name)
+                        if target_columns:
+                            try:
+                                with profile_stage(f"sync_schema_oracle_{table_name}"):
+                                    sync_oracle_table_schema(oracle_db, postgres_db, owner, table_name, prefixed_table_name,
+                                                             columns, target_columns, arraysize=arraysize)
+                            except Exception as e:
+                                logging.error(f"Failed to sync the schema of {prefixed_table_name}: {e}")
+                            continue
+                    table_sinks.append(sink)
+                if not table_sinks:
+                    continue
 
-            for row in data:
-                try:
-                    postgres_db.execute_query(insert_query, row)
-                except Exception as e:
-                    logging.error(f"Error inserting row into {prefixed_table_name}: {row}. Error: {e}")
+            # Read the table once and hand every fetch batch to all sinks; tables with CLOB/NCLOB/BLOB columns
+            # fetch small LOBs inline and stream larger ones from their locators (see create_lob_aware_select_query)
+            lob_positions = [i for i, col in enumerate(columns) if col[1] in ORACLE_LOB_TYPES]
+            logging.info(f"Extracting {table_name} to {[sink.name for sink in table_sinks]}.")
+            expected_sinks = len(table_sinks)
+            with profile_stage(f"ingest_oracle_{table_name}"):
+                table_sinks = open_sinks(table_sinks, table_name, [col[0] for col in columns], create_query_for,
+                                         lob_columns=lob_positions,
+                                         column_types=[map_oracle_to_postgres(col[1]) for col in columns])
+                for slice_predicate in slice_predicates:
+                    if lob_positions:
+                        select_query = create_lob_aware_select_query(owner, table_name, columns, inline_lob_max_length,
+                                                                     table_sample_size, slice_predicate)
+                        header, rows = oracle_db.stream_query(select_query, arraysize=arraysize)
+                        rows = merge_lob_columns(header, rows)
+                    else:
+                        data_query = f"SELECT * FROM {owner}.{table_name}{create_where_clause(table_sample_size, slice_predicate)}"
+                        header, rows = oracle_db.stream_query(data_query, arraysize=arraysize)
+                    table_sinks = fan_out(rows, table_sinks, chunk_size=arraysize)
+                table_sinks = close_sinks(table_sinks)
+            if len(table_sinks) < expected_sinks:
+                failed_tables.append(table_name)
 
         oracle_db.close_connection()
-        postgres_db.close_connection()
+        if postgres_db is not None:
+            postgres_db.close_connection()
+        if failed_tables:
+            raise RuntimeError(f"Not every sink received {failed_tables}")
         logging.info("Backup operation completed successfully.")
     
     except Exception as e:
         logging.error(f"Backup operation failed: {e}")
+        if raise_errors:
+            raise
 
 if __name__ == "__main__":
     # Specify the tables to backup, or set to None to backup all tables
@@ -125,5 +280,13 @@ if __name__ == "__main__":
     #                     'CODE_TYPE_VALUES', 'CODE_TYPES', 'CL_STATUS_HISTORY', 'ECR_SYNCHRONIZATION_ACTION',
     #                     'ECR_SYNCHRONIZATION_ACTION_LOG'] # Change this to a list of table names to specify, e.g., ['COLLISIONS']
     tables_to_backup = ['COLLISIONS'] # Change this to a list of table names to specify, e.g., ['COLLISIONS']
+    use_run_plan = False  # Set to True to size slices, fetch batches and load order from Oracle's table statistics
+    dry_run = False  # Set to True to only print the run plan
+    consistent_sample = True  # Sample COLLISIONS by case year and copy only their related child rows
+    sync_schema_only = False  # Set to True to ALTER existing tables to the source schema and backfill only new columns
+    targets = None  # e.g. ['prod', 'dev'] to fill both table sets from one read of the source; 'export' adds bundles
+    handoff_dir = None  # e.g. 'handoff' to also write Arrow IPC files for the fusion ETL (see helper_arrow_handoff.py)
     
-    backup_oracle_to_postgres(tables=tables_to_backup, sample_size=sample_size, drop_existing=drop_existing, dev_mode=dev_mode)
+    backup_oracle_to_postgres(tables=tables_to_backup, sample_size=sample_size, drop_existing=drop_existing, dev_mode=dev_mode,
+                              use_run_plan=use_run_plan, dry_run=dry_run, consistent_sample=consistent_sample,
+                              sync_schema_only=sync_schema_only, targets=targets, handoff_dir=handoff_dir)
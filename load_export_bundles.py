@@ -0,0 +1,46 @@
+# This loads the compressed table bundles written by the ingest scripts' export mode (export_dir=...)
+# into a PostgreSQL database, e.g. on a host next to the AWS RDS target rather than next to Oracle.
+
+from dotenv import load_dotenv
+import os
+import logging
+
+from helper import time_execution
+from helper_db_operation import PostgreSQLDB
+from helper_export_bundle import MANIFEST_FILE, load_bundle
+
+# Set up logging configuration
+logging.basicConfig(level=logging.CRITICAL, 
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+load_dotenv()
+
+@time_execution
+def load_export_bundles(bundle_root, tables=None, drop_existing=False):
+    postgres_host = os.getenv('ECOLLISION_FUSION_SQL_HOST_NAME')
+    postgres_db_name = os.getenv('ECOLLISION_FUSION_SQL_DATABASE_NAME')
+    postgres_user = os.getenv('ECOLLISION_FUSION_SQL_USERNAME')
+    postgres_password = os.getenv('ECOLLISION_FUSION_SQL_PASSWORD')
+    postgres_db = PostgreSQLDB(postgres_user, postgres_password, postgres_host, postgres_db_name)
+
+    # Every sub-directory with a manifest is one table bundle
+    bundle_dirs = sorted(
+        os.path.join(bundle_root, name) for name in os.listdir(bundle_root)
+        if os.path.isfile(os.path.join(bundle_root, name, MANIFEST_FILE))
+    )
+    if tables:
+        bundle_dirs = [bundle_dir for bundle_dir in bundle_dirs if os.path.basename(bundle_dir) in tables]
+
+    for bundle_dir in bundle_dirs:
+        try:
+            load_bundle(postgres_db, bundle_dir, drop_existing=drop_existing)
+        except Exception as e:
+            logging.error(f"Failed to load bundle {bundle_dir}: {e}")
+
+    postgres_db.close_connection()
+
+if __name__ == "__main__":
+    bundle_root = 'export'
+    drop_existing = True
+    tables_to_load = None  # e.g. ['oracle_COLLISIONS_dev']
+    load_export_bundles(bundle_root, tables=tables_to_load, drop_existing=drop_existing)
@@ -16,4 +16,13 @@ order by column_name
 --- Warning: Deletion
 --- This command deletes the public schema and all objects (tables, views, functions, etc.) contained within it. Then it recreates the public schema as an empty schema.
 DROP SCHEMA public CASCADE;
-CREATE SCHEMA public;
\ No newline at end of file
+CREATE SCHEMA public;
+
+
+
+--- Collision counts by case_year and source from the rollup (refreshed by the collisions ETL) instead of scanning fusion_collisions
+--- From Python: helper_rollup.query_rollup(postgres_db, 'fusion_collisions', group_by=('case_year', 'source'))
+SELECT case_year, source, SUM(collision_count) AS collision_count
+FROM public.fusion_collisions_rollup
+GROUP BY case_year, source
+ORDER BY case_year, source
@@ -16,3 +16,48 @@ ecollision_analytics_db_table_primary_key = {
 
 
 
+
+
+# Code columns on each fusion table, mapped to the description column that Analytics carries for them.
+# The descriptions are decoded from CODE_TYPE_VALUES during fusion ETL (see helper_code_lookup.py).
+fusion_code_columns = {
+    'COLLISIONS': {
+        'primary_event_id': 'primary_event_desc',
+        'surface_cond_id': 'surface_condition_desc',
+        'environmental_condition_id': 'env_condition_desc',
+        'file_status_id': 'file_status_desc',
+        'road_class_id': 'road_class_desc',
+    },
+    'CL_OBJECTS': {
+        'contrib_road_cond_id': 'contrib_road_cond_desc',
+        'traffic_ctrl_devc_cond_id': 'traffic_ctrl_devc_cond_desc',
+        'traffic_ctrl_device_id': 'traffic_ctrl_device_desc',
+    },
+    'CL_STATUS_HISTORY': {
+        'coll_status_type_id': None,
+    },
+}
+
+# Merging eCollision Oracle and Analytics rows into fusion tables (see helper_merge.py).
+# Rows sharing a key value are duplicates; the earlier source in fusion_source_precedence wins,
+# except for columns listed in fusion_column_precedence, which take the first source that has a value.
+fusion_merge_keys = {
+    'COLLISIONS': ('id', 'case_nbr'),
+}
+fusion_source_precedence = ('eCollision Oracle', 'eCollision Analytics')
+fusion_column_precedence = {
+    'COLLISIONS': {},
+}
+
+# Consistent sampling for dev runs (see helper_sampling.py): a seed set of COLLISIONS ids, stratified by year,
+# and the child rows related to it. Each related table maps to (column, parent table, parent column); parents
+# are listed before their children. Reference tables are copied in full; unlisted tables keep ROWNUM/TOP sampling.
+sampling_root_table = 'COLLISIONS'
+sampling_relations = {
+    'CL_OBJECTS': ('COLLISION_ID', 'COLLISIONS', 'ID'),
+    'CL_STATUS_HISTORY': ('COLLISION_ID', 'COLLISIONS', 'ID'),
+    'ECR_COLL_PLOTTING_INFO': ('COLLISION_ID', 'COLLISIONS', 'ID'),
+    'CLOBJ_PARTY_INFO': ('ID', 'CL_OBJECTS', 'ID'),
+    'CLOBJ_PROPERTY_INFO': ('ID', 'CL_OBJECTS', 'ID'),
+}
+sampling_reference_tables = ('CODE_TYPES', 'CODE_TYPE_VALUES')
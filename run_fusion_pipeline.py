@@ -0,0 +1,199 @@
+# Runs the whole eCollision Fusion refresh as a dependency graph (see helper_dag.py) instead of the manual sequence
+# ingest scripts -> create_empty_tables_for_ecollision_fusion.py -> view SQL files -> etl_ecollision_fusion_table_collisions.py.
+# Every source table is its own ingest node, so independent tables load in parallel, and each downstream step
+# waits only for the tables it reads. Nodes whose inputs are unchanged since their last successful run are skipped.
+# The run ends with a report of the critical path, the chain of steps that bounds the end-to-end time.
+
+from dotenv import load_dotenv
+import os
+import time
+import json
+import hashlib
+import logging
+
+from helper import time_execution
+from helper_db_operation import AnalyticsDB, OracleDB, PostgreSQLDB
+from helper_dag import DagNode, run_dag, get_dag_state, print_dag_report, print_dag_plan
+from build_fusion_views import view_sql_files
+
+# Set up logging configuration
+logging.basicConfig(level=logging.CRITICAL,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+load_dotenv()
+
+pipeline_oracle_tables = ['COLLISIONS', 'CL_OBJECTS', 'CLOBJ_PARTY_INFO', 'CLOBJ_PROPERTY_INFO', 'ECR_COLL_PLOTTING_INFO',
+                          'CODE_TYPE_VALUES', 'CODE_TYPES', 'CL_STATUS_HISTORY', 'ECR_SYNCHRONIZATION_ACTION',
+                          'ECR_SYNCHRONIZATION_ACTION_LOG']
+pipeline_analytics_tables = ['COLLISIONS', 'CL_OBJECTS', 'CLOBJ_PARTY_INFO', 'CLOBJ_PROPERTY_INFO', 'ECR_COLL_PLOTTING_INFO',
+                             'CODE_TYPE_VALUES', 'CODE_TYPES', 'CL_STATUS_HISTORY', 'ECR_SYNCHRONIZATION_ACTION_ETL',
+                             'ECR_SYNCHRONIZATION_ACTION_LOG_ETL']
+pipeline_fusion_tables = pipeline_analytics_tables
+
+# Source tables each downstream node reads; the views are dropped with CASCADE whenever these are reloaded
+view_source_nodes = ['ingest_oracle:COLLISIONS', 'ingest_oracle:CL_STATUS_HISTORY', 'ingest_analytics:COLLISIONS']
+etl_collisions_source_nodes = view_source_nodes + ['ingest_oracle:CODE_TYPES', 'ingest_oracle:CODE_TYPE_VALUES']
+
+def connect_oracle():
+    return OracleDB(os.getenv('ECOLLISION_ORACLE_SQL_USERNAME'), os.getenv('ECOLLISION_ORACLE_SQL_PASSWORD'),
+                    os.getenv('ECOLLISION_ORACLE_SQL_HOST_NAME'), os.getenv('ECOLLISION_ORACLE_SQL_PORT'),
+                    os.getenv('ECOLLISION_ORACLE_SQL_SERVICE_NAME'))
+
+def connect_analytics():
+    return AnalyticsDB(os.getenv('ECOLLISION_ANALYTICS_SQL_DATABASE_NAME'),
+                       os.getenv('ECOLLISION_ANALYTICS_SQL_SERVER').replace('\\\\', '\\'),
+                       os.getenv('ECOLLISION_ANALYTICS_SQL_DRIVER'), os.getenv('ECOLLISION_ANALYTICS_SQL_TRUSTED_CONNECTION'))
+
+def connect_postgres():
+    return PostgreSQLDB(os.getenv('ECOLLISION_FUSION_SQL_USERNAME'), os.getenv('ECOLLISION_FUSION_SQL_PASSWORD'),
+                        os.getenv('ECOLLISION_FUSION_SQL_HOST_NAME'), os.getenv('ECOLLISION_FUSION_SQL_DATABASE_NAME'))
+
+def source_fingerprint(connect, table_name, params):
+    """ Fingerprint of one source table's content plus the parameters the node loads it with. """
+    def fingerprint():
+        source_db = connect()
+        try:
+            return f"{source_db.get_table_fingerprint(table_name)}|{json.dumps(params, sort_keys=True)}"
+        finally:
+            source_db.close_connection()
+    return fingerprint
+
+def analytics_schema_fingerprint(table_name, params):
+    """ Fingerprint of an Analytics table's column definitions, which the empty fusion table is created from. """
+    def fingerprint():
+        analytics_db = connect_analytics()
+        try:
+            return f"{analytics_db.get_table_columns(table_name)}|{json.dumps(params, sort_keys=True)}"
+        finally:
+            analytics_db.close_connection()
+    return fingerprint
+
+def postgres_table_marker(table_name, count_rows=True):
+    """ Whether a PostgreSQL table the node writes exists, and its row count, so a dropped or emptied table is rebuilt. """
+    def marker():
+        postgres_db = connect_postgres()
+        cursor = postgres_db.conn.cursor()
+        try:
+            cursor.execute("SELECT to_regclass(%s)", (table_name.lower(),))
+            if cursor.fetchone()[0] is None:
+                return 'missing'
+            if not count_rows:
+                return 'exists'
+            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+            return str(cursor.fetchone()[0])
+        finally:
+            cursor.close()
+            postgres_db.close_connection()
+    return marker
+
+def sql_files_fingerprint(sql_files):
+    def fingerprint():
+        sql_dir = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.sha256()
+        for sql_file in sql_files:
+            with open(os.path.join(sql_dir, sql_file), 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+    return fingerprint
+
+# Node actions import their pipeline module when they run, so a dry run needs neither pandas nor the source drivers
+def ingest_oracle_table(table_name, **kwargs):
+    from ingest_ecollision_oracle_data import backup_oracle_to_postgres
+    backup_oracle_to_postgres(tables=[table_name], drop_existing=True, raise_errors=True, **kwargs)
+
+def ingest_analytics_table(table_name, **kwargs):
+    from ingest_ecollision_analytics_data import backup_analytics_to_postgres
+    backup_analytics_to_postgres(tables=[table_name], drop_existing=True, raise_errors=True, **kwargs)
+
+def create_fusion_table(table_name, **kwargs):
+    from create_empty_tables_for_ecollision_fusion import create_empty_fusion_tables_in_postgres
+    create_empty_fusion_tables_in_postgres(tables=[table_name], drop_existing=False, raise_errors=True, **kwargs)
+
+def build_views():
+    from build_fusion_views import build_fusion_views
+    build_fusion_views()
+
+def etl_collisions(**kwargs):
+    from etl_ecollision_fusion_table_collisions import run_collisions_etl
+    run_collisions_etl(drop_existing=True, **kwargs)
+
+def build_pipeline_nodes(dev_mode=True, sample_size=None, consistent_sample=False, sample_seed=0,
+                         partition_by_case_year=False, oracle_tables=None, analytics_tables=None, fusion_tables=None):
+    """ Declare the pipeline steps and their per-table dependencies. """
+    ingest_params = {'dev_mode': dev_mode, 'sample_size': sample_size, 'consistent_sample': consistent_sample, 'sample_seed': sample_seed}
+    nodes = []
+    for table_name in oracle_tables or pipeline_oracle_tables:
+        nodes.append(DagNode(
+            f"ingest_oracle:{table_name}",
+            lambda table_name=table_name: ingest_oracle_table(table_name, **ingest_params),
+            fingerprint=source_fingerprint(connect_oracle, table_name, ingest_params),
+            target_marker=postgres_table_marker(f"oracle_{table_name}{'_dev' if dev_mode else ''}"),
+        ))
+    for table_name in analytics_tables or pipeline_analytics_tables:
+        nodes.append(DagNode(
+            f"ingest_analytics:{table_name}",
+            lambda table_name=table_name: ingest_analytics_table(table_name, **ingest_params),
+            fingerprint=source_fingerprint(connect_analytics, table_name, ingest_params),
+            target_marker=postgres_table_marker(f"analytics_{table_name}{'_dev' if dev_mode else ''}"),
+        ))
+
+    # Fusion tables are created if missing, never dropped, so the ETL's recorded frozen years stay valid
+    # (create_params also holds the ETL's parameters); their row count is the ETL's business, only their existence is checked
+    create_params = {'dev_mode': dev_mode, 'partition_by_case_year': partition_by_case_year}
+    for table_name in fusion_tables or pipeline_fusion_tables:
+        nodes.append(DagNode(
+            f"create_fusion:{table_name}",
+            lambda table_name=table_name: create_fusion_table(table_name, **create_params),
+            fingerprint=analytics_schema_fingerprint(table_name, create_params),
+            target_marker=postgres_table_marker(f"fusion_{table_name}{'_dev' if dev_mode else ''}", count_rows=False),
+        ))
+
+    node_names = {node.name for node in nodes}
+    nodes.append(DagNode(
+        'build_views', build_views,
+        depends_on=[name for name in view_source_nodes if name in node_names],
+        fingerprint=sql_files_fingerprint(view_sql_files),
+    ))
+    nodes.append(DagNode(
+        'etl_collisions',
+        lambda: etl_collisions(**create_params),
+        depends_on=['build_views'] + [name for name in etl_collisions_source_nodes + ['create_fusion:COLLISIONS'] if name in node_names],
+        fingerprint=lambda: json.dumps(create_params, sort_keys=True),
+    ))
+    return nodes
+
+@time_execution
+def run_fusion_pipeline(dev_mode=True, sample_size=None, consistent_sample=False, sample_seed=0, partition_by_case_year=False,
+                        max_workers=4, force=False, dry_run=False, oracle_tables=None, analytics_tables=None, fusion_tables=None):
+    """
+    Run the pipeline graph with up to `max_workers` steps at a time. `force` reruns every step regardless
+    of fingerprints; `dry_run` only prints the steps and the critical path estimated from the last run.
+    Returns the number of failed or blocked steps.
+    """
+    nodes = build_pipeline_nodes(dev_mode=dev_mode, sample_size=sample_size, consistent_sample=consistent_sample,
+                                 sample_seed=sample_seed, partition_by_case_year=partition_by_case_year,
+                                 oracle_tables=oracle_tables, analytics_tables=analytics_tables, fusion_tables=fusion_tables)
+    postgres_db = connect_postgres()
+    try:
+        if dry_run:
+            print_dag_plan(nodes, {name: duration for name, (_, duration) in get_dag_state(postgres_db).items()})
+            return 0
+        start_time = time.time()
+        results = run_dag(nodes, state_db=postgres_db, max_workers=max_workers, force=force)
+        print_dag_report(nodes, results, time.time() - start_time)
+    finally:
+        postgres_db.close_connection()
+    return sum(1 for result in results.values() if result['status'] in ('failed', 'blocked'))
+
+if __name__ == "__main__":
+    # Control panel
+    dev_mode = True
+    sample_size = 888
+    consistent_sample = True  # Sample COLLISIONS by case year and copy only their related child rows
+    partition_by_case_year = False  # Must match how the fusion tables were created
+    max_workers = 4  # Steps run at the same time; each opens its own source and PostgreSQL connections
+    force = False  # Set to True to rerun every step even if its inputs are unchanged
+    dry_run = False  # Set to True to only print the steps and the estimated critical path
+
+    run_fusion_pipeline(dev_mode=dev_mode, sample_size=sample_size, consistent_sample=consistent_sample,
+                        partition_by_case_year=partition_by_case_year, max_workers=max_workers, force=force, dry_run=dry_run)